@@ -6,7 +6,11 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+    # DJANGO_ENV=production elige los settings de producción
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE',
+        'tienda.settings_production' if os.environ.get('DJANGO_ENV') == 'production' else 'tienda.settings',
+    )
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
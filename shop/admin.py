@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Product, Category, Order, OrderItem, Profile, Review, Wishlist, Coupon, Notification
+from django.contrib import admin, messages
+from .archive import restore_orders
+from .models import Product, Category, Order, OrderItem, ArchivedOrder, ArchivedOrderItem, Profile, Review, Wishlist, Coupon, Notification
+from .orders import STATUS_NOTIFICATION_LABELS, transition_orders
+from .paginators import EstimatedCountPaginator
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -7,38 +10,118 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'category', 'average_rating', 'image']
+    list_display = ['name', 'price', 'stock', 'category', 'average_rating', 'image']
     list_filter = ['category']
+    list_select_related = ['category']
     search_fields = ['name', 'description']
+    
+    def get_queryset(self, request):
+        # Rating anotado: una sola consulta para toda la página
+        return super().get_queryset(request).with_ratings()
+    
+    @admin.display(description='Rating', ordering='rating_avg')
+    def average_rating(self, obj):
+        return obj.average_rating
 
 class OrderItemInline(admin.TabularInline):
+    # Los items salen del checkout: se muestra la copia del producto guardada
+    # al comprar (sin JOIN al catálogo) y no se agregan a mano.
     model = OrderItem
     extra = 0
-    readonly_fields = ['subtotal']
+    fields = ['product_name', 'category_name', 'quantity', 'price', 'subtotal']
+    readonly_fields = ['product_name', 'category_name', 'subtotal']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+def status_action(new_status):
+    """Acción del admin que pasa las órdenes seleccionadas a `new_status`."""
+    label = STATUS_NOTIFICATION_LABELS[new_status]
+    
+    @admin.action(description=f'Marcar como {label}s', permissions=['change'])
+    def action(modeladmin, request, queryset):
+        updated, skipped = transition_orders(queryset, new_status)
+        modeladmin.message_user(request, f'{updated} órdenes marcadas como {label}s.', messages.SUCCESS)
+        if skipped:
+            modeladmin.message_user(
+                request, f'{skipped} órdenes no admiten pasar a "{label}" y se dejaron igual.', messages.WARNING
+            )
+    
+    action.__name__ = f'mark_{new_status}'
+    return action
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'full_name', 'status', 'payment_method', 'total', 'created_at']
     list_filter = ['status', 'payment_method', 'created_at']
+    list_select_related = ['user']
     search_fields = ['full_name', 'user__username']
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user', 'coupon']
     inlines = [OrderItemInline]
     readonly_fields = ['created_at', 'mp_preference_id', 'mp_payment_id']
+    actions = [status_action(status) for status in ['paid', 'confirmed', 'shipped', 'delivered', 'cancelled']]
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    fields = ['product_name', 'category_name', 'quantity', 'price', 'subtotal']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.action(description='Restaurar (volver a Órdenes)', permissions=['change'])
+def restore_action(modeladmin, request, queryset):
+    restored = restore_orders(queryset.values_list('pk', flat=True))
+    modeladmin.message_user(request, f'{restored} órdenes restauradas.', messages.SUCCESS)
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    # Solo lectura: para modificar una orden archivada primero se restaura
+    list_display = ['id', 'user', 'full_name', 'status', 'payment_method', 'total', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['full_name', 'user__username']
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [ArchivedOrderItemInline]
+    actions = [restore_action]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        # Sin objeto es la lista: hace falta para la acción de restaurar
+        return obj is None and super().has_change_permission(request)
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'phone', 'city']
+    list_select_related = ['user']
     search_fields = ['user__username', 'city']
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ['product', 'user', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
+    list_select_related = ['product', 'user']
     search_fields = ['product__name', 'user__username', 'comment']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['product', 'user']
 
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
     list_display = ['user', 'product', 'added_at']
     list_filter = ['added_at']
+    list_select_related = ['user', 'product']
+    raw_id_fields = ['user', 'product']
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
@@ -50,4 +133,9 @@ class CouponAdmin(admin.ModelAdmin):
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ['user', 'notification_type', 'title', 'read', 'created_at']
     list_filter = ['notification_type', 'read', 'created_at']
+    list_select_related = ['user']
     search_fields = ['title', 'message', 'user__username']
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user']
@@ -0,0 +1,264 @@
+"""
+Analítica de clientes: scores RFM (recencia, frecuencia, monto) y retención
+por cohortes mensuales, calculados con NumPy sobre las órdenes leídas de a
+bloques.
+
+Las órdenes se recorren una sola vez, por id, en bloques de `chunk_size`. Cada
+bloque se vuelca sobre acumuladores indexados por user_id: cantidad de órdenes,
+total gastado, primer y último día de compra, y un mapa de bits
+meses x usuarios de "compró ese mes". La memoria depende de la cantidad de
+usuarios y de meses, no de la cantidad de órdenes.
+
+Los resultados quedan en CustomerRFM (uno por cliente) y en AnalyticsReport
+'customers' (resumen por segmento y matriz de cohortes) para la página de staff.
+Los meses se cuentan en UTC.
+"""
+import datetime
+
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import AnalyticsReport, ArchivedOrder, CustomerRFM, Order
+
+REPORT_NAME = 'customers'
+
+# Órdenes que cuentan como compra
+REVENUE_STATUSES = ('paid', 'confirmed', 'shipped', 'delivered')
+
+# Órdenes archivadas (shop/archive.py) y recientes
+ORDER_MODELS = (ArchivedOrder, Order)
+
+# Segmentos según los scores R y F (1 a 5); gana la primera regla que aplica
+SEGMENT_RULES = [
+    ('champions', lambda r, f: (r >= 4) & (f >= 4)),
+    ('new', lambda r, f: (r >= 4) & (f <= 1)),
+    ('loyal', lambda r, f: (r >= 3) & (f >= 3)),
+    ('promising', lambda r, f: r >= 3),
+    ('at_risk', lambda r, f: f >= 3),
+    ('hibernating', lambda r, f: r == 2),
+]
+FALLBACK_SEGMENT = 'lost'
+SEGMENTS = [name for name, _ in SEGMENT_RULES] + [FALLBACK_SEGMENT]
+
+
+def to_days(values):
+    """Fechas de la base (texto ISO en SQLite, datetime en otros motores) a días desde 1970 (UTC)."""
+    if len(values) and not isinstance(values[0], str):
+        # SQLite devuelve datetime sin zona (ya en UTC); otros motores, con zona
+        values = [
+            (timezone.make_naive(value, datetime.timezone.utc) if timezone.is_aware(value) else value).isoformat()
+            for value in values
+        ]
+    return np.array(values, dtype='datetime64[us]').astype('datetime64[D]').astype(np.int64)
+
+
+def day_to_month(days):
+    """Días desde 1970 a meses desde 1970."""
+    return np.asarray(days).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def read_orders(chunk_size=200_000, using='default'):
+    """
+    Genera (user_ids, días, totales) como arrays por bloque de órdenes que
+    cuentan como compra, recorriendo la PK (sin OFFSET ni modelos). Lee el
+    archivo y después las órdenes recientes.
+    """
+    connection = connections[using]
+    placeholders = ', '.join(['%s'] * len(REVENUE_STATUSES))
+    with connection.cursor() as cursor:
+        for model in ORDER_MODELS:
+            sql = (
+                f'SELECT id, user_id, created_at, total FROM {connection.ops.quote_name(model._meta.db_table)} '
+                f'WHERE id > %s AND status IN ({placeholders}) ORDER BY id LIMIT %s'
+            )
+            last_id = 0
+            while True:
+                cursor.execute(sql, [last_id, *REVENUE_STATUSES, chunk_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                ids, users, created, totals = zip(*rows)
+                last_id = ids[-1]
+                yield np.array(users, dtype=np.int64), to_days(created), np.array(totals, dtype=np.float64)
+
+
+class CustomerAccumulator:
+    """Acumuladores por usuario. `first_month` y `months` fijan el rango del mapa de actividad."""
+
+    def __init__(self, first_month, months, users=0):
+        self.first_month = first_month
+        self.months = months
+        self.count = np.zeros(users, np.int64)
+        self.spent = np.zeros(users, np.float64)
+        self.first_day = np.full(users, np.iinfo(np.int64).max, np.int64)
+        self.last_day = np.full(users, np.iinfo(np.int64).min, np.int64)
+        self.active = np.zeros((months, users), bool)
+
+    def grow(self, users):
+        extra = users - len(self.count)
+        if extra <= 0:
+            return
+        # De a bloques grandes, para no copiar los arrays en cada chunk
+        extra = max(extra, len(self.count) // 2)
+        self.count = np.concatenate([self.count, np.zeros(extra, np.int64)])
+        self.spent = np.concatenate([self.spent, np.zeros(extra, np.float64)])
+        self.first_day = np.concatenate([self.first_day, np.full(extra, np.iinfo(np.int64).max, np.int64)])
+        self.last_day = np.concatenate([self.last_day, np.full(extra, np.iinfo(np.int64).min, np.int64)])
+        self.active = np.concatenate([self.active, np.zeros((self.months, extra), bool)], axis=1)
+
+    def add(self, users, days, totals):
+        if not len(users):
+            return
+        self.grow(int(users.max()) + 1)
+        size = len(self.count)
+        self.count += np.bincount(users, minlength=size)
+        self.spent += np.bincount(users, weights=totals, minlength=size)
+        np.minimum.at(self.first_day, users, days)
+        np.maximum.at(self.last_day, users, days)
+        # Una orden creada mientras corría la tarea puede caer fuera del rango de meses
+        months = day_to_month(days) - self.first_month
+        valid = (months >= 0) & (months < self.months)
+        self.active[months[valid], users[valid]] = True
+
+    def customers(self):
+        """user_ids de los usuarios con al menos una compra."""
+        return np.flatnonzero(self.count)
+
+
+def quintile_scores(values, higher_is_better=True):
+    """Score 1 a 5 por quintil de ranking (los empates quedan en el mismo score)."""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return np.empty(0, np.int64)
+    if not higher_is_better:
+        values = -values
+    # Rango mínimo de cada valor: los empates comparten el score
+    ordered = np.sort(values)
+    ranks = np.searchsorted(ordered, values, side='left')
+    return ranks * 5 // len(values) + 1
+
+
+def segment_codes(r, f):
+    """Índice en SEGMENTS para cada cliente."""
+    conditions = [rule(r, f) for _, rule in SEGMENT_RULES]
+    return np.select(conditions, range(len(SEGMENT_RULES)), default=len(SEGMENT_RULES))
+
+
+def cohort_matrix(accumulator, customers):
+    """
+    (meses de cohorte, tamaños, matriz) donde matriz[i, k] es la cantidad de
+    clientes de la cohorte i que compraron k meses después de su primer mes.
+    """
+    months = accumulator.months
+    cohort_index = day_to_month(accumulator.first_day[customers]) - accumulator.first_month
+    inside = cohort_index < months
+    customers, cohort_index = customers[inside], cohort_index[inside]
+    sizes = np.bincount(cohort_index, minlength=months)
+    matrix = np.zeros(months * months, np.int64)
+    for month in range(months):
+        cohorts = cohort_index[accumulator.active[month, customers]]
+        # Celda (cohorte, meses desde la primera compra) aplanada
+        matrix += np.bincount(cohorts * months + (month - cohorts), minlength=months * months)
+    matrix = matrix.reshape(months, months)
+    return np.arange(months) + accumulator.first_month, sizes, matrix
+
+
+def month_label(month):
+    return str(np.datetime64(int(month), 'M'))
+
+
+def compute_customer_analytics(chunks, first_month, months, today):
+    """
+    Corre todo el cálculo sobre un iterable de bloques (user_ids, días,
+    totales). Devuelve (clientes, columnas RFM, reporte).
+    """
+    accumulator = CustomerAccumulator(first_month, months)
+    orders = 0
+    for users, days, totals in chunks:
+        accumulator.add(users, days, totals)
+        orders += len(users)
+
+    customers = accumulator.customers()
+    recency = np.maximum(today - accumulator.last_day[customers], 0)
+    frequency = accumulator.count[customers]
+    monetary = accumulator.spent[customers]
+    r = quintile_scores(recency, higher_is_better=False)
+    f = quintile_scores(frequency)
+    m = quintile_scores(monetary)
+    segments = segment_codes(r, f)
+    cohorts, sizes, matrix = cohort_matrix(accumulator, customers)
+
+    summary = []
+    for code, name in enumerate(SEGMENTS):
+        members = segments == code
+        count = int(members.sum())
+        summary.append({
+            'segment': name,
+            'customers': count,
+            'share': round(100 * count / len(customers), 1) if len(customers) else 0,
+            'avg_recency': round(float(recency[members].mean()), 1) if count else None,
+            'avg_frequency': round(float(frequency[members].mean()), 2) if count else None,
+            'revenue': round(float(monetary[members].sum()), 2),
+        })
+    report = {
+        'orders': orders,
+        'customers': len(customers),
+        'segments': summary,
+        'cohorts': [
+            {
+                'month': month_label(month),
+                'size': int(size),
+                'active': [int(value) for value in matrix[index, :months - index]],
+            }
+            for index, (month, size) in enumerate(zip(cohorts, sizes)) if size
+        ],
+    }
+    columns = {
+        'recency': recency, 'frequency': frequency, 'monetary': monetary,
+        'r': r, 'f': f, 'm': m, 'segment': segments,
+        'cohort': accumulator.first_day[customers],
+    }
+    return customers, columns, report
+
+
+def build_customer_analytics(chunk_size=200_000, batch_size=5000):
+    """Recalcula CustomerRFM y el reporte 'customers'. Devuelve el reporte."""
+    bounds = [
+        model.objects.filter(status__in=REVENUE_STATUSES).aggregate(first=Min('created_at'), last=Max('created_at'))
+        for model in ORDER_MODELS
+    ]
+    first = [tier['first'] for tier in bounds if tier['first'] is not None]
+    last = [tier['last'] for tier in bounds if tier['last'] is not None]
+    now = timezone.now()
+    today = int(to_days([now])[0])
+    if not first:
+        customers, columns, report = np.empty(0, np.int64), {}, {
+            'orders': 0, 'customers': 0, 'segments': [], 'cohorts': [],
+        }
+    else:
+        first_month, last_month = day_to_month(to_days([min(first), max(last)]))
+        customers, columns, report = compute_customer_analytics(
+            read_orders(chunk_size), int(first_month), int(last_month - first_month) + 1, today,
+        )
+
+    with transaction.atomic():
+        CustomerRFM.objects.all().delete()
+        for start in range(0, len(customers), batch_size):
+            end = start + batch_size
+            CustomerRFM.objects.bulk_create([
+                CustomerRFM(
+                    user_id=int(user_id), recency_days=int(recency), frequency=int(frequency),
+                    monetary=float(monetary), r_score=int(r), f_score=int(f), m_score=int(m),
+                    segment=SEGMENTS[segment], cohort=np.datetime64(int(cohort), 'D').astype('datetime64[M]').item(),
+                )
+                for user_id, recency, frequency, monetary, r, f, m, segment, cohort in zip(
+                    customers[start:end], *(columns[name][start:end] for name in (
+                        'recency', 'frequency', 'monetary', 'r', 'f', 'm', 'segment', 'cohort'))
+                )
+            ])
+        AnalyticsReport.objects.update_or_create(
+            name=REPORT_NAME, defaults={'computed_at': now, 'data': report},
+        )
+    return report
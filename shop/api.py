@@ -0,0 +1,130 @@
+"""
+API JSON de productos, de solo lectura, para la app móvil y los front-ends
+de wishlist y carrito: muchos productos en un request, por lista de ids
+(?ids=3,1,7) o con los filtros del catálogo, con los campos a elección
+(?fields=name,price,rating).
+
+Todo sale de una sola consulta con values(): la categoría viene en el mismo
+JOIN y el rating del histograma de estrellas guardado en Product, así que
+no hay consultas por producto ni modelos instanciados.
+"""
+from django.conf import settings
+from django.urls import reverse
+
+from .facets import CatalogFilters
+from .models import Product
+
+STAR_COLUMNS = [f'stars_{stars}' for stars in range(1, 6)]
+
+# Campo de la respuesta -> columnas que necesita
+FIELDS = {
+    'id': ['id'],
+    'name': ['name'],
+    'sku': ['sku'],
+    'description': ['description'],
+    'price': ['price'],
+    'stock': ['stock'],
+    'image': ['image'],
+    'url': ['id'],
+    'category': ['category_id', 'category__name', 'category__updated_at'],
+    'rating': STAR_COLUMNS,
+    'updated_at': ['updated_at'],
+}
+DEFAULT_FIELDS = ['id', 'name', 'price', 'stock', 'image', 'url', 'category', 'rating']
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def _int_list(value, name):
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise InvalidQuery(f'{name}: se esperaban números separados por coma')
+
+
+def parse_fields(value):
+    if not value:
+        return DEFAULT_FIELDS
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise InvalidQuery(f"fields: campos desconocidos {', '.join(unknown)} (disponibles: {', '.join(FIELDS)})")
+    # La id va siempre, para poder asociar cada producto
+    return ['id', *(field for field in fields if field != 'id')]
+
+
+def _serialize(row, fields):
+    item = {}
+    for field in fields:
+        if field == 'category':
+            item['category'] = {'id': row['category_id'], 'name': row['category__name']} if row['category_id'] else None
+        elif field == 'rating':
+            counts = [row[column] for column in STAR_COLUMNS]
+            total = sum(counts)
+            average = sum(stars * count for stars, count in enumerate(counts, start=1)) / total if total else 0
+            item['rating'] = {'average': round(average, 1), 'count': total, 'histogram': counts}
+        elif field == 'image':
+            item['image'] = Product.image.field.storage.url(row['image']) if row['image'] else None
+        elif field == 'url':
+            item['url'] = reverse('product_detail', args=[row['id']])
+        elif field == 'updated_at':
+            item['updated_at'] = row['updated_at'].isoformat()
+        else:
+            item[field] = row[field]
+    return item
+
+
+def _last_modified(rows):
+    dates = [row[column] for row in rows for column in ('updated_at', 'category__updated_at') if row.get(column)]
+    return max(dates, default=None)
+
+
+def columns_for(fields):
+    # updated_at siempre, para el Last-Modified
+    return list(dict.fromkeys(['updated_at', *(column for field in fields for column in FIELDS[field])]))
+
+
+def serialize_products(queryset, fields=DEFAULT_FIELDS):
+    """Los productos de `queryset` como los devuelve la API, en una sola consulta."""
+    return [_serialize(row, fields) for row in queryset.values(*columns_for(fields))]
+
+
+def fetch_products(data):
+    """
+    (payload, last_modified) para los parámetros de `data` (un QueryDict).
+    Con `ids`, en el orden pedido y con las ids inexistentes en "missing";
+    si no, los filtros del catálogo ordenados por id, de a `limit`, con
+    `after` como cursor de la página siguiente.
+    """
+    fields = parse_fields(data.get('fields'))
+    columns = columns_for(fields)
+    limit = settings.PRODUCT_API_MAX_RESULTS
+
+    if data.get('ids') is not None:
+        ids = list(dict.fromkeys(_int_list(data['ids'], 'ids')))
+        if len(ids) > limit:
+            raise InvalidQuery(f'ids: como máximo {limit} por request')
+        rows = {row['id']: row for row in Product.objects.filter(pk__in=ids).values(*columns)}
+        found = [rows[pk] for pk in ids if pk in rows]
+        payload = {
+            'products': [_serialize(row, fields) for row in found],
+            'missing': [pk for pk in ids if pk not in rows],
+        }
+        return payload, _last_modified(found)
+
+    try:
+        page_size = max(1, min(int(data.get('limit') or settings.PRODUCT_API_PAGE_SIZE), limit))
+        after = int(data.get('after') or 0)
+    except ValueError:
+        raise InvalidQuery('limit y after tienen que ser números')
+    queryset = CatalogFilters(data).apply(Product.objects.filter(pk__gt=after)).order_by('pk')
+    # Una fila de más para saber si hay otra página
+    rows = list(queryset.values(*columns)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = rows[-1]['id']
+    payload = {'products': [_serialize(row, fields) for row in rows], 'next': next_cursor}
+    return payload, _last_modified(rows)
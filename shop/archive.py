@@ -0,0 +1,133 @@
+"""
+Archivo de órdenes. Las órdenes entregadas o canceladas hace más de
+ORDER_ARCHIVE_DAYS días pasan de Order / OrderItem a ArchivedOrder /
+ArchivedOrderItem, con la misma id, de a lotes. Así las tablas "calientes"
+(checkout, dashboard, admin) quedan del tamaño de la actividad reciente.
+
+Cada lote es un INSERT ... SELECT y un DELETE por tabla, en su propia
+transacción: no se cargan modelos en memoria y una corrida larga no retiene
+la base. Entregada y cancelada son estados finales, así que una orden
+elegida para archivar no puede cambiar mientras se mueve.
+
+El historial del cliente lee las dos tablas (user_orders, get_order_or_404),
+igual que los más vendidos del dashboard (top_products).
+restore_orders hace el camino inverso.
+"""
+from collections import Counter
+from itertools import chain
+from operator import attrgetter
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.http import Http404
+from django.utils import timezone
+
+from .models import AnalyticsReport, ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+# Totales del archivo para el dashboard, recalculados al final de cada corrida
+TOTALS_REPORT = 'order_archive'
+
+
+def _columns(source, target):
+    """Columnas que comparten dos modelos (las de BaseOrder / BaseOrderItem y la id)."""
+    target_columns = {field.column for field in target._meta.concrete_fields}
+    return [field.column for field in source._meta.concrete_fields if field.column in target_columns]
+
+
+def _copy(source, target, column, ids, extra=None):
+    """INSERT INTO target SELECT ... FROM source WHERE column IN ids; `extra` agrega columnas con un valor fijo."""
+    quote = connection.ops.quote_name
+    columns = _columns(source, target)
+    extra = extra or {}
+    target_columns = ', '.join(quote(name) for name in [*columns, *extra])
+    selected = ', '.join([*(quote(name) for name in columns), *['%s'] * len(extra)])
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(target._meta.db_table)} ({target_columns}) '
+            f'SELECT {selected} FROM {quote(source._meta.db_table)} WHERE {quote(column)} IN ({placeholders})',
+            [*extra.values(), *ids],
+        )
+
+
+def _move(ids, order_model, item_model, target_order, target_item, extra=None):
+    with transaction.atomic():
+        _copy(order_model, target_order, 'id', ids, extra)
+        _copy(item_model, target_item, 'order_id', ids)
+        item_model.objects.filter(order_id__in=ids).delete()
+        return order_model.objects.filter(pk__in=ids).delete()[1].get(order_model._meta.label, 0)
+
+
+def archive_orders(cutoff, batch_size=500):
+    """Mueve al archivo las órdenes entregadas o canceladas antes de `cutoff`. Devuelve cuántas."""
+    eligible = (
+        Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    archived = 0
+    while True:
+        # Las órdenes movidas dejan de estar en Order: cada vuelta trae el lote siguiente
+        ids = list(eligible[:batch_size])
+        if not ids:
+            break
+        archived += _move(ids, Order, OrderItem, ArchivedOrder, ArchivedOrderItem,
+                          extra={'archived_at': timezone.now()})
+    if archived:
+        refresh_archive_totals()
+    return archived
+
+
+def restore_orders(order_ids, batch_size=500):
+    """Devuelve a Order las órdenes archivadas con esas ids. Devuelve cuántas."""
+    order_ids = list(order_ids)
+    restored = 0
+    for start in range(0, len(order_ids), batch_size):
+        ids = list(ArchivedOrder.objects.filter(pk__in=order_ids[start:start + batch_size])
+                   .values_list('pk', flat=True))
+        if ids:
+            restored += _move(ids, ArchivedOrder, ArchivedOrderItem, Order, OrderItem)
+    if restored:
+        refresh_archive_totals()
+    return restored
+
+
+def refresh_archive_totals():
+    totals = ArchivedOrder.objects.aggregate(
+        orders=Count('id'), revenue=Sum('total', filter=Q(status='delivered')),
+    )
+    AnalyticsReport.objects.update_or_create(
+        name=TOTALS_REPORT,
+        defaults={'computed_at': timezone.now(), 'data': {'orders': totals['orders'], 'revenue': totals['revenue'] or 0}},
+    )
+
+
+def archive_totals():
+    """{'orders', 'revenue'} del archivo, sin recorrerlo."""
+    report = AnalyticsReport.objects.filter(name=TOTALS_REPORT).first()
+    return report.data if report else {'orders': 0, 'revenue': 0}
+
+
+def top_products(limit):
+    """Los `limit` productos más vendidos, sumando los items de las dos tablas."""
+    sold = Counter()
+    for model in (OrderItem, ArchivedOrderItem):
+        sold.update(dict(model.objects.order_by().values_list('product_name').annotate(Sum('quantity'))))
+    return [{'product_name': name, 'total_sold': total} for name, total in sold.most_common(limit)]
+
+
+def user_orders(user):
+    """Órdenes del usuario en las dos tablas, de la más nueva a la más vieja, con sus items."""
+    hot = Order.objects.filter(user=user).prefetch_related('items')
+    archived = ArchivedOrder.objects.filter(user=user).prefetch_related('items')
+    return sorted(chain(hot, archived), key=attrgetter('created_at'), reverse=True)
+
+
+def get_order_or_404(order_id, **filters):
+    """La orden con esa id, esté en Order o en el archivo."""
+    for model in (Order, ArchivedOrder):
+        order = model.objects.filter(pk=order_id, **filters).first()
+        if order is not None:
+            return order
+    raise Http404('Orden inexistente')
@@ -0,0 +1,95 @@
+"""
+Versiones async de las vistas de lectura más usadas, para servir bajo ASGI
+sin ocupar un hilo por request. Conviven con las vistas sync de views.py
+(ver las rutas async/ en urls.py) y renderizan los mismos templates.
+
+Todo lo que el template necesita se carga antes de renderizar: dentro de una
+vista async el ORM solo puede usarse con su API async.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, render
+
+from . import views
+from .facets import CatalogFilters, facet_context
+from .forms import ReviewForm
+from .models import Product, ProductRecommendation, Review, Wishlist
+
+
+async def _load_user(request):
+    # Resuelve el usuario de forma async y lo deja en el request para que los
+    # templates (context processor auth) no disparen una consulta sync.
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+async def product_list(request):
+    user = await _load_user(request)
+    filters = CatalogFilters(request.GET)
+    products = filters.apply(Product.objects.select_related('category').with_ratings())
+
+    wishlist_ids = []
+    if user.is_authenticated:
+        wishlist_ids = [pid async for pid in user.wishlists.values_list('product_id', flat=True)]
+
+    return render(request, 'shop/product_list.html', {
+        'products': [p async for p in products],
+        'filters': filters,
+        'search': filters.search,
+        'wishlist_ids': wishlist_ids,
+        **await sync_to_async(facet_context)(filters),
+    })
+
+
+async def product_detail(request, product_id):
+    if request.method == 'POST':
+        # Publicar una review es una escritura: la resuelve la vista sync
+        return await sync_to_async(views.product_detail)(request, product_id)
+
+    user = await _load_user(request)
+    product = await aget_object_or_404(Product.objects.select_related('category'), id=product_id)
+    reviews, next_cursor = views.split_reviews_page(
+        [r async for r in views.reviews_page(product, request.GET.get('reviews'))]
+    )
+    user_review = None
+    can_review = False
+    in_wishlist = False
+
+    if user.is_authenticated:
+        user_review = await Review.objects.filter(product=product, user=user).afirst()
+        can_review = not user_review
+        in_wishlist = await Wishlist.objects.filter(user=user, product=product).aexists()
+
+    recommendations = [
+        r async for r in ProductRecommendation.objects.filter(product=product).select_related('recommended')
+    ]
+
+    return render(request, 'shop/product_detail.html', {
+        'product': product,
+        'reviews': reviews,
+        'next_reviews_cursor': next_cursor,
+        'paginated_reviews': 'reviews' in request.GET,
+        'form': ReviewForm(),
+        'user_review': user_review,
+        'can_review': can_review,
+        'in_wishlist': in_wishlist,
+        'recommendations': recommendations,
+    })
+
+
+@login_required
+async def wishlist_view(request):
+    user = await _load_user(request)
+    wishlist_items = [
+        item async for item in Wishlist.objects.filter(user=user).select_related('product')
+    ]
+    return render(request, 'shop/wishlist.html', {'wishlist_items': wishlist_items})
+
+
+@login_required
+async def get_unread_count(request):
+    user = await _load_user(request)
+    count = await user.notifications.filter(read=False).acount()
+    return JsonResponse({'count': count})
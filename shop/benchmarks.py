@@ -0,0 +1,225 @@
+"""
+Utilidades compartidas por los comandos bench_* (bases temporales, servidores
+locales, cliente HTTP async, hilos y percentiles). No se usan en los requests
+normales.
+"""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+
+@contextmanager
+def sqlite_alias(alias, path, options=None):
+    """Registra temporalmente un alias SQLite que apunta a `path`."""
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(path),
+        'OPTIONS': dict(options or {}),
+    }
+    connections.settings[alias] = connections.configure_settings({'default': {}, alias: config})[alias]
+    try:
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+@contextmanager
+def temporary_database(alias, options=None):
+    """
+    Registra un alias SQLite apuntando a un archivo temporal, lo migra y lo
+    elimina al salir. Cada hilo que lo use debe cerrar su propia conexión.
+    """
+    directory = Path(tempfile.mkdtemp(prefix=f'{alias}-'))
+    try:
+        with sqlite_alias(alias, directory / 'db.sqlite3', options):
+            call_command('migrate', database=alias, verbosity=0, interactive=False)
+            yield alias
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_server(server='asgi', settings_module=None, env=None, alias='bench_server'):
+    """
+    Levanta el proyecto en un subproceso sobre una copia migrada de la base
+    (así el benchmark no toca db.sqlite3) y devuelve (url_base, alias), donde
+    el alias permite cargar datos de prueba en esa copia desde este proceso.
+
+    server='asgi' usa uvicorn; server='wsgi' usa runserver sin autoreload.
+    """
+    directory = Path(tempfile.mkdtemp(prefix='bench-server-'))
+    database = directory / 'db.sqlite3'
+    source = Path(settings.DATABASES['default']['NAME'])
+    if source.exists():
+        shutil.copyfile(source, database)
+    port = free_port()
+    server_env = dict(os.environ, DB_NAME=str(database), **(env or {}))
+    server_env.pop('DB_REPLICA_PATH', None)
+    if settings_module:
+        server_env['DJANGO_SETTINGS_MODULE'] = settings_module
+    manage = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py')]
+    subprocess.run(manage + ['migrate', '--noinput', '-v', '0'], env=server_env,
+                   cwd=settings.BASE_DIR, check=True)
+    if server == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'tienda.asgi:application',
+                   '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log']
+    else:
+        command = manage + ['runserver', '--noreload', f'127.0.0.1:{port}']
+    log = open(directory / 'server.log', 'wb')
+    process = subprocess.Popen(command, env=server_env, cwd=settings.BASE_DIR,
+                               stdout=log, stderr=subprocess.STDOUT)
+    try:
+        _wait_for_port(port, process, directory / 'server.log')
+        with sqlite_alias(alias, database):
+            yield f'http://127.0.0.1:{port}', alias
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _wait_for_port(port, process, log_path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'El servidor terminó al arrancar:\n{log_path.read_text()}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'El servidor no respondió en el puerto {port}')
+
+
+async def http_request(reader, writer, method, path, headers=None, body=b''):
+    """
+    Request HTTP/1.1 mínimo sobre una conexión keep-alive abierta con
+    asyncio.open_connection. Devuelve (status, headers, body).
+    """
+    lines = [f'{method} {path} HTTP/1.1', 'Host: 127.0.0.1', f'Content-Length: {len(body)}']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Conexión cerrada por el servidor')
+    status = int(status_line.split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in response_headers:
+        data = await reader.readexactly(int(response_headers['content-length']))
+    elif response_headers.get('transfer-encoding') == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        data = b''.join(chunks)
+    else:
+        data = await reader.read()
+    return status, response_headers, data
+
+
+async def hammer(url, path, concurrency, duration, headers=None):
+    """
+    Abre `concurrency` conexiones keep-alive contra `url` y repite GET `path`
+    durante `duration` segundos. Devuelve requests, errores y latencias (ms).
+    """
+    host, port = url.rsplit('//', 1)[1].split(':')
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, int(port))
+                status, response_headers, _ = await asyncio.wait_for(
+                    http_request(reader, writer, 'GET', path, headers), timeout=30
+                )
+                if status >= 400:
+                    errors += 1
+                else:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                if response_headers.get('connection') == 'close':
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+                await asyncio.sleep(0.05)
+        if writer is not None:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return {'requests': len(latencies), 'errors': errors, 'latencies': latencies}
+
+
+def run_threads(worker, threads, duration):
+    """
+    Ejecuta worker(stop_event, thread_index) en N hilos durante `duration`
+    segundos y devuelve la lista de resultados de cada hilo.
+    """
+    stop = threading.Event()
+    results = [None] * threads
+
+    def target(index):
+        results[index] = worker(stop, index)
+
+    pool = [threading.Thread(target=target, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    return results
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
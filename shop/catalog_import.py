@@ -0,0 +1,277 @@
+"""
+Importación masiva del catálogo de un proveedor (CSV o JSONL).
+
+Las filas se leen de a una y se escriben en lotes con bulk_create /
+bulk_update, haciendo upsert por `sku`. La memoria depende del tamaño del
+lote, no del archivo. Una fila inválida se reporta y no corta la importación.
+
+Columnas: sku, name, price, description, category, image (nombre de archivo
+dentro del directorio de imágenes). Una fila cuya imagen no existe se guarda
+igual, sin esa imagen, y se reporta (ImportReport.without_image).
+
+El archivo tiene que estar en UTF-8: check_encoding lo revisa antes de
+importar, así un archivo en Latin-1 se rechaza sin dejar lotes a medias.
+"""
+import codecs
+import csv
+import json
+import math
+import os
+import time
+
+from django.core.files import File
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import Category, Product
+from .facets import invalidate_facets
+from .search import invalidate_index
+
+ENCODING = 'utf-8-sig'
+
+UPDATE_FIELDS = ['name', 'price', 'description', 'category', 'image', 'price_changed_at', 'updated_at']
+
+
+class RowError(ValueError):
+    pass
+
+
+def check_encoding(binary, chunk_size=1 << 16):
+    """
+    Recorre el archivo (abierto en binario) de a `chunk_size` bytes y levanta
+    RowError con la línea del primer byte que no es UTF-8, antes de importar
+    nada. Deja el archivo al principio.
+    """
+    decoder = codecs.getincrementaldecoder(ENCODING)()
+    line_no = 1
+    try:
+        for chunk in iter(lambda: binary.read(chunk_size), b''):
+            try:
+                decoder.decode(chunk)
+            except UnicodeDecodeError as exc:
+                line_no += chunk[:max(exc.start, 0)].count(b'\n')
+                raise
+            line_no += chunk.count(b'\n')
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise RowError(f'El archivo no está en UTF-8 (línea {line_no}): guardalo como UTF-8 y volvé a importarlo')
+    finally:
+        binary.seek(0)
+
+
+def read_rows(stream, fmt):
+    """
+    Genera (número_de_línea, fila) a partir de un archivo de texto. Si la
+    línea no se puede parsear la fila es una RowError.
+    """
+    if fmt == 'csv':
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_no, RowError(f'JSON inválido: {exc}')
+                continue
+            if not isinstance(row, dict):
+                yield line_no, RowError('Se esperaba un objeto JSON')
+                continue
+            yield line_no, row
+    else:
+        raise ValueError(f'Formato no soportado: {fmt}')
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+class ImportReport:
+    max_kept_errors = 100
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.without_image = 0  # creados o actualizados sin la imagen pedida
+        self.error_count = 0
+        self.errors = []  # primeros max_kept_errors (línea, sku, mensaje)
+        self.started = time.perf_counter()
+        self.elapsed = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def add_error(self, line_no, sku, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_kept_errors:
+            self.errors.append((line_no, sku, message))
+
+
+class CatalogImporter:
+    """
+    Uso:
+        importer = CatalogImporter(image_dir='fotos/', on_error=callback)
+        report = importer.run(read_rows(archivo, 'csv'))
+    """
+
+    def __init__(self, image_dir=None, batch_size=1000, on_error=None, on_progress=None):
+        self.image_dir = image_dir
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.categories = {}  # nombre -> id
+        self.images = {}  # archivo -> nombre en el storage
+        self.image_field = Product._meta.get_field('image')
+
+    def run(self, rows):
+        report = ImportReport()
+        batch = {}
+        for line_no, row in rows:
+            report.rows += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                cleaned = self.clean(row)
+            except RowError as exc:
+                self.error(report, line_no, row.get('sku') if isinstance(row, dict) else None, str(exc))
+                continue
+            batch[cleaned['sku']] = (line_no, cleaned)  # el último sku repetido gana
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch, report)
+                batch = {}
+        if batch:
+            self.write_batch(batch, report)
+        if report.created or report.updated:
+            # bulk_create / bulk_update no disparan señales
+            invalidate_index()
+            invalidate_facets()
+        report.elapsed = time.perf_counter() - report.started
+        return report
+
+    def error(self, report, line_no, sku, message):
+        report.add_error(line_no, sku, message)
+        if self.on_error:
+            self.on_error(line_no, sku, message)
+
+    def clean(self, row):
+        sku = str(row.get('sku') or '').strip()
+        name = str(row.get('name') or '').strip()
+        if not sku:
+            raise RowError('Falta el sku')
+        if len(sku) > 64:
+            raise RowError('El sku supera los 64 caracteres')
+        if not name:
+            raise RowError('Falta el nombre')
+        if len(name) > 100:
+            raise RowError('El nombre supera los 100 caracteres')
+        try:
+            price = float(str(row.get('price', '')).replace(',', '.'))
+        except ValueError:
+            raise RowError(f"Precio inválido: {row.get('price')!r}")
+        if not math.isfinite(price):
+            raise RowError(f"Precio inválido: {row.get('price')!r}")
+        if price < 0:
+            raise RowError('El precio no puede ser negativo')
+        return {
+            'sku': sku,
+            'name': name,
+            'price': price,
+            'description': str(row.get('description') or '').strip(),
+            'category': str(row.get('category') or '').strip()[:100],
+            'image': str(row.get('image') or '').strip(),
+        }
+
+    def write_batch(self, batch, report):
+        try:
+            with transaction.atomic():
+                self.upsert(list(batch.values()), report)
+        except DatabaseError:
+            # Algo del lote falló en la base: se reintenta fila por fila para
+            # aislar las filas problemáticas sin perder el resto. Las categorías
+            # creadas en el lote se deshicieron con el rollback.
+            self.categories = {}
+            for line_no, cleaned in batch.values():
+                try:
+                    with transaction.atomic():
+                        self.upsert([(line_no, cleaned)], report)
+                except DatabaseError as exc:
+                    self.error(report, line_no, cleaned['sku'], f'Error de base de datos: {exc}')
+        if self.on_progress:
+            self.on_progress(report)
+
+    def upsert(self, items, report):
+        self.resolve_categories({cleaned['category'] for _, cleaned in items if cleaned['category']})
+        existing = {
+            product.sku: product
+            for product in Product.objects.filter(sku__in=[cleaned['sku'] for _, cleaned in items])
+        }
+        to_create, to_update, unchanged = [], [], 0
+        # Se reportan recién cuando el lote se escribió: si falla, el reintento fila por fila los repite
+        missing_images = []
+        for line_no, cleaned in items:
+            values = {
+                'name': cleaned['name'],
+                'price': cleaned['price'],
+                'description': cleaned['description'],
+                'category_id': self.categories.get(cleaned['category']),
+            }
+            if cleaned['image']:
+                image = self.resolve_image(cleaned['image'])
+                if image is None:
+                    missing_images.append((line_no, cleaned['sku'], cleaned['image']))
+                else:
+                    values['image'] = image
+
+            product = existing.get(cleaned['sku'])
+            if product is None:
+                to_create.append(Product(sku=cleaned['sku'], **values))
+            elif any(getattr(product, field) != value for field, value in values.items()):
+                if product.price != values['price']:
+                    # bulk_update no pasa por Product.save()
+                    product.price_changed_at = timezone.now()
+                for field, value in values.items():
+                    setattr(product, field, value)
+                product.updated_at = timezone.now()
+                to_update.append(product)
+            else:
+                unchanged += 1
+
+        Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=self.batch_size)
+        report.created += len(to_create)
+        report.updated += len(to_update)
+        report.unchanged += unchanged
+        report.without_image += len(missing_images)
+        for line_no, sku, filename in missing_images:
+            self.error(report, line_no, sku, f'No existe la imagen {filename}: el producto se guardó sin ella')
+
+    def resolve_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        for category_id, name in Category.objects.filter(name__in=missing).values_list('id', 'name'):
+            self.categories.setdefault(name, category_id)
+        new = [Category(name=name) for name in missing - self.categories.keys()]
+        for category in Category.objects.bulk_create(new):
+            self.categories[category.name] = category.pk
+
+    def resolve_image(self, filename):
+        """Copia la imagen al storage de productos una sola vez y devuelve su nombre."""
+        if filename in self.images:
+            return self.images[filename]
+        if not self.image_dir:
+            return None
+        path = os.path.join(self.image_dir, os.path.basename(filename))
+        if not os.path.isfile(path):
+            return None
+        # El storage guarda por contenido: una imagen ya subida no se duplica
+        name = self.image_field.generate_filename(None, os.path.basename(filename))
+        with open(path, 'rb') as source:
+            name = self.image_field.storage.save(name, File(source))
+        self.images[filename] = name
+        return name
@@ -0,0 +1,127 @@
+"""
+Respuestas condicionales para el catálogo y el detalle de producto: ETag y
+Last-Modified salen de una sola consulta barata (MAX sobre columnas
+indexadas), así una visita repetida recibe un 304 sin ejecutar la vista ni
+renderizar el template.
+
+Las páginas son por usuario (wishlist, review propia, links de staff) y
+llevan el token CSRF de sus formularios, así que el ETag incluye al usuario
+y al secreto CSRF, y las respuestas van con
+`Cache-Control: private, no-cache`: el navegador las guarda pero revalida
+siempre. Con mensajes pendientes (messages framework) se responde completo
+para no dejar de mostrarlos.
+"""
+import datetime
+import hashlib
+
+from django.contrib import messages
+from django.db import connections, router
+from django.db.models import F, OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import Category, Product, ProductRecommendation, Wishlist
+
+
+def _as_datetime(value):
+    # Los MAX() de SQLite llegan como texto (UTC, sin zona)
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _etag(request, state):
+    user = request.user
+    viewer = f'{user.pk}:{user.is_staff}' if user.is_authenticated else 'anon'
+    # El HTML lleva {% csrf_token %}: si el token rota (login, logout) la copia
+    # del navegador ya no sirve para postear. get_token crea el secreto si no
+    # hay, así la primera respuesta ya sale con el ETag de la cookie que setea.
+    get_token(request)
+    viewer = f"{viewer}:{request.META['CSRF_COOKIE']}"
+    return hashlib.md5(f'{viewer}|{state!r}'.encode(), usedforsecurity=False).hexdigest()
+
+
+def catalog_state(request, **kwargs):
+    """
+    (etag, last_modified) de product_list y del listado paginado (los
+    argumentos de la ruta no cambian el estado). Cubre altas, bajas y cambios
+    de productos (reviews y stock incluidos) y categorías, y la wishlist del usuario.
+    """
+    alias = router.db_for_read(Product)
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    product, category, wishlist = (quote(model._meta.db_table) for model in (Product, Category, Wishlist))
+    user_id = request.user.pk if request.user.is_authenticated else None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT MAX(updated_at) FROM {product}), (SELECT COUNT(*) FROM {product}), '
+            f'(SELECT MAX(updated_at) FROM {category}), (SELECT COUNT(*) FROM {category}), '
+            f'(SELECT COUNT(*) FROM {wishlist} WHERE user_id = %s), '
+            f'(SELECT MAX(id) FROM {wishlist} WHERE user_id = %s)',
+            [user_id, user_id],
+        )
+        state = cursor.fetchone()
+    return _etag(request, state), _latest(_as_datetime(state[0]), _as_datetime(state[2]))
+
+
+def product_state(request, product_id):
+    """
+    (etag, last_modified) de product_detail: el producto (reviews y stock
+    incluidos), su categoría, sus recomendaciones y si está en la wishlist.
+    None si el producto no existe.
+    """
+    user_id = request.user.pk if request.user.is_authenticated else None
+    recommendations = ProductRecommendation.objects.filter(product=OuterRef('pk'))
+    state = (
+        Product.objects.filter(pk=product_id)
+        .annotate(
+            category_updated_at=F('category__updated_at'),
+            last_recommendation=Subquery(recommendations.order_by('-id').values('id')[:1]),
+            recommended_updated_at=Subquery(
+                recommendations.order_by('-recommended__updated_at').values('recommended__updated_at')[:1]
+            ),
+            wishlist_id=Subquery(Wishlist.objects.filter(product=OuterRef('pk'), user_id=user_id).values('id')[:1]),
+        )
+        .values_list('updated_at', 'category_updated_at', 'recommended_updated_at',
+                     'last_recommendation', 'wishlist_id')
+        .first()
+    )
+    if state is None:
+        return None
+    return _etag(request, state), _latest(*state[:3])
+
+
+def conditional_page(state_func):
+    """
+    Decorador: ETag / Last-Modified desde `state_func(request, *args, **kwargs)`
+    para los GET, con una sola llamada por request.
+    """
+    def get_state(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return None
+        if not hasattr(request, '_page_state'):
+            request._page_state = state_func(request, *args, **kwargs)
+        return request._page_state
+
+    def etag_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state and state[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state and state[1]
+
+    def decorator(view):
+        return cache_control(private=True, no_cache=True)(condition(etag_func, last_modified_func)(view))
+
+    return decorator
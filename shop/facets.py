@@ -0,0 +1,166 @@
+"""
+Filtros y conteos por faceta del catálogo (categorías, rango de precio,
+rating mínimo).
+
+Los conteos salen de una sola consulta agrupada por (categoría, tramo de
+precio, rating redondeado hacia abajo) sobre los productos que cumplen la
+búsqueda de texto y el rango de precio libre. Con esas pocas filas se
+calcula en Python cada faceta aplicando todos los filtros menos el propio,
+así marcar una categoría no hace desaparecer a las demás. El resultado se
+cachea por conjunto de filtros normalizado y se invalida cuando cambia el
+catálogo o una review.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Case, Count, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Floor
+
+from .models import Category, Product, Review
+
+VERSION_KEY = 'catalog_facets_version'
+
+# (clave, etiqueta, desde, hasta) en pesos; `hasta` no incluido
+PRICE_BUCKETS = [
+    ('0-50000', 'Hasta $50.000', None, 50000),
+    ('50000-100000', '$50.000 a $100.000', 50000, 100000),
+    ('100000-200000', '$100.000 a $200.000', 100000, 200000),
+    ('200000-', 'Más de $200.000', 200000, None),
+]
+RATING_LEVELS = [4, 3, 2, 1]
+
+
+def _positive_float(value):
+    try:
+        value = float(value.replace(',', '.'))
+    except (AttributeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+class CatalogFilters:
+    """Filtros del catálogo normalizados a partir de request.GET."""
+
+    def __init__(self, data):
+        self.search = ' '.join((data.get('search') or '').split())[:100]
+        self.categories = sorted({int(c) for c in data.getlist('category') if c.isdigit()})
+        keys = [key for key, _, _, _ in PRICE_BUCKETS]
+        self.price_bucket = keys.index(data.get('price')) if data.get('price') in keys else None
+        self.price_min = _positive_float(data.get('price_min'))
+        self.price_max = _positive_float(data.get('price_max'))
+        try:
+            rating = int(data.get('rating') or 0)
+        except ValueError:
+            rating = 0
+        self.min_rating = rating if rating in RATING_LEVELS else None
+
+    def key(self):
+        return repr((self.search, self.categories, self.price_bucket, self.price_min, self.price_max, self.min_rating))
+
+    def apply(self, queryset, skip=()):
+        """Aplica los filtros a un queryset de Product; `skip` deja afuera facetas."""
+        if self.search:
+            queryset = queryset.filter(Q(name__icontains=self.search) | Q(description__icontains=self.search))
+        if self.categories and 'category' not in skip:
+            queryset = queryset.filter(category_id__in=self.categories)
+        # El rango libre (desde/hasta) no es una faceta: se aplica siempre
+        if self.price_min is not None:
+            queryset = queryset.filter(price__gte=self.price_min)
+        if self.price_max is not None:
+            queryset = queryset.filter(price__lte=self.price_max)
+        if self.price_bucket is not None and 'price' not in skip:
+            _, _, low, high = PRICE_BUCKETS[self.price_bucket]
+            if low is not None:
+                queryset = queryset.filter(price__gte=low)
+            if high is not None:
+                queryset = queryset.filter(price__lt=high)
+        if self.min_rating and 'rating' not in skip:
+            if 'rating_value' not in queryset.query.annotations:
+                queryset = with_rating_value(queryset)
+            queryset = queryset.filter(rating_value__gte=self.min_rating)
+        return queryset
+
+    def matches(self, category_id, price_bucket, rating_floor, skip):
+        """Lo mismo que apply() pero sobre una fila del agregado."""
+        if self.categories and 'category' not in skip and category_id not in self.categories:
+            return False
+        if self.price_bucket is not None and 'price' not in skip and price_bucket != self.price_bucket:
+            return False
+        if self.min_rating and 'rating' not in skip and rating_floor < self.min_rating:
+            return False
+        return True
+
+
+def with_rating_value(queryset):
+    """Anota el promedio de reviews como subconsulta (0 sin reviews), usable en WHERE y GROUP BY."""
+    average = Review.objects.filter(product=OuterRef('pk')).values('product').annotate(avg=Avg('rating')).values('avg')
+    return queryset.annotate(rating_value=Coalesce(Subquery(average, output_field=FloatField()), Value(0.0)))
+
+
+def _price_bucket():
+    whens = [
+        When(price__lt=high, then=Value(position))
+        for position, (_, _, _, high) in enumerate(PRICE_BUCKETS) if high is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def compute_facets(filters):
+    # Única consulta: los filtros propios de cada faceta se aplican en Python
+    rows = list(
+        filters.apply(with_rating_value(Product.objects.order_by()), skip=('category', 'price', 'rating'))
+        .annotate(price_bucket=_price_bucket(), rating_floor=Floor('rating_value'))
+        .values_list('category_id', 'price_bucket', 'rating_floor')
+        .annotate(total=Count('id'))
+    )
+    categories, prices, ratings = {}, [0] * len(PRICE_BUCKETS), dict.fromkeys(RATING_LEVELS, 0)
+    for category_id, bucket, rating_floor, total in rows:
+        rating_floor = int(rating_floor or 0)
+        if filters.matches(category_id, bucket, rating_floor, skip=('category',)):
+            categories[category_id] = categories.get(category_id, 0) + total
+        if filters.matches(category_id, bucket, rating_floor, skip=('price',)):
+            prices[bucket] += total
+        if filters.matches(category_id, bucket, rating_floor, skip=('rating',)):
+            for level in RATING_LEVELS:
+                if rating_floor >= level:
+                    ratings[level] += total
+    return {'categories': categories, 'prices': prices, 'ratings': ratings}
+
+
+def get_facets(filters):
+    """Conteos por faceta para `filters`, cacheados por conjunto de filtros."""
+    digest = hashlib.md5(filters.key().encode(), usedforsecurity=False).hexdigest()
+    key = f'catalog_facets:{cache.get(VERSION_KEY, 0)}:{digest}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(filters)
+        cache.set(key, facets, settings.CATALOG_FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def facet_context(filters, facets=None):
+    """Arma las listas que recorre product_list.html."""
+    if facets is None:
+        facets = get_facets(filters)
+    categories = [
+        {'id': category.id, 'name': category.name, 'count': facets['categories'].get(category.id, 0),
+         'selected': category.id in filters.categories}
+        for category in Category.objects.order_by('name')
+    ]
+    prices = [
+        {'key': key, 'label': label, 'count': count, 'selected': filters.price_bucket == position}
+        for position, ((key, label, _, _), count) in enumerate(zip(PRICE_BUCKETS, facets['prices']))
+    ]
+    ratings = [
+        {'value': level, 'count': facets['ratings'][level], 'selected': filters.min_rating == level}
+        for level in RATING_LEVELS
+    ]
+    return {'category_facets': categories, 'price_facets': prices, 'rating_facets': ratings}
+
+
+def invalidate_facets():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
@@ -1,12 +1,27 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from .images import looks_like_image
 from .models import Product, Order, Profile, Review
 
 class ProductForm(forms.ModelForm):
+    # FileField y no ImageField: decodificar la imagen queda fuera del request (shop/images.py)
+    image = forms.FileField(required=False, label='Imagen')
+    
     class Meta:
         model = Product
-        fields = ['name', 'description', 'price', 'image', 'category']
+        fields = ['name', 'description', 'price', 'stock', 'image', 'category']
+    
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image and hasattr(image, 'content_type'):  # recién subida
+            if image.size > settings.PRODUCT_IMAGE_MAX_BYTES:
+                raise forms.ValidationError(
+                    f'La imagen no puede superar los {settings.PRODUCT_IMAGE_MAX_BYTES // (1024 * 1024)} MB')
+            if not looks_like_image(image):
+                raise forms.ValidationError('El archivo no es una imagen JPEG, PNG, GIF o WebP')
+        return image
 
 class RegisterForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -60,3 +75,15 @@ class ReviewForm(forms.ModelForm):
 
 class CouponForm(forms.Form):
     code = forms.CharField(max_length=50, label='Código de cupón')
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(label='Archivo CSV o JSONL')
+
+class OrderExportForm(forms.Form):
+    date_from = forms.DateField(required=False, label='Desde')
+    date_to = forms.DateField(required=False, label='Hasta')
+    status = forms.ChoiceField(
+        choices=[('', 'Todos los estados')] + Order.STATUS_CHOICES,
+        required=False,
+        label='Estado'
+    )
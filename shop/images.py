@@ -0,0 +1,94 @@
+"""
+Validación de las imágenes de producto fuera del request.
+
+Al subir, el formulario solo mira lo barato: tamaño, extensión y los
+primeros bytes del archivo (firma de JPEG, PNG, GIF o WebP). Decodificar la
+imagen completa con Pillow queda para después del commit, en un pool de
+hilos (PRODUCT_IMAGE_WORKERS). Si la imagen no se puede decodificar se le
+saca al producto; el archivo huérfano lo limpia gc_images.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.jfif', '.png', '.gif', '.webp'}
+
+# Primeros bytes de cada formato aceptado
+SIGNATURES = [b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a']
+
+
+def looks_like_image(upload):
+    """Chequeo rápido, sin decodificar: extensión y firma del archivo."""
+    if os.path.splitext(upload.name)[1].lower() not in ALLOWED_EXTENSIONS:
+        return False
+    upload.seek(0)
+    header = upload.read(12)
+    upload.seek(0)
+    # WebP: contenedor RIFF con tipo WEBP
+    return any(header.startswith(signature) for signature in SIGNATURES) or (
+        header[:4] == b'RIFF' and header[8:12] == b'WEBP'
+    )
+
+
+def decodes(name):
+    """True si Pillow puede decodificar la imagen completa (y no supera MAX_IMAGE_PIXELS)."""
+    storage = Product.image.field.storage
+    try:
+        with storage.open(name) as source:
+            with Image.open(source) as image:
+                image.verify()
+        # verify() no decodifica los píxeles y deja la imagen inutilizable: se abre de nuevo
+        with storage.open(name) as source:
+            with Image.open(source) as image:
+                image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+def process_image(product_id, name):
+    try:
+        if not decodes(name):
+            logger.warning('Imagen inválida %s del producto %s: se quita', name, product_id)
+            # Solo si el producto sigue con esa imagen
+            Product.objects.filter(pk=product_id, image=name).update(image='', updated_at=timezone.now())
+    except Exception:
+        logger.exception('Error procesando la imagen %s del producto %s', name, product_id)
+    finally:
+        if settings.PRODUCT_IMAGE_WORKERS:
+            # Cada hilo del pool tiene su propia conexión
+            connection.close()
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.PRODUCT_IMAGE_WORKERS, thread_name_prefix='product-images')
+    return _executor
+
+
+def schedule_processing(product):
+    """Valida la imagen de `product` después del commit; con PRODUCT_IMAGE_WORKERS=0, en el mismo hilo."""
+    if not product.image:
+        return
+    product_id, name = product.pk, product.image.name
+
+    def submit():
+        if settings.PRODUCT_IMAGE_WORKERS:
+            _get_executor().submit(process_image, product_id, name)
+        else:
+            process_image(product_id, name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.archive import ARCHIVABLE_STATUSES, archive_orders, restore_orders
+from shop.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve al archivo las órdenes entregadas o canceladas hace más de '
+        'ORDER_ARCHIVE_DAYS días (por cron, de noche). Con --restore las devuelve a Order.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_DAYS,
+                            help='Antigüedad mínima, en días')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar cuántas órdenes se archivarían')
+        parser.add_argument('--restore', help='Ids de órdenes archivadas a restaurar, separados por coma')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            ids = [int(pk) for pk in options['restore'].split(',')]
+            restored = restore_orders(ids, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{restored} órdenes restauradas'))
+            if restored < len(ids):
+                self.stdout.write(self.style.WARNING(f'{len(ids) - restored} ids no estaban en el archivo'))
+            return
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff).count()
+            self.stdout.write(f'{count} órdenes se archivarían (anteriores a {cutoff:%Y-%m-%d})')
+            return
+
+        archived = archive_orders(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{archived} órdenes archivadas'))
@@ -0,0 +1,97 @@
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el cálculo de RFM y cohortes sobre órdenes sintéticas generadas '
+        'de a bloques (sin base de datos): tiempo y memoria máxima del proceso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10_000_000)
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--months', type=int, default=36)
+        parser.add_argument('--chunk-size', type=int, default=200_000)
+        parser.add_argument('--db-orders', type=int, default=200_000,
+                            help='Órdenes en una base temporal para medir la lectura por bloques (0: no medir)')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+
+            from shop.analytics import compute_customer_analytics, day_to_month
+        except ImportError:
+            raise CommandError('bench_analytics necesita numpy: pip install numpy')
+
+        rng = np.random.default_rng(42)
+        months, chunk_size = options['months'], options['chunk_size']
+        first_day = int(np.datetime64('2023-01-01', 'D').astype(np.int64))
+        last_day = first_day + int(months * 30.4)
+        first_month = int(day_to_month([first_day])[0])
+        # Pocos clientes concentran muchas compras
+        weights = 1 / np.arange(1, options['users'] + 1) ** 0.6
+        weights /= weights.sum()
+
+        def chunks():
+            for start in range(0, options['orders'], chunk_size):
+                size = min(chunk_size, options['orders'] - start)
+                users = rng.choice(options['users'], size, p=weights) + 1
+                days = rng.integers(first_day, last_day, size)
+                totals = rng.integers(10, 300, size) * 1000.0
+                yield users, days, totals
+
+        started = time.perf_counter()
+        customers, columns, report = compute_customer_analytics(chunks(), first_month, months, last_day)
+        elapsed = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss >> 10  # KB -> MB en Linux
+
+        self.stdout.write(
+            f"{report['orders']} órdenes (generación incluida), {report['customers']} clientes, "
+            f"{len(report['cohorts'])} cohortes: {elapsed:.1f} s "
+            f"({report['orders'] / elapsed / 1e6:.1f} M órdenes/s), memoria máxima {peak} MB"
+        )
+        for row in report['segments']:
+            self.stdout.write(f"  {row['segment']:<12}{row['customers']:>9} ({row['share']}%)")
+        first = report['cohorts'][0]
+        retention = ', '.join(f'{100 * value / first["size"]:.0f}%' for value in first['active'][:6])
+        self.stdout.write(f"Cohorte {first['month']} ({first['size']} clientes): {retention}")
+
+        if options['db_orders']:
+            self.bench_read(options['db_orders'], chunk_size, options['orders'])
+
+    def bench_read(self, count, chunk_size, target):
+        from django.contrib.auth.models import User
+        from django.db import connections
+
+        from shop.analytics import read_orders
+        from shop.benchmarks import temporary_database
+        from shop.models import Order
+
+        with temporary_database('bench_analytics') as alias:
+            users = User.objects.using(alias).bulk_create([User(username=f'c{i}', password='!') for i in range(1000)])
+            for start in range(0, count, 50_000):
+                Order.objects.using(alias).bulk_create([
+                    Order(user=users[i % len(users)], status='delivered', full_name='x', address='x',
+                          city='x', phone='x', payment_method='cash', total=1000.0)
+                    for i in range(start, min(count, start + 50_000))
+                ])
+            # created_at es auto_now_add (bulk_create lo pisa): se reparte una
+            # orden por hora hacia atrás con un UPDATE (la base temporal es SQLite)
+            connection = connections[alias]
+            first_id = Order.objects.using(alias).order_by('pk').values_list('pk', flat=True).first()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {connection.ops.quote_name(Order._meta.db_table)} "
+                    f"SET created_at = strftime('%%Y-%%m-%%d %%H:%%M:%%f', created_at, '-' || (id - %s) || ' hours')",
+                    [first_id],
+                )
+            started = time.perf_counter()
+            read = sum(len(users) for users, _, _ in read_orders(chunk_size, using=alias))
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Lectura de la base por bloques: {read} órdenes en {elapsed:.2f} s '
+            f'({read / elapsed / 1e6:.2f} M órdenes/s, ~{target / (read / elapsed) / 60:.1f} min para {target})'
+        )
@@ -0,0 +1,101 @@
+import asyncio
+import random
+from datetime import timedelta
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from shop.benchmarks import hammer, local_server, percentile
+from shop.models import Category, Notification, Product, Review, Wishlist
+
+# (nombre, ruta sync, ruta async, requiere login)
+ENDPOINTS = [
+    ('product_list', '/', '/async/', False),
+    ('product_detail', '/producto/{product_id}/', '/async/producto/{product_id}/', False),
+    ('wishlist', '/wishlist/', '/async/wishlist/', True),
+    ('unread_count', '/notificaciones/count/', '/async/notificaciones/count/', True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la capacidad de conexiones concurrentes de las vistas sync y '
+        'async bajo un servidor ASGI local (uvicorn).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='10,100,500',
+                            help='Niveles de conexiones simultáneas, separados por coma')
+        parser.add_argument('--duration', type=float, default=5, help='Segundos por medición')
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--endpoints', default=','.join(name for name, *_ in ENDPOINTS))
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError('bench_asgi necesita uvicorn: pip install uvicorn')
+
+        levels = [int(value) for value in options['concurrency'].split(',')]
+        selected = set(options['endpoints'].split(','))
+
+        with local_server('asgi') as (url, alias):
+            product_id, session_key = self.seed(alias, options['products'])
+            headers = {'Cookie': f'sessionid={session_key}'}
+            self.stdout.write(f"{'endpoint':<16}{'modo':<7}{'conex':>7}{'req/s':>9}"
+                              f"{'errores':>9}{'p50 ms':>9}{'p99 ms':>9}")
+            for name, sync_path, async_path, needs_login in ENDPOINTS:
+                if name not in selected:
+                    continue
+                for mode, path in (('sync', sync_path), ('async', async_path)):
+                    path = path.format(product_id=product_id)
+                    for level in levels:
+                        result = asyncio.run(hammer(
+                            url, path, level, options['duration'],
+                            headers if needs_login else None,
+                        ))
+                        self.stdout.write(
+                            f"{name:<16}{mode:<7}{level:>7}"
+                            f"{result['requests'] / options['duration']:>9.0f}{result['errors']:>9}"
+                            f"{percentile(result['latencies'], 50):>9.1f}"
+                            f"{percentile(result['latencies'], 99):>9.1f}"
+                        )
+
+    def seed(self, alias, product_count):
+        missing = product_count - Product.objects.using(alias).count()
+        category, _ = Category.objects.using(alias).get_or_create(name='Bench')
+        if missing > 0:
+            Product.objects.using(alias).bulk_create([
+                Product(name=f'Zapatilla bench {i}', price=random.randint(20, 200) * 1000,
+                        category=category, description='Producto de benchmark')
+                for i in range(missing)
+            ])
+        user, _ = User.objects.using(alias).get_or_create(username='bench_asgi')
+        products = list(Product.objects.using(alias).order_by('id')[:20])
+        for product in products:
+            Wishlist.objects.using(alias).get_or_create(user=user, product=product)
+            Review.objects.using(alias).get_or_create(
+                user=user, product=product, defaults={'rating': 4, 'comment': 'Muy buenas'}
+            )
+        Notification.objects.using(alias).bulk_create([
+            Notification(user=user, notification_type='system', title='Bench', message='Bench')
+            for _ in range(10)
+        ])
+
+        # Sesión autenticada creada directamente en la copia de la base
+        session_key = get_random_string(32)
+        Session.objects.using(alias).create(
+            session_key=session_key,
+            session_data=SessionStore().encode({
+                SESSION_KEY: str(user.pk),
+                BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+                HASH_SESSION_KEY: user.get_session_auth_hash(),
+            }),
+            expire_date=timezone.now() + timedelta(hours=1),
+        )
+        return products[0].pk, session_key
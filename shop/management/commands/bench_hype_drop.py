@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import Sum
+
+from shop.benchmarks import percentile, temporary_database
+from shop.models import Order, OrderItem, Product
+from shop.orders import place_order
+from shop.stock import OutOfStock
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de estrés de un lanzamiento limitado: miles de compradores '
+        'concurrentes contra pocas unidades. Tiene que vender exactamente el stock.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=3000)
+        parser.add_argument('--units', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--retries', type=int, default=3,
+                            help='Reintentos por comprador si la base está bloqueada')
+
+    def handle(self, *args, **options):
+        with temporary_database('bench_hype', settings.SQLITE_PRODUCTION_OPTIONS) as alias:
+            product = Product.objects.using(alias).create(name='Jordan 1 Edición Limitada', price=250000,
+                                                          stock=options['units'])
+            User.objects.using(alias).bulk_create([
+                User(username=f'fan{i}', password='!') for i in range(options['buyers'])
+            ])
+            buyers = queue.Queue()
+            for user in User.objects.using(alias).order_by('pk'):
+                buyers.put(user)
+
+            results = {'sold': 0, 'sold_out': 0, 'locked': 0}
+            latencies = []
+            lock = threading.Lock()
+
+            def worker():
+                try:
+                    while True:
+                        try:
+                            user = buyers.get_nowait()
+                        except queue.Empty:
+                            return
+                        outcome = 'locked'
+                        started = time.perf_counter()
+                        for _ in range(options['retries'] + 1):
+                            try:
+                                place_order(user, [(product, 1)], 'cash', using=alias, full_name=user.username,
+                                            address='Calle 123', city='CABA', phone='0')
+                                outcome = 'sold'
+                                break
+                            except OutOfStock:
+                                outcome = 'sold_out'
+                                break
+                            except OperationalError as exc:
+                                if 'locked' not in str(exc):
+                                    raise
+                        elapsed = (time.perf_counter() - started) * 1000
+                        with lock:
+                            results[outcome] += 1
+                            latencies.append(elapsed)
+                finally:
+                    connections[alias].close()
+
+            started = time.perf_counter()
+            pool = [threading.Thread(target=worker) for _ in range(options['threads'])]
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            stock = Product.objects.using(alias).get(pk=product.pk).stock
+            orders = Order.objects.using(alias).count()
+            units_sold = OrderItem.objects.using(alias).aggregate(total=Sum('quantity'))['total'] or 0
+
+        self.stdout.write(
+            f"{options['buyers']} compradores en {options['threads']} hilos, {elapsed:.1f} s: "
+            f"{results['sold']} ventas, {results['sold_out']} sin stock, {results['locked']} bloqueados. "
+            f"p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms"
+        )
+        self.stdout.write(f'Órdenes: {orders}, unidades vendidas: {units_sold}, stock final: {stock}')
+        if not (results['sold'] == orders == units_sold == options['units'] and stock == 0):
+            raise CommandError(f"Se esperaban exactamente {options['units']} ventas")
+        self.stdout.write(self.style.SUCCESS(f"OK: exactamente {options['units']} ventas, sin sobreventa"))
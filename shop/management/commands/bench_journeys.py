@@ -0,0 +1,292 @@
+import http.client
+import random
+import re
+import time
+from datetime import timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shop.benchmarks import local_server, percentile, run_threads
+from shop.models import Category, Coupon, Product
+
+PASSWORD = 'bench-journeys-1'
+COUPON_CODE = 'BENCHJOURNEY'
+
+DEFAULT_MIX = 'browser=6,buyer=3,new_user=1'
+
+
+class StepError(Exception):
+    pass
+
+
+class Browser:
+    """
+    Un usuario: conexión keep-alive propia y cookies (sesión, CSRF). Los
+    redirects no se siguen, así cada paso mide solo sus propios requests.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.connection = None
+        self.cookies = {}
+        self.requests = 0
+
+    def request(self, method, path, data=None):
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if method == 'POST':
+            data = dict(data or {}, csrfmiddlewaretoken=self.cookies.get('csrftoken', ''))
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # El servidor puede cerrar la conexión keep-alive entre requests
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        self.requests += 1
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, response.getheader('Location', ''), content
+
+    def get(self, path, expect=200):
+        status, location, content = self.request('GET', path)
+        if status != expect:
+            raise StepError(f'GET {path}: {status}')
+        return content
+
+    def post(self, path, data=None, redirect_to=None):
+        status, location, _ = self.request('POST', path, data)
+        if status != 302 or (redirect_to and redirect_to not in location):
+            raise StepError(f'POST {path}: {status} {location}')
+        return location
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Journeys:
+    """Los recorridos de usuario. Cada paso puede hacer varios requests y se mide entero."""
+
+    def __init__(self, product_ids, usernames):
+        self.product_ids = product_ids
+        self.usernames = usernames
+
+    # ----- pasos -----
+
+    def browse(self, browser):
+        browser.get('/')
+        browser.get(f'/?page={random.randint(1, 3)}')
+
+    def detail(self, browser):
+        browser.get(f'/producto/{random.choice(self.product_ids)}/')
+
+    def login(self, browser):
+        browser.get('/login/')
+        browser.post('/login/', {'username': random.choice(self.usernames), 'password': PASSWORD})
+
+    def register(self, browser):
+        browser.get('/registro/')
+        username = f'nuevo_{time.monotonic_ns()}_{random.randint(0, 10 ** 6)}'
+        browser.post('/registro/', {
+            'username': username, 'email': f'{username}@example.com',
+            'password1': PASSWORD, 'password2': PASSWORD,
+        })
+
+    def add_to_cart(self, browser):
+        browser.post(f'/carrito/agregar/{random.choice(self.product_ids)}/', {'quantity': 1})
+
+    def apply_coupon(self, browser):
+        browser.get('/carrito/')
+        browser.post('/carrito/aplicar-cupon/', {'coupon_code': COUPON_CODE})
+
+    def checkout(self, browser):
+        browser.get('/checkout/')
+        browser.post('/checkout/', {
+            'full_name': 'Comprador Bench', 'address': 'Calle 123', 'city': 'CABA',
+            'phone': '1234', 'payment_method': 'cash',
+        }, redirect_to='/confirmacion/')
+
+    def poll_notifications(self, browser):
+        for _ in range(3):
+            browser.get('/notificaciones/count/')
+
+    # ----- recorridos -----
+
+    def browser(self):
+        return [self.browse, self.detail, self.detail, self.browse, self.detail]
+
+    def buyer(self):
+        return [self.login, self.browse, self.detail, self.add_to_cart, self.detail, self.add_to_cart,
+                self.apply_coupon, self.checkout, self.poll_notifications]
+
+    def new_user(self):
+        return [self.register, self.browse, self.detail, self.add_to_cart, self.poll_notifications]
+
+    KINDS = ('browser', 'buyer', 'new_user')
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in Journeys.KINDS or not weight.isdigit():
+            raise CommandError(f"Mezcla inválida: '{part}' (recorridos: {', '.join(Journeys.KINDS)})")
+        mix[name] = int(weight)
+    if not sum(mix.values()):
+        raise CommandError('La mezcla necesita al menos un peso mayor a cero')
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de punta a punta: usuarios concurrentes recorren el sitio '
+        '(login o registro, catálogo, producto, carrito, cupón, checkout y '
+        'notificaciones) contra un servidor local. Reporta throughput, errores y '
+        'p50/p99 por paso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=16, help='Usuarios simultáneos (hilos)')
+        parser.add_argument('--duration', type=float, default=20, help='Segundos de carga')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Pesos de cada recorrido, ej: {DEFAULT_MIX}')
+        parser.add_argument('--think-ms', type=int, default=0, help='Pausa entre pasos')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--accounts', type=int, default=200, help='Usuarios registrados para el login')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        kinds, weights = zip(*mix.items())
+
+        # Sin throttling: los usuarios simulados salen todos de la misma IP
+        with local_server(options['server'], env={'THROTTLE_ENABLED': '0'}) as (url, alias):
+            product_ids, usernames = self.seed(alias, options['products'], options['accounts'])
+            journeys = Journeys(product_ids, usernames)
+            host, port = re.match(r'http://([^:]+):(\d+)', url).groups()
+
+            def worker(stop, index):
+                steps = {}
+                completed = {kind: 0 for kind in kinds}
+                requests = 0
+                while not stop.is_set():
+                    kind = random.choices(kinds, weights)[0]
+                    browser = Browser(host, int(port))
+                    ok = True
+                    for step in getattr(journeys, kind)():
+                        started = time.perf_counter()
+                        try:
+                            step(browser)
+                        except (StepError, http.client.HTTPException, OSError):
+                            ok = False
+                        elapsed = (time.perf_counter() - started) * 1000
+                        stats = steps.setdefault(step.__name__, {'latencies': [], 'errors': 0})
+                        stats['latencies'].append(elapsed)
+                        if not ok:
+                            stats['errors'] += 1
+                            break
+                        if options['think_ms']:
+                            time.sleep(options['think_ms'] / 1000)
+                    if ok:
+                        completed[kind] += 1
+                    requests += browser.requests
+                    browser.close()
+                return steps, completed, requests
+
+            self.stdout.write(
+                f"{options['users']} usuarios durante {options['duration']:.0f} s ({options['server']}), "
+                f"mezcla {options['mix']}"
+            )
+            started = time.perf_counter()
+            results = run_threads(worker, options['users'], options['duration'])
+            # Los hilos terminan el recorrido en curso después del tiempo pedido
+            elapsed = time.perf_counter() - started
+
+        self.report(results, elapsed)
+
+    def seed(self, alias, product_count, account_count):
+        category, _ = Category.objects.using(alias).get_or_create(name='Bench')
+        missing = product_count - Product.objects.using(alias).count()
+        if missing > 0:
+            Product.objects.using(alias).bulk_create([
+                Product(name=f'Zapatilla bench {i}', price=random.randint(20, 200) * 1000,
+                        category=category, description='Producto de benchmark')
+                for i in range(missing)
+            ])
+        # Stock libre: la prueba mide el recorrido, no el agotamiento
+        product_ids = list(
+            Product.objects.using(alias).filter(stock__isnull=True).order_by('?').values_list('id', flat=True)[:200]
+        )
+        if not product_ids:
+            raise CommandError('No hay productos sin control de stock para la prueba')
+
+        now = timezone.now()
+        Coupon.objects.using(alias).update_or_create(code=COUPON_CODE, defaults={
+            'discount_type': 'percent', 'discount_value': 10, 'max_uses': 10 ** 9, 'times_used': 0,
+            'valid_from': now - timedelta(days=1), 'valid_until': now + timedelta(days=1), 'active': True,
+        })
+
+        # Un solo hash para todas las cuentas: crear miles de hashes tardaría minutos
+        password = make_password(PASSWORD)
+        usernames = [f'comprador_{i}' for i in range(account_count)]
+        existing = set(User.objects.using(alias).filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.using(alias).bulk_create([
+            User(username=username, email=f'{username}@example.com', password=password)
+            for username in usernames if username not in existing
+        ])
+        User.objects.using(alias).filter(username__in=usernames).update(password=password)
+        return product_ids, usernames
+
+    def report(self, results, elapsed):
+        steps = {}
+        completed = {}
+        requests = 0
+        for thread_steps, thread_completed, thread_requests in results:
+            requests += thread_requests
+            for kind, count in thread_completed.items():
+                completed[kind] = completed.get(kind, 0) + count
+            for name, stats in thread_steps.items():
+                merged = steps.setdefault(name, {'latencies': [], 'errors': 0})
+                merged['latencies'] += stats['latencies']
+                merged['errors'] += stats['errors']
+
+        total_journeys = sum(completed.values())
+        self.stdout.write(
+            f'{elapsed:.1f} s: {requests} requests ({requests / elapsed:.1f} req/s), '
+            f'{total_journeys} recorridos completos ({total_journeys / elapsed:.1f}/s): '
+            + ', '.join(f'{kind} {count}' for kind, count in completed.items())
+        )
+        self.stdout.write(f"\n{'paso':<20}{'veces':>8}{'por s':>8}{'errores':>9}{'% error':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        total_errors = 0
+        for name, stats in steps.items():
+            count = len(stats['latencies'])
+            total_errors += stats['errors']
+            self.stdout.write(
+                f"{name:<20}{count:>8}{count / elapsed:>8.1f}{stats['errors']:>9}"
+                f"{100 * stats['errors'] / count:>8.1f}%"
+                f"{percentile(stats['latencies'], 50):>9.1f}{percentile(stats['latencies'], 99):>9.1f}"
+            )
+        if total_errors:
+            self.stdout.write(self.style.WARNING(f'\n{total_errors} pasos con error'))
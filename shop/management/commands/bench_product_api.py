@@ -0,0 +1,82 @@
+import asyncio
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.benchmarks import http_request, local_server, percentile
+from shop.models import Category, Product
+
+HEADERS = {'Accept-Encoding': 'gzip'}
+
+
+async def fetch_all(url, paths):
+    """GET de cada ruta, en orden, sobre una conexión keep-alive. Devuelve (ms, bytes)."""
+    host, port = url.rsplit('//', 1)[1].split(':')
+    reader, writer = await asyncio.open_connection(host, int(port))
+    size = 0
+    started = time.perf_counter()
+    try:
+        for path in paths:
+            status, headers, body = await http_request(reader, writer, 'GET', path, HEADERS)
+            if status != 200:
+                raise CommandError(f'{path}: respondió {status}')
+            size += len(body)
+            if headers.get('connection') == 'close':
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, int(port))
+    finally:
+        writer.close()
+    return (time.perf_counter() - started) * 1000, size
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara traer N productos como N páginas product_detail contra un solo '
+        'request a /api/productos/ (todos los campos y campos a elección): latencia y bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--batches', default='10,50,100', help='Cantidades de productos por pedido')
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+
+    def handle(self, *args, **options):
+        batches = [int(size) for size in options['batches'].split(',')]
+        rng = random.Random(42)
+        with local_server(options['server'], env={'THROTTLE_ENABLED': '0'}) as (url, alias):
+            ids = self.seed(alias, options['products'], rng)
+            self.stdout.write(f"{'productos':>10} {'modo':<24}{'requests':>9}{'p50 ms':>9}{'p99 ms':>9}{'bytes':>10}")
+            for size in batches:
+                modes = [
+                    ('product_detail (HTML)', lambda sample: [f'/producto/{pk}/' for pk in sample]),
+                    ('api', lambda sample: [f"/api/productos/?ids={','.join(map(str, sample))}"]),
+                    ('api fields=price,stock', lambda sample: [
+                        f"/api/productos/?ids={','.join(map(str, sample))}&fields=price,stock"
+                    ]),
+                ]
+                for name, paths_for in modes:
+                    timings, sizes = [], []
+                    for _ in range(options['rounds']):
+                        paths = paths_for(rng.sample(ids, min(size, len(ids))))
+                        elapsed, body = asyncio.run(fetch_all(url, paths))
+                        timings.append(elapsed)
+                        sizes.append(body)
+                    self.stdout.write(
+                        f'{size:>10} {name:<24}{len(paths):>9}{percentile(timings, 50):>9.1f}'
+                        f'{percentile(timings, 99):>9.1f}{sum(sizes) // len(sizes):>10}'
+                    )
+        self.stdout.write('bytes: promedio por pedido completo, comprimido con gzip si el servidor lo hace')
+
+    def seed(self, alias, count, rng):
+        categories = [Category.objects.using(alias).get_or_create(name=f'Bench {i}')[0] for i in range(5)]
+        missing = count - Product.objects.using(alias).count()
+        if missing > 0:
+            Product.objects.using(alias).bulk_create([
+                Product(name=f'Zapatilla bench {i}', price=rng.randint(20, 200) * 1000, stock=rng.randint(0, 50),
+                        category=rng.choice(categories), description='Producto de benchmark. ' * 20,
+                        **{f'stars_{stars}': rng.randint(0, 30) for stars in range(1, 6)})
+                for i in range(missing)
+            ], batch_size=500)
+        return list(Product.objects.using(alias).values_list('id', flat=True))
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el cálculo de la matriz de co-compras y el top-K sobre items '
+        'sintéticos (sin base de datos), completo e incremental.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000_000)
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('--basket', type=float, default=3, help='Productos promedio por orden')
+        parser.add_argument('--top-k', type=int, default=8)
+        parser.add_argument('--new-items', type=int, default=10_000,
+                            help='Items agregados para la corrida incremental')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+
+            from shop.recommendations import SHIFT, cooccurrence, merge, top_k
+        except ImportError:
+            raise CommandError('bench_recommendations necesita numpy: pip install numpy')
+
+        rng = np.random.default_rng(42)
+        items, new_items = options['items'], options['new_items']
+        orders = int(items / options['basket'])
+        # Popularidad tipo Zipf: pocos productos concentran la mayoría de las ventas
+        weights = 1 / np.arange(1, options['products'] + 1)
+        weights /= weights.sum()
+        order_ids = np.sort(rng.integers(0, orders, items + new_items))
+        product_ids = rng.choice(options['products'], items + new_items, p=weights) + 1
+
+        started = time.perf_counter()
+        pairs, counts = cooccurrence(order_ids[:items], product_ids[:items])
+        matrix_time = time.perf_counter() - started
+        started = time.perf_counter()
+        a, _, _, _ = top_k(pairs, counts, options['top_k'])
+        top_time = time.perf_counter() - started
+        self.stdout.write(
+            f'Completo: {items} items, {orders} órdenes -> {len(pairs)} pares '
+            f'({pairs.nbytes + counts.nbytes >> 20} MB). '
+            f'Matriz {matrix_time:.2f} s, top-{options["top_k"]} {top_time:.2f} s '
+            f'({len(np.unique(a))} productos)'
+        )
+
+        # Incremental: se recalculan solo las órdenes tocadas por los items nuevos
+        started = time.perf_counter()
+        touched = np.isin(order_ids, np.unique(order_ids[items:]))
+        old = touched.copy()
+        old[items:] = False
+        old_pairs, old_counts = cooccurrence(order_ids[old], product_ids[old])
+        new_pairs, new_counts = cooccurrence(order_ids[touched], product_ids[touched])
+        pairs, counts = merge(pairs, counts, new_pairs, new_counts)
+        pairs, counts = merge(pairs, counts, old_pairs, -old_counts)
+        keep = counts > 0
+        pairs, counts = pairs[keep], counts[keep]
+        affected = np.unique(new_pairs >> SHIFT)
+        top_k(pairs, counts, options['top_k'], products=affected)
+        incremental_time = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Incremental: {new_items} items nuevos, {len(affected)} productos afectados '
+            f'en {incremental_time:.2f} s'
+        ))
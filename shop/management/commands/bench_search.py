@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from shop import search
+from shop.benchmarks import percentile
+from shop.views import search_suggestions
+
+BRANDS = ['Nike', 'Adidas', 'Puma', 'Jordan', 'Reebok', 'New Balance', 'Vans', 'Converse', 'Asics', 'Fila']
+MODELS = ['Air', 'Max', 'Zoom', 'Classic', 'Runner', 'Court', 'Street', 'Ultra', 'Boost', 'Retro', 'Pro', 'Lite']
+COLORS = ['Negra', 'Blanca', 'Roja', 'Azul', 'Verde', 'Gris', 'Rosa', 'Naranja']
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia de las sugerencias del buscador con un índice de '
+        'productos sintéticos (sin base de datos).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=20_000)
+        parser.add_argument('--limit', type=int, default=8)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        entries = [(search.CATEGORY, i, f'{brand}') for i, brand in enumerate(BRANDS, start=1)]
+        entries += [
+            (search.PRODUCT, i, f'{rng.choice(BRANDS)} {rng.choice(MODELS)} {rng.randint(1, 999)} {rng.choice(COLORS)}')
+            for i in range(1, options['products'] + 1)
+        ]
+
+        started = time.perf_counter()
+        index = search.SuggestionIndex(entries, version=search.current_version())
+        self.stdout.write(
+            f'Índice de {len(index)} nombres ({len(index.keys)} claves) armado en '
+            f'{time.perf_counter() - started:.2f} s'
+        )
+
+        # Prefijos de 1 a 6 letras de palabras reales, como los tipea un usuario
+        words = [word for _, _, name in entries for word in name.split()]
+        queries = []
+        for _ in range(options['queries']):
+            word = rng.choice(words)
+            queries.append(word[:rng.randint(1, min(6, len(word)))])
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.suggest(query, options['limit'])
+            timings.append((time.perf_counter() - started) * 1000)
+        self.report('suggest()', timings)
+
+        # Request completo a la vista (sin red ni middleware), con el índice ya cargado
+        search._index = index
+        factory = RequestFactory()
+        timings = []
+        for query in queries[:5000]:
+            request = factory.get('/sugerencias/', {'q': query})
+            started = time.perf_counter()
+            search_suggestions(request)
+            timings.append((time.perf_counter() - started) * 1000)
+        search._index = None
+        self.report('vista', timings)
+
+    def report(self, label, timings):
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {len(timings)} consultas, p50 {percentile(timings, 50):.3f} ms, '
+            f'p99 {percentile(timings, 99):.3f} ms, máx {max(timings):.3f} ms'
+        ))
@@ -0,0 +1,94 @@
+import asyncio
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+
+from shop.benchmarks import hammer, http_request, local_server, percentile
+from shop.models import Category, Product
+
+# (nombre, ruta)
+ROUTES = [
+    ('product_list', '/'),
+    ('product_list_filtros', '/?category={category_id}&rating=4'),
+    ('product_detail', '/producto/{product_id}/'),
+    ('sugerencias', '/sugerencias/?q=zap'),
+    ('login', '/login/'),
+]
+
+PROFILES = [
+    ('desarrollo', 'tienda.settings'),
+    ('produccion', 'tienda.settings_production'),
+]
+
+HEADERS = {'Accept-Encoding': 'gzip'}
+
+
+async def fetch_once(url, path):
+    host, port = url.rsplit('//', 1)[1].split(':')
+    reader, writer = await asyncio.open_connection(host, int(port))
+    try:
+        return await http_request(reader, writer, 'GET', path, HEADERS)
+    finally:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara requests/s de las rutas principales con los settings de '
+        'desarrollo y los de producción (tienda/settings_production.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=5, help='Segundos por ruta')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--routes', default=','.join(name for name, _ in ROUTES))
+
+    def handle(self, *args, **options):
+        if options['server'] == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError('--server asgi necesita uvicorn: pip install uvicorn')
+        selected = set(options['routes'].split(','))
+        env = {
+            'DJANGO_SECRET_KEY': get_random_string(50),
+            'DJANGO_ALLOWED_HOSTS': '127.0.0.1',
+            'THROTTLE_ENABLED': '0',
+        }
+
+        self.stdout.write(f"{'ruta':<22}{'perfil':<12}{'req/s':>9}{'errores':>9}"
+                          f"{'p50 ms':>9}{'p99 ms':>9}{'bytes':>9}")
+        for profile, settings_module in PROFILES:
+            with local_server(options['server'], settings_module=settings_module, env=env) as (url, alias):
+                paths = self.seed(alias, options['products'])
+                for name, path in ROUTES:
+                    if name not in selected:
+                        continue
+                    path = path.format(**paths)
+                    status, headers, body = asyncio.run(fetch_once(url, path))
+                    if status != 200:
+                        raise CommandError(f'{profile} {path}: respondió {status}')
+                    size = f"{len(body)}{'z' if headers.get('content-encoding') == 'gzip' else ''}"
+                    result = asyncio.run(hammer(url, path, options['concurrency'], options['duration'], HEADERS))
+                    self.stdout.write(
+                        f"{name:<22}{profile:<12}"
+                        f"{result['requests'] / options['duration']:>9.0f}{result['errors']:>9}"
+                        f"{percentile(result['latencies'], 50):>9.1f}"
+                        f"{percentile(result['latencies'], 99):>9.1f}{size:>9}"
+                    )
+        self.stdout.write('bytes: tamaño de la respuesta; "z" indica que viajó comprimida con gzip')
+
+    def seed(self, alias, product_count):
+        category, _ = Category.objects.using(alias).get_or_create(name='Bench')
+        missing = product_count - Product.objects.using(alias).count()
+        if missing > 0:
+            Product.objects.using(alias).bulk_create([
+                Product(name=f'Zapatilla bench {i}', price=random.randint(20, 200) * 1000,
+                        category=category, description='Producto de benchmark')
+                for i in range(missing)
+            ])
+        product_id = Product.objects.using(alias).order_by('id').values_list('id', flat=True).first()
+        return {'category_id': category.pk, 'product_id': product_id}
@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from shop.benchmarks import percentile, run_threads, temporary_database
+from shop.models import Category, Coupon, Notification, Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark multi-hilo de checkout y navegación sobre SQLite, comparando '
+        'la configuración por defecto con SQLITE_PRODUCTION_OPTIONS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10, help='Segundos por perfil')
+        parser.add_argument('--write-ratio', type=float, default=0.3,
+                            help='Proporción de operaciones que son checkouts')
+        parser.add_argument('--products', type=int, default=500)
+
+    def handle(self, *args, **options):
+        profiles = [
+            ('default', {}),
+            ('production', settings.SQLITE_PRODUCTION_OPTIONS),
+        ]
+        rows = []
+        for name, db_options in profiles:
+            with temporary_database(f'bench_{name}', db_options) as alias:
+                self.seed(alias, options['products'], options['threads'])
+                rows.append((name, self.run(alias, options)))
+
+        self.stdout.write('')
+        self.stdout.write(f"{'perfil':<12}{'ops/s':>9}{'checkouts':>11}{'browse':>9}"
+                          f"{'locked':>8}{'p50 ms':>9}{'p99 ms':>9}")
+        for name, result in rows:
+            self.stdout.write(
+                f"{name:<12}{result['throughput']:>9.0f}{result['checkouts']:>11}"
+                f"{result['browses']:>9}{result['locked']:>8}"
+                f"{result['p50']:>9.1f}{result['p99']:>9.1f}"
+            )
+
+    def seed(self, alias, product_count, user_count):
+        categories = Category.objects.using(alias).bulk_create(
+            [Category(name=f'Categoría {i}') for i in range(10)]
+        )
+        Product.objects.using(alias).bulk_create([
+            Product(name=f'Zapatilla {i}', price=random.randint(20, 200) * 1000,
+                    category=categories[i % len(categories)])
+            for i in range(product_count)
+        ])
+        User.objects.using(alias).bulk_create([
+            User(username=f'bench{i}', password='!') for i in range(user_count)
+        ])
+        now = timezone.now()
+        Coupon.objects.using(alias).create(
+            code='BENCH', discount_type='percent', discount_value=10, max_uses=10**9,
+            valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1),
+        )
+
+    def run(self, alias, options):
+        product_ids = list(Product.objects.using(alias).values_list('id', flat=True))
+        user_ids = list(User.objects.using(alias).values_list('id', flat=True))
+        coupon = Coupon.objects.using(alias).get(code='BENCH')
+        write_ratio = options['write_ratio']
+
+        def worker(stop, index):
+            rng = random.Random(index)
+            stats = {'checkouts': 0, 'browses': 0, 'locked': 0, 'latencies': []}
+            user_id = user_ids[index % len(user_ids)]
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        if rng.random() < write_ratio:
+                            self.checkout(alias, user_id, rng.sample(product_ids, 3), coupon.pk)
+                            stats['checkouts'] += 1
+                        else:
+                            self.browse(alias, rng.choice(product_ids))
+                            stats['browses'] += 1
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        stats['locked'] += 1
+                    stats['latencies'].append((time.perf_counter() - started) * 1000)
+            finally:
+                connections[alias].close()
+            return stats
+
+        started = time.perf_counter()
+        results = run_threads(worker, options['threads'], options['duration'])
+        elapsed = time.perf_counter() - started
+        latencies = [value for result in results for value in result['latencies']]
+        checkouts = sum(result['checkouts'] for result in results)
+        browses = sum(result['browses'] for result in results)
+        return {
+            'checkouts': checkouts,
+            'browses': browses,
+            'locked': sum(result['locked'] for result in results),
+            'throughput': (checkouts + browses) / elapsed,
+            'p50': percentile(latencies, 50),
+            'p99': percentile(latencies, 99),
+        }
+
+    def browse(self, alias, product_id):
+        # Equivalente a product_list + product_detail
+        list(Product.objects.using(alias).select_related('category')[:24])
+        product = Product.objects.using(alias).get(pk=product_id)
+        list(product.reviews.all())
+
+    def checkout(self, alias, user_id, product_ids, coupon_id):
+        # Mismas escrituras que la vista checkout: orden, items, cupón y notificación
+        with transaction.atomic(using=alias):
+            coupon = Coupon.objects.using(alias).get(pk=coupon_id)
+            products = list(Product.objects.using(alias).select_related('category').filter(pk__in=product_ids))
+            subtotal = sum(product.price for product in products)
+            discount = coupon.calculate_discount(subtotal)
+            order = Order.objects.using(alias).create(
+                user_id=user_id, full_name='Bench', address='Calle 123', city='CABA',
+                phone='0', payment_method='cash', coupon_id=coupon_id,
+                discount=discount, subtotal=subtotal, total=subtotal - discount,
+                status='confirmed',
+            )
+            OrderItem.objects.using(alias).bulk_create([
+                OrderItem.for_product(product, order=order, quantity=1, price=product.price)
+                for product in products
+            ])
+            Coupon.objects.using(alias).filter(pk=coupon_id).update(times_used=F('times_used') + 1)
+            Notification.objects.using(alias).create(
+                user_id=user_id, notification_type='order',
+                title=f'Orden #{order.id} confirmada', message='Bench',
+            )
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los scores RFM de cada cliente y la retención por cohortes '
+        'mensuales, leyendo las órdenes de a bloques. Pensado para correr de noche (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200_000, help='Órdenes por bloque')
+
+    def handle(self, *args, **options):
+        try:
+            from shop.analytics import build_customer_analytics
+        except ImportError:
+            raise CommandError('build_customer_analytics necesita numpy: pip install numpy')
+
+        started = time.perf_counter()
+        report = build_customer_analytics(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['orders']} órdenes, {report['customers']} clientes, "
+            f"{len(report['cohorts'])} cohortes en {elapsed:.1f} s"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza las recomendaciones "también compraron" a partir de la matriz '
+        'de co-compras. Por defecto procesa solo los items nuevos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Reconstruir la matriz desde cero (descuenta las órdenes canceladas después de contarse)')
+        parser.add_argument('--top-k', type=int, default=settings.RECOMMENDATIONS_PER_PRODUCT)
+        parser.add_argument('--max-basket', type=int, default=50,
+                            help='Ignorar órdenes con más productos distintos que esto')
+
+    def handle(self, *args, **options):
+        try:
+            from shop.recommendations import build_recommendations
+        except ImportError:
+            raise CommandError('build_recommendations necesita numpy: pip install numpy')
+
+        started = time.perf_counter()
+        stats = build_recommendations(
+            full=options['full'], k=options['top_k'], max_basket=options['max_basket'],
+        )
+        elapsed = time.perf_counter() - started
+        if not stats['items']:
+            self.stdout.write('No hay items nuevos desde la última corrida')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['items']} items procesados en {elapsed:.1f} s: "
+            f"{stats['pairs']} pares en la matriz, {stats['products']} productos actualizados"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop.orders import expire_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        'Cancela las órdenes de MercadoPago que no se pagaron antes de que '
+        'venciera su reserva y devuelve el stock. Pensado para correr por cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        expired = expire_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{expired} reservas vencidas canceladas'))
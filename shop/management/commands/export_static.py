@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop.static_export import export_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta el catálogo (listados y páginas de producto, HTML y JSON) a un '
+        'directorio para servirlo desde un CDN. Solo regenera las páginas que cambiaron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.STATIC_EXPORT_DIR, help='Directorio de salida')
+        parser.add_argument('--page-size', type=int, default=settings.STATIC_EXPORT_PAGE_SIZE,
+                            help='Productos por página de listado')
+        parser.add_argument('--force', action='store_true', help='Regenerar todas las páginas')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = export_catalog(options['output'], options['page_size'], force=options['force'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rendered']} páginas generadas, {result['skipped']} sin cambios, "
+            f"{result['removed']} borradas en {time.perf_counter() - started:.1f} s ({options['output']})"
+        ))
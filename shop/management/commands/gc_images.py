@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.models import ArchivedOrderItem, OrderItem, Product
+from shop.storage import TEMP_DIR
+
+# (modelo, campo) que guardan nombres de imágenes del storage
+REFERENCES = [
+    (Product, 'image'),
+    (OrderItem, 'product_image'),
+    (ArchivedOrderItem, 'product_image'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra del storage las imágenes que no usa ningún producto ni ningún item '
+        'de orden (copia del producto al comprar), y las escrituras a medio hacer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='No tocar archivos más nuevos (subidas en curso)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo listar lo que se borraría')
+
+    def handle(self, *args, **options):
+        storage = Product.image.field.storage
+        referenced = set()
+        for model, field in REFERENCES:
+            names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            referenced.update(names.values_list(field, flat=True).distinct().iterator())
+
+        cutoff = time.time() - options['min_age_hours'] * 3600
+        removed = freed = kept = 0
+        for directory in (Product.image.field.upload_to.rstrip('/'), TEMP_DIR):
+            root = storage.path(directory)
+            # De abajo hacia arriba, para poder borrar las carpetas que quedan vacías
+            for path, _, files in os.walk(root, topdown=False):
+                for filename in files:
+                    full_path = os.path.join(path, filename)
+                    name = os.path.relpath(full_path, storage.location).replace(os.sep, '/')
+                    if name in referenced or os.path.getmtime(full_path) > cutoff:
+                        kept += 1
+                        continue
+                    removed += 1
+                    freed += os.path.getsize(full_path)
+                    if options['dry_run']:
+                        self.stdout.write(f'  {name}')
+                    else:
+                        os.remove(full_path)
+                if path != root and not options['dry_run'] and not os.listdir(path):
+                    os.rmdir(path)
+
+        action = 'se borrarían' if options['dry_run'] else 'borrados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{removed} archivos {action} ({freed / 1024 / 1024:.1f} MB), {kept} en uso o recientes'
+        ))
@@ -0,0 +1,62 @@
+import csv
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.catalog_import import ENCODING, CatalogImporter, RowError, check_encoding, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa el catálogo de un proveedor desde CSV o JSONL haciendo upsert '
+        'por sku, en lotes y con memoria constante.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo .csv o .jsonl')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Por defecto se deduce de la extensión')
+        parser.add_argument('--images', help='Directorio con las imágenes referenciadas')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--errors', help='Guardar los errores por fila en este CSV')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        errors_file = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else None
+        if errors_file:
+            errors_writer = csv.writer(errors_file)
+            errors_writer.writerow(['linea', 'sku', 'error'])
+
+        def on_error(line_no, sku, message):
+            if errors_file:
+                errors_writer.writerow([line_no, sku or '', message])
+            else:
+                self.stderr.write(f'Línea {line_no} ({sku or "sin sku"}): {message}')
+
+        def on_progress(report):
+            self.stdout.write(f'{report.rows} filas leídas...', ending='\r')
+
+        importer = CatalogImporter(
+            image_dir=options['images'],
+            batch_size=options['batch_size'],
+            on_error=on_error,
+            on_progress=on_progress,
+        )
+        try:
+            with open(options['path'], 'rb') as binary:
+                check_encoding(binary)
+                stream = io.TextIOWrapper(binary, encoding=ENCODING, newline='')
+                report = importer.run(read_rows(stream, fmt))
+        except (OSError, RowError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.rows} filas en {report.elapsed:.1f} s ({report.rows_per_second:.0f} filas/s): '
+            f'{report.created} creados, {report.updated} actualizados, '
+            f'{report.unchanged} sin cambios, {report.error_count} con error, '
+            f'{report.without_image} guardados sin imagen'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from shop.price_alerts import send_price_drop_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        'Avisa a los usuarios cuando baja el precio de un producto de su lista '
+        'de deseos. Procesa solo los productos que cambiaron desde la última corrida.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo contar los avisos, sin crearlos ni mover el checkpoint')
+
+    def handle(self, *args, **options):
+        products, sent = send_price_drop_alerts(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'se enviarían' if options['dry_run'] else 'enviados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{products} productos con cambio de precio, {sent} avisos {verb}'
+        ))
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.slow_queries import aggregate, log_files
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'count': 'count',
+    'max': 'max_ms',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Resume el log de consultas lentas (incluidas sus rotaciones): las N '
+        'consultas más caras agrupadas por SQL normalizado y callsite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=list(SORT_KEYS), default='total',
+                            help='total: tiempo acumulado; count: cantidad; max: peor caso')
+        parser.add_argument('--file', help='Log a leer (por defecto SLOW_QUERY_LOG_FILE)')
+
+    def handle(self, *args, **options):
+        files = log_files(options['file'] or settings.SLOW_QUERY_LOG_FILE)
+        if not files:
+            raise CommandError('No hay log de consultas lentas')
+
+        def lines():
+            for path in files:
+                with open(path, encoding='utf-8') as log:
+                    yield from log
+
+        groups = aggregate(lines())
+        key = SORT_KEYS[options['sort']]
+        groups.sort(key=lambda group: group[key], reverse=True)
+        total = sum(group['count'] for group in groups)
+        self.stdout.write(f'{total} consultas lentas en {len(files)} archivo(s), {len(groups)} grupos\n')
+
+        self.stdout.write(f"{'total ms':>10} {'veces':>6} {'prom ms':>8} {'peor ms':>8}  callsite")
+        for group in groups[:options['top']]:
+            callsite = group['callsite'] or '(fuera del proyecto)'
+            if group['template']:
+                callsite += f" · {group['template']}"
+            self.stdout.write(
+                f"{group['total_ms']:>10.1f} {group['count']:>6} {group['avg_ms']:>8.1f} "
+                f"{group['max_ms']:>8.1f}  {callsite}"
+            )
+            self.stdout.write(f"{'':>36}  [{group['fingerprint']}] {group['sql'][:200]}")
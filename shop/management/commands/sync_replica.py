@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = 'Copia la base primaria SQLite a la réplica de lectura (reemplazo local de la replicación).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Repetir cada N segundos (0 = una sola copia)')
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if not alias:
+            raise CommandError('No hay réplica configurada: definí DB_REPLICA_PATH')
+        primary = settings.DATABASES['default']
+        replica = settings.DATABASES[alias]
+        for db in (primary, replica):
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('sync_replica solo soporta SQLite')
+
+        while True:
+            started = time.perf_counter()
+            self.copy(primary['NAME'], replica['NAME'])
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'Réplica sincronizada en {elapsed:.0f} ms')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, target_path):
+        # La API de backup de SQLite copia un snapshot consistente aunque haya
+        # escrituras en curso en el primario.
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,60 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shop.models import Order
+from shop.orders import allowed_sources, transition_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Cambia el estado de muchas órdenes a la vez (un UPDATE por lote) y '
+        'notifica a los clientes. Ej: transition_orders --from confirmed --to shipped --date 2025-11-25'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', required=True, dest='new_status',
+                            choices=[status for status, _ in Order.STATUS_CHOICES])
+        parser.add_argument('--from', dest='old_status',
+                            choices=[status for status, _ in Order.STATUS_CHOICES])
+        parser.add_argument('--ids', help='Ids separados por coma')
+        parser.add_argument('--date', help='Solo órdenes creadas ese día (AAAA-MM-DD)')
+        parser.add_argument('--before', help='Solo órdenes creadas antes de ese día (AAAA-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar cuántas órdenes cambiarían')
+
+    def handle(self, *args, **options):
+        new_status = options['new_status']
+        sources = allowed_sources(new_status)
+        queryset = Order.objects.all()
+
+        if options['old_status']:
+            if options['old_status'] not in sources:
+                raise CommandError(f"No se puede pasar de '{options['old_status']}' a '{new_status}'")
+            queryset = queryset.filter(status=options['old_status'])
+        if options['ids']:
+            queryset = queryset.filter(pk__in=[int(pk) for pk in options['ids'].split(',')])
+        if options['date']:
+            day = self.parse_day(options['date'])
+            queryset = queryset.filter(created_at__gte=day, created_at__lt=day + timedelta(days=1))
+        if options['before']:
+            queryset = queryset.filter(created_at__lt=self.parse_day(options['before']))
+
+        if options['dry_run']:
+            eligible = queryset.filter(status__in=sources).count()
+            self.stdout.write(f'{eligible} órdenes pasarían a {new_status} '
+                              f'({queryset.count() - eligible} no lo admiten)')
+            return
+
+        updated, skipped = transition_orders(queryset, new_status, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{updated} órdenes pasaron a {new_status}'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'{skipped} órdenes no admiten esa transición'))
+
+    def parse_day(self, value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {value} (usar AAAA-MM-DD)')
+        return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,137 @@
+import asyncio
+import math
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from . import profiling, throttling
+from .routers import replica_alias, set_replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Vistas de solo lectura que pueden servirse desde la réplica
+REPLICA_READ_VIEWS = {
+    'product_list',
+    'catalog_page',
+    'category_page',
+    'product_detail',
+    'admin_dashboard',
+    'order_history',
+    'export_orders_csv',
+    # Vistas async: la bandera pasa a sus consultas junto con el contexto de sync_to_async
+    'async_product_list',
+    'async_product_detail',
+    'async_wishlist',
+    'async_get_unread_count',
+}
+
+PIN_SESSION_KEY = '_db_primary_until'
+
+
+def _read_from_replica(chunks):
+    """
+    Itera `chunks` con las lecturas a la réplica habilitadas. El generador de
+    una StreamingHttpResponse corre después de process_response, y en ASGI
+    cada vuelta puede correr en otro contexto: se habilita en cada una.
+    """
+    iterator = iter(chunks)
+    while True:
+        set_replica_reads(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            set_replica_reads(False)
+        yield chunk
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Habilita las lecturas desde la réplica para las vistas de REPLICA_READ_VIEWS.
+    Después de un POST la sesión queda "pegada" al primario durante
+    REPLICA_STICKY_SECONDS, así el usuario ve enseguida lo que acaba de escribir.
+    Solo se pega una sesión que ya existe (o que la vista acaba de escribir):
+    un POST anónimo no crea sesión ni cookie.
+    """
+
+    def process_request(self, request):
+        set_replica_reads(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_alias() or request.method not in SAFE_METHODS:
+            return None
+        views = getattr(settings, 'REPLICA_READ_VIEWS', REPLICA_READ_VIEWS)
+        if request.resolver_match.url_name not in views:
+            return None
+        if request.session.get(PIN_SESSION_KEY, 0) > time.time():
+            return None
+        set_replica_reads(True)
+        request._replica_reads = True
+        return None
+
+    def process_response(self, request, response):
+        set_replica_reads(False)
+        if getattr(request, '_replica_reads', False) and response.streaming and not response.is_async:
+            response.streaming_content = _read_from_replica(response.streaming_content)
+        session = getattr(request, 'session', None)
+        if replica_alias() and request.method not in SAFE_METHODS and session is not None and not session.is_empty():
+            sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+            session[PIN_SESSION_KEY] = time.time() + sticky
+        return response
+
+
+class ThrottleMiddleware(MiddlewareMixin):
+    """Aplica THROTTLE_BUDGETS a la ruta resuelta. Va después de AuthenticationMiddleware."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(settings, 'THROTTLE_ENABLED', True):
+            return None
+        route = request.resolver_match.url_name
+        budgets = throttling.get_budgets().get(route)
+        if not budgets:
+            return None
+        budgets = [budget for budget in budgets if request.method in budget.methods]
+        if not budgets:
+            return None
+        keys = []
+        for budget in budgets:
+            # request.user se evalúa solo si hay un presupuesto por usuario
+            if budget.scope == 'user' and request.user.is_authenticated:
+                ident = f'u{request.user.pk}'
+            else:
+                ident = throttling.client_ip(request)
+            keys.append(f'throttle:{route}:{budget.scope}:{ident}')
+        # Se mira cada balde antes de gastar: si uno rechaza, los demás no pierden la ficha
+        backend = throttling.get_backend()
+        waits = backend.consume(keys, budgets, time.time())
+        if not any(waits):
+            return None
+        for budget, wait in zip(budgets, waits):
+            if wait:
+                backend.incr(throttling.shed_key(route, budget.scope))
+        response = HttpResponse(
+            'Demasiados pedidos. Probá de nuevo en unos segundos.',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(math.ceil(max(waits)))
+        return response
+
+
+class ProfilerMiddleware(MiddlewareMixin):
+    """
+    Perfila la vista cuando un staff lo pide con ?_profile=1 o el header
+    X-Profile (ver shop/profiling.py). Va última, así corre después del resto
+    de los process_view.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not profiling.requested(request) or not getattr(settings, 'PROFILER_ENABLED', True):
+            return None
+        if not request.user.is_staff or asyncio.iscoroutinefunction(view_func):
+            return None
+        response, profile_id = profiling.run_profiled(request, view_func, view_args, view_kwargs)
+        response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
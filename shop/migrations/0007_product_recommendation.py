@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='shop.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.product')),
+            ],
+            options={
+                'ordering': ['product', 'rank'],
+                'unique_together': {('product', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_histograms(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+    db_alias = schema_editor.connection.alias
+    histograms = {}
+    rows = Review.objects.using(db_alias).values_list('product_id', 'rating').annotate(total=models.Count('id')).order_by()
+    for product_id, rating, total in rows:
+        histograms.setdefault(product_id, {})[f'stars_{rating}'] = total
+    for product_id, histogram in histograms.items():
+        Product.objects.using(db_alias).filter(pk=product_id).update(**histogram)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_recommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+        ),
+        migrations.RunPython(fill_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:29
+
+from django.db import migrations, models
+
+
+def fill_notified_prices(apps, schema_editor):
+    # Las wishlists existentes toman como referencia el precio actual
+    Product = apps.get_model('shop', 'Product')
+    Wishlist = apps.get_model('shop', 'Wishlist')
+    db_alias = schema_editor.connection.alias
+    price = Product.objects.using(db_alias).filter(pk=models.OuterRef('product_id')).values('price')
+    Wishlist.objects.using(db_alias).filter(notified_price__isnull=True).update(notified_price=models.Subquery(price))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_review_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='notified_price',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_notified_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_price_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='Vacío: sin control de stock', null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('computed_at', models.DateTimeField()),
+                ('data', models.JSONField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerRFM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recency_days', models.PositiveIntegerField()),
+                ('frequency', models.PositiveIntegerField()),
+                ('monetary', models.FloatField()),
+                ('r_score', models.PositiveSmallIntegerField()),
+                ('f_score', models.PositiveSmallIntegerField()),
+                ('m_score', models.PositiveSmallIntegerField()),
+                ('segment', models.CharField(choices=[('champions', 'Campeones'), ('new', 'Nuevos'), ('loyal', 'Leales'), ('promising', 'Prometedores'), ('at_risk', 'En riesgo'), ('hibernating', 'Hibernando'), ('lost', 'Perdidos')], db_index=True, max_length=20)),
+                ('cohort', models.DateField()),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rfm', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_customer_analytics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('paid', 'Pagado'), ('confirmed', 'Confirmado'), ('shipped', 'Enviado'), ('delivered', 'Entregado'), ('cancelled', 'Cancelado')], default='pending', max_length=20)),
+                ('full_name', models.CharField(max_length=200)),
+                ('address', models.CharField(max_length=300)),
+                ('city', models.CharField(max_length=100)),
+                ('phone', models.CharField(max_length=50)),
+                ('payment_method', models.CharField(choices=[('cash', 'Efectivo'), ('card', 'Tarjeta de Crédito'), ('transfer', 'Transferencia'), ('mercadopago', 'MercadoPago')], max_length=20)),
+                ('mp_preference_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('mp_payment_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('stock_reserved', models.BooleanField(default=False)),
+                ('reserved_until', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('discount', models.FloatField(default=0)),
+                ('subtotal', models.FloatField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('coupon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shop.coupon')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('price', models.FloatField()),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='shop.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.product')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 5000
+
+
+def fill_snapshots(apps, schema_editor):
+    # Un UPDATE con subconsultas por lote de ids: sin cargar items ni productos en memoria
+    Product = apps.get_model('shop', 'Product')
+    db_alias = schema_editor.connection.alias
+    product = Product.objects.using(db_alias).filter(pk=OuterRef('product_id'))
+
+    def copied(column):
+        return Coalesce(Subquery(product.values(column)[:1]), Value(''))
+
+    for model_name in ('OrderItem', 'ArchivedOrderItem'):
+        items = apps.get_model('shop', model_name).objects.using(db_alias)
+        last_id = 0
+        while True:
+            ids = list(items.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+            if not ids:
+                break
+            items.filter(pk__in=ids).update(
+                product_name=copied('name'), product_image=copied('image'), category_name=copied('category__name'),
+            )
+            last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product_image',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='archivedorderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shop.product'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='shop.product'),
+        ),
+        migrations.RunPython(fill_snapshots, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
+from django.db.models import Avg, Count
+from django.utils import timezone
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name_plural = "Categories"
@@ -12,24 +14,89 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def with_ratings(self):
+        # Promedio y cantidad de reviews en la misma consulta (evita una query por producto)
+        return self.annotate(rating_avg=Avg('reviews__rating'), rating_count=Count('reviews'))
+
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # clave del proveedor
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     price = models.FloatField()
+    stock = models.PositiveIntegerField(null=True, blank=True, help_text='Vacío: sin control de stock')
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    # Último cambio de precio (lo usa send_price_alerts para procesar solo lo que cambió)
+    price_changed_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    # Histograma de reviews por estrellas, mantenido por las señales de Review
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+    # Cualquier cambio que se ve en sus páginas, incluidas sus reviews y su stock.
+    # Los UPDATE directos (señales de Review, stock) lo actualizan a mano.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
 
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Precio con el que se leyó, para detectar cambios al guardar
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        loaded_price = getattr(self, '_loaded_price', None)
+        if loaded_price is not None and self.price != loaded_price:
+            self.price_changed_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'price_changed_at'}
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
+        super().save(*args, **kwargs)
+        self._loaded_price = self.price
+    
+    @property
+    def star_counts(self):
+        return [getattr(self, f'stars_{stars}') for stars in range(1, 6)]
+    
     @property
     def average_rating(self):
-        avg = self.reviews.aggregate(Avg('rating'))['rating__avg']
+        if hasattr(self, 'rating_avg'):
+            avg = self.rating_avg
+        else:
+            counts = self.star_counts
+            avg = sum(stars * count for stars, count in enumerate(counts, start=1)) / sum(counts) if any(counts) else 0
         return round(avg, 1) if avg else 0
     
     @property
     def review_count(self):
-        return self.reviews.count()
+        if hasattr(self, 'rating_count'):
+            return self.rating_count
+        return sum(self.star_counts)
+    
+    @property
+    def rating_histogram(self):
+        """[(estrellas, cantidad, porcentaje)] de 5 a 1."""
+        total = self.review_count
+        return [
+            (stars, count, round(count * 100 / total) if total else 0)
+            for stars, count in reversed(list(enumerate(self.star_counts, start=1)))
+        ]
+    
+    def refresh_rating_histogram(self):
+        """Recalcula el histograma desde las reviews (por si quedó desfasado)."""
+        counts = dict(self.reviews.values_list('rating').annotate(total=Count('id')).order_by())
+        histogram = {f'stars_{stars}': counts.get(stars, 0) for stars in range(1, 6)}
+        Product.objects.filter(pk=self.pk).update(updated_at=timezone.now(), **histogram)
+        for field, value in histogram.items():
+            setattr(self, field, value)
 
 # ===== REVIEWS =====
 class Review(models.Model):
@@ -37,26 +104,53 @@ class Review(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('product', 'user')  # Un usuario solo puede dejar una review por producto
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Paginación por cursor de las reviews de un producto
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name} ({self.rating}⭐)"
 
+# ===== RECOMENDACIONES =====
+class ProductRecommendation(models.Model):
+    # Top-K de productos comprados junto con `product` (ver build_recommendations)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField()  # órdenes en las que se compraron juntos
+    
+    class Meta:
+        unique_together = ('product', 'rank')
+        ordering = ['product', 'rank']
+    
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
+
 # ===== WISHLIST =====
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wishlists')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     added_at = models.DateTimeField(auto_now_add=True)
+    # Precio que el usuario ya conoce: se avisa solo si baja de este valor
+    notified_price = models.FloatField(null=True, blank=True)
     
     class Meta:
         unique_together = ('user', 'product')
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name}"
+    
+    def save(self, *args, **kwargs):
+        if self.notified_price is None and self.product_id:
+            self.notified_price = self.product.price
+        super().save(*args, **kwargs)
 
 # ===== CUPONES =====
 class Coupon(models.Model):
@@ -108,7 +202,7 @@ class Notification(models.Model):
     title = models.CharField(max_length=200)
     message = models.TextField()
     read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -117,7 +211,8 @@ class Notification(models.Model):
         return f"{self.title} - {self.user.username}"
 
 # ===== ORDENES =====
-class Order(models.Model):
+class BaseOrder(models.Model):
+    # Campos comunes a Order y ArchivedOrder
     STATUS_CHOICES = [
         ('pending', 'Pendiente'),
         ('paid', 'Pagado'),
@@ -134,8 +229,18 @@ class Order(models.Model):
         ('mercadopago', 'MercadoPago'),
     ]
     
+    # Estados a los que puede pasar una orden desde cada estado
+    STATUS_TRANSITIONS = {
+        'pending': ['paid', 'confirmed', 'cancelled'],
+        'paid': ['confirmed', 'shipped', 'cancelled'],
+        'confirmed': ['shipped', 'cancelled'],
+        'shipped': ['delivered'],
+        'delivered': [],
+        'cancelled': [],
+    }
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
     # Datos de envío
@@ -151,6 +256,11 @@ class Order(models.Model):
     mp_preference_id = models.CharField(max_length=100, blank=True, null=True)
     mp_payment_id = models.CharField(max_length=100, blank=True, null=True)
     
+    # Stock: la orden retiene unidades hasta que se cancela; las pendientes de
+    # pago las liberan solas al pasar reserved_until (expire_reservations)
+    stock_reserved = models.BooleanField(default=False)
+    reserved_until = models.DateTimeField(null=True, blank=True, db_index=True)
+    
     # Cupón
     coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True)
     discount = models.FloatField(default=0)
@@ -158,21 +268,78 @@ class Order(models.Model):
     subtotal = models.FloatField(default=0)
     total = models.FloatField(default=0)
     
+    class Meta:
+        abstract = True
+    
     def __str__(self):
         return f"Orden #{self.id} - {self.user.username}"
 
-class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+class Order(BaseOrder):
+    pass
+
+class BaseOrderItem(models.Model):
+    # Si el producto se borra el item queda, con los datos copiados al comprar
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.PositiveIntegerField(default=1)
     price = models.FloatField()
     
+    # Copia del producto al momento de la compra: el historial no cambia si
+    # después se renombra o se borra, y se muestra sin JOIN al catálogo
+    product_name = models.CharField(max_length=100, blank=True)
+    product_image = models.CharField(max_length=100, blank=True)  # nombre en el storage de Product.image
+    category_name = models.CharField(max_length=100, blank=True)
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def for_product(cls, product, **kwargs):
+        """Item de `product` con la copia de sus datos (conviene traerlo con select_related('category'))."""
+        return cls(product=product, **snapshot_fields(product), **kwargs)
+    
+    def save(self, *args, **kwargs):
+        if not self.product_name and self.product_id:
+            for field, value in snapshot_fields(self.product).items():
+                setattr(self, field, value)
+        super().save(*args, **kwargs)
+    
+    @property
+    def product_image_url(self):
+        return Product.image.field.storage.url(self.product_image) if self.product_image else ''
+    
     @property
     def subtotal(self):
+        # Las filas vacías del inline del admin todavía no tienen precio
+        if self.price is None:
+            return 0
         return self.price * self.quantity
     
     def __str__(self):
-        return f"{self.quantity}x {self.product.name}"
+        return f"{self.quantity}x {self.product_name}"
+
+def snapshot_fields(product):
+    return {
+        'product_name': product.name,
+        'product_image': product.image.name or '',
+        'category_name': product.category.name if product.category_id else '',
+    }
+
+class OrderItem(BaseOrderItem):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+
+# ===== ARCHIVO DE ÓRDENES =====
+class ArchivedOrder(BaseOrder):
+    """
+    Orden entregada o cancelada hace tiempo, movida fuera de Order por
+    archive_orders. Conserva la id original, así sus URLs siguen andando.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField(db_index=True)  # se copia tal cual, sin auto_now_add
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+class ArchivedOrderItem(BaseOrderItem):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -182,3 +349,48 @@ class Profile(models.Model):
     
     def __str__(self):
         return f"Perfil de {self.user.username}"
+
+# ===== TAREAS PROGRAMADAS =====
+class JobCheckpoint(models.Model):
+    # Hasta dónde llegó la última corrida de una tarea incremental
+    name = models.CharField(max_length=100, unique=True)
+    position = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+# ===== ANALÍTICA DE CLIENTES =====
+class CustomerRFM(models.Model):
+    """Scores RFM de cada cliente con compras, recalculados por build_customer_analytics."""
+    SEGMENT_CHOICES = [
+        ('champions', 'Campeones'),
+        ('new', 'Nuevos'),
+        ('loyal', 'Leales'),
+        ('promising', 'Prometedores'),
+        ('at_risk', 'En riesgo'),
+        ('hibernating', 'Hibernando'),
+        ('lost', 'Perdidos'),
+    ]
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='rfm')
+    recency_days = models.PositiveIntegerField()  # días desde la última compra
+    frequency = models.PositiveIntegerField()  # cantidad de órdenes
+    monetary = models.FloatField()  # total gastado
+    r_score = models.PositiveSmallIntegerField()
+    f_score = models.PositiveSmallIntegerField()
+    m_score = models.PositiveSmallIntegerField()
+    segment = models.CharField(max_length=20, choices=SEGMENT_CHOICES, db_index=True)
+    cohort = models.DateField()  # mes de la primera compra
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.r_score}{self.f_score}{self.m_score} ({self.segment})"
+
+class AnalyticsReport(models.Model):
+    # Resultado agregado de una tarea de analítica (segmentos, cohortes) como JSON
+    name = models.CharField(max_length=100, unique=True)
+    computed_at = models.DateTimeField()
+    data = models.JSONField()
+    
+    def __str__(self):
+        return f"{self.name} ({self.computed_at})"
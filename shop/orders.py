@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Coupon, Notification, Order, OrderItem
+from .stock import release_stock, reserve_stock
+
+# Cómo se anuncia cada estado en la notificación al cliente
+STATUS_NOTIFICATION_LABELS = {
+    'paid': 'pagada',
+    'confirmed': 'confirmada',
+    'shipped': 'enviada',
+    'delivered': 'entregada',
+    'cancelled': 'cancelada',
+}
+
+
+def allowed_sources(new_status):
+    """Estados desde los que se puede pasar a `new_status`."""
+    if new_status not in dict(Order.STATUS_CHOICES):
+        raise ValueError(f'Estado desconocido: {new_status}')
+    return [status for status, targets in Order.STATUS_TRANSITIONS.items() if new_status in targets]
+
+
+def transition_orders(queryset, new_status, batch_size=500):
+    """
+    Pasa a `new_status` las órdenes de `queryset` cuyo estado actual lo permite.
+    Trabaja en lotes de `batch_size`: un UPDATE, la relectura de las que
+    cambiaron y un bulk_create de notificaciones por lote, todo dentro de una
+    sola transacción.
+    Devuelve (actualizadas, salteadas).
+    """
+    sources = allowed_sources(new_status)
+    label = STATUS_NOTIFICATION_LABELS.get(new_status, new_status)
+    # select_for_update traba el lote hasta el UPDATE (en SQLite no hace nada)
+    eligible = queryset.filter(status__in=sources).select_for_update().order_by('pk').values_list('pk', flat=True)
+    updated = 0
+
+    with transaction.atomic():
+        total = queryset.count()
+        while True:
+            # Las órdenes actualizadas dejan de cumplir el filtro, así que
+            # cada vuelta trae el lote siguiente sin necesidad de un cursor.
+            batch = list(eligible[:batch_size])
+            if not batch:
+                break
+            if not Order.objects.filter(pk__in=batch, status__in=sources).update(status=new_status):
+                continue
+            # Se avisa solo a las que pasó este UPDATE: una que cambió de
+            # estado en el medio quedó afuera
+            changed = list(
+                Order.objects.filter(pk__in=batch, status=new_status).values_list('pk', 'user_id', 'total')
+            )
+            updated += len(changed)
+            if new_status == 'cancelled':
+                release_stock([pk for pk, _, _ in changed])
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    notification_type='order',
+                    title=f'Orden #{pk} {label}',
+                    message=f'Tu orden por ${order_total} fue {label}.',
+                )
+                for pk, user_id, order_total in changed
+            ], batch_size=batch_size)
+
+    return updated, total - updated
+
+
+def place_order(user, items, payment_method, coupon=None, discount=0, using=DEFAULT_DB_ALIAS, **shipping):
+    """
+    Crea la orden y sus items reservando el stock, todo en una transacción.
+    `items` es [(producto, cantidad)]. Levanta OutOfStock si algún producto
+    no alcanza; en ese caso no queda nada escrito.
+    """
+    subtotal = sum(product.price * quantity for product, quantity in items)
+    reserved_until = None
+    if payment_method == 'mercadopago':
+        # Hasta que llegue el pago la reserva vence sola (expire_reservations)
+        reserved_until = timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+    with transaction.atomic(using=using):
+        order = Order.objects.using(using).create(
+            user=user,
+            payment_method=payment_method,
+            coupon=coupon,
+            discount=discount,
+            subtotal=subtotal,
+            total=subtotal - discount,
+            stock_reserved=True,
+            reserved_until=reserved_until,
+            **shipping,
+        )
+        OrderItem.objects.using(using).bulk_create([
+            OrderItem.for_product(product, order=order, quantity=quantity, price=product.price)
+            for product, quantity in items
+        ])
+        if coupon:
+            Coupon.objects.using(using).filter(pk=coupon.pk).update(times_used=F('times_used') + 1)
+        # Lo último de la transacción: la fila del producto queda tomada lo menos posible
+        reserve_stock([(product.pk, quantity) for product, quantity in items], using)
+    return order
+
+
+def expire_reservations(now=None, batch_size=500):
+    """Cancela las órdenes pendientes de pago con la reserva vencida y libera su stock."""
+    expired = Order.objects.filter(status='pending', reserved_until__lt=now or timezone.now())
+    updated, _ = transition_orders(expired, 'cancelled', batch_size=batch_size)
+    return updated
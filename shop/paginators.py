@@ -0,0 +1,87 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Cantidad aproximada de filas de la tabla sin recorrerla, a partir de las
+    estadísticas del motor. Devuelve None si no hay forma barata de estimarla.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s', [table]
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+        if connection.vendor == 'sqlite':
+            # sqlite_stat1 existe después de correr ANALYZE
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    # Sin estadísticas: el rango de ids usa solo el índice de la PK
+    pk = model._meta.pk.column
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN({pk}), MAX({pk}) FROM {connection.ops.quote_name(table)}')
+        low, high = cursor.fetchone()
+    if low is None:
+        return 0
+    return high - low + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator para tablas enormes: sin filtros usa el conteo estimado en lugar
+    de un COUNT(*) completo; con filtros (o en tablas chicas) cuenta de verdad.
+
+    La estimación puede pasarse (ids salteados, estadísticas viejas). Una
+    página que trae menos filas de las esperadas es la última de verdad: el
+    conteo se corrige con lo que trajo, y si vino vacía se cuenta de verdad.
+    """
+
+    estimate_threshold = 100_000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def _set_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        self.estimated = False
+
+    def page(self, number):
+        page = super().page(number)
+        if not self.estimated:
+            return page
+        bottom = (page.number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        rows = list(page.object_list)
+        if len(rows) == top - bottom:
+            return page
+        if rows:
+            self._set_count(bottom + len(rows))
+            return self._get_page(rows, page.number, self)
+        self._set_count(super().count)
+        return super().page(number)
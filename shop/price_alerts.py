@@ -0,0 +1,77 @@
+"""
+Avisos de baja de precio para los productos en wishlists.
+
+Cada corrida procesa solo los productos cuyo `price_changed_at` es posterior a
+la corrida anterior (JobCheckpoint), y recorre sus wishlists en lotes. Una
+wishlist se avisa cuando el precio actual es menor a su `notified_price`, que
+pasa a ser el precio nuevo: repetir la corrida no duplica avisos.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import JobCheckpoint, Notification, Product, Wishlist
+
+JOB_NAME = 'price_drop_alerts'
+
+# Se vuelve a mirar un poco antes del checkpoint por cambios que se
+# confirmaron tarde; no genera duplicados.
+OVERLAP = timedelta(minutes=5)
+
+
+def format_price(value):
+    return f'${value:,.0f}'.replace(',', '.')
+
+
+def price_drop_notification(wishlist):
+    product = wishlist.product
+    return Notification(
+        user_id=wishlist.user_id,
+        notification_type='promo',
+        title=f'¡Bajó de precio {product.name}!',
+        message=(
+            f'{product.name}, que está en tu lista de deseos, ahora cuesta '
+            f'{format_price(product.price)} (antes {format_price(wishlist.notified_price)}).'
+        ),
+    )
+
+
+def send_price_drop_alerts(batch_size=1000, dry_run=False):
+    """Devuelve (productos con cambio de precio, avisos creados)."""
+    started = timezone.now()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=JOB_NAME)
+    changed = Product.objects.filter(price_changed_at__lte=started)
+    if checkpoint.position:
+        changed = changed.filter(price_changed_at__gt=checkpoint.position - OVERLAP)
+    product_ids = list(changed.order_by('id').values_list('id', flat=True))
+
+    sent = 0
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start:start + batch_size]
+        last_id = 0
+        while True:
+            wishlists = list(
+                Wishlist.objects.filter(product_id__in=chunk, id__gt=last_id, notified_price__gt=F('product__price'))
+                .select_related('product')
+                .only('id', 'user_id', 'notified_price', 'product__name', 'product__price')
+                .order_by('id')[:batch_size]
+            )
+            if not wishlists:
+                break
+            last_id = wishlists[-1].id
+            sent += len(wishlists)
+            if dry_run:
+                continue
+            notifications = [price_drop_notification(wishlist) for wishlist in wishlists]
+            for wishlist in wishlists:
+                wishlist.notified_price = wishlist.product.price
+            with transaction.atomic():
+                Notification.objects.bulk_create(notifications, batch_size=batch_size)
+                Wishlist.objects.bulk_update(wishlists, ['notified_price'], batch_size=batch_size)
+
+    if not dry_run:
+        checkpoint.position = started
+        checkpoint.save(update_fields=['position', 'updated_at'])
+    return len(product_ids), sent
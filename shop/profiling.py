@@ -0,0 +1,198 @@
+"""
+Profiler a pedido para staff. Un request con `?_profile=1` o el header
+`X-Profile: 1`, hecho por un usuario staff, corre la vista bajo cProfile y
+registra cada consulta SQL con su duración, la línea de nuestro código que la
+disparó y el template que se estaba renderizando (slow_queries.find_callsite).
+El resultado queda en PROFILER_DIR y se ve en /perfiles/.
+
+Por cada perfil se guardan dos archivos:
+- <id>.prof: el volcado de cProfile, se abre con pstats o snakeviz.
+- <id>.json: datos del request y las consultas SQL.
+
+La descarga "folded" (una línea `a;b;c microsegundos` por pila) sirve para
+flamegraph.pl o speedscope. cProfile no guarda pilas completas, solo pares
+llamador-llamado, así que las pilas se reconstruyen repartiendo el tiempo de
+cada función entre sus llamadores en proporción.
+
+Sin el flag el middleware solo mira el query string y los headers.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .slow_queries import find_callsite
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+
+PROFILE_ID_RE = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+FLAG_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def requested(request):
+    """Si el request pide perfil: `?_profile=1` o `X-Profile: 1` (no alcanza con que aparezca el nombre)."""
+    value = request.GET.get(QUERY_PARAM) or request.META.get(HEADER, '')
+    return value.strip().lower() in FLAG_VALUES
+
+
+def profiles_dir():
+    return Path(getattr(settings, 'PROFILER_DIR', settings.BASE_DIR / 'var' / 'profiles'))
+
+
+def new_profile_id():
+    return f"{timezone.localtime().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
+
+
+class SQLRecorder:
+    """execute_wrapper que anota cada consulta con su duración y origen."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            callsite, template = find_callsite(sys._getframe(1))
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'ms': round(elapsed * 1000, 3),
+                'callsite': callsite,
+                'template': template,
+            })
+
+
+def run_profiled(request, view_func, view_args, view_kwargs):
+    """Corre la vista perfilada, guarda el perfil y devuelve (response, id)."""
+    profiler = cProfile.Profile()
+    recorder = SQLRecorder()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        response = profiler.runcall(view_func, request, *view_args, **view_kwargs)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    profile_id = new_profile_id()
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f'{profile_id}.prof')
+    meta = {
+        'id': profile_id,
+        'created': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': request.resolver_match.view_name,
+        'user': request.user.get_username(),
+        'status': response.status_code,
+        'ms': round(elapsed, 1),
+        'sql_ms': round(sum(query['ms'] for query in recorder.queries), 1),
+        'queries': recorder.queries,
+    }
+    (directory / f'{profile_id}.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+    prune(getattr(settings, 'PROFILER_MAX_PROFILES', 100))
+    return response, profile_id
+
+
+def prune(keep):
+    """Borra los perfiles más viejos y deja los últimos `keep`."""
+    metas = sorted(profiles_dir().glob('*.json'), reverse=True)
+    for path in metas[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Metadatos de los perfiles guardados, del más nuevo al más viejo (sin las consultas)."""
+    profiles = []
+    for path in sorted(profiles_dir().glob('*.json'), reverse=True):
+        meta = json.loads(path.read_text(encoding='utf-8'))
+        meta['query_count'] = len(meta.pop('queries'))
+        profiles.append(meta)
+    return profiles
+
+
+def load_profile(profile_id):
+    """(metadatos, pstats.Stats) o None si el id no existe."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = profiles_dir() / f'{profile_id}.json'
+    if not path.exists():
+        return None
+    meta = json.loads(path.read_text(encoding='utf-8'))
+    return meta, pstats.Stats(str(path.with_suffix('.prof')))
+
+
+def stats_report(stats, sort='cumulative', limit=40):
+    """La tabla de pstats como texto."""
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def function_label(func):
+    filename, lineno, name = func
+    if filename == '~':
+        return name  # funciones built-in: '<built-in method ...>'
+    base = str(settings.BASE_DIR)
+    if 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    elif filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    else:
+        filename = os.path.basename(filename)  # biblioteca estándar
+    return f'{name} ({filename}:{lineno})'
+
+
+def folded_stacks(stats, min_us=1):
+    """
+    Pilas en formato "folded" a partir de los pares llamador-llamado de pstats.
+    El tiempo propio de cada función se reparte entre sus caminos en
+    proporción al tiempo acumulado que aporta cada llamador.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumtime) in callers.items():
+            callees.setdefault(caller, []).append((func, cumtime))
+    roots = [func for func, entry in stats.stats.items() if not entry[4]]
+
+    totals = {}
+
+    def walk(func, path, share):
+        _, _, tottime, cumtime, _ = stats.stats[func]
+        path = path + (func,)
+        own = tottime * share * 1e6
+        if own >= min_us:
+            key = ';'.join(function_label(f) for f in path)
+            totals[key] = totals.get(key, 0) + own
+        for callee, edge_time in callees.get(func, ()):
+            # Recursión: el tiempo ya quedó contado en el primer nivel
+            if callee in path:
+                continue
+            callee_cumtime = stats.stats[callee][3]
+            if not callee_cumtime:
+                continue
+            callee_share = share * edge_time / callee_cumtime
+            if callee_share * callee_cumtime * 1e6 >= min_us:
+                walk(callee, path, min(callee_share, 1))
+
+    for root in roots:
+        walk(root, (), 1)
+    return ''.join(f'{key} {round(value)}\n' for key, value in sorted(totals.items()))
@@ -0,0 +1,232 @@
+"""
+"Los que compraron esto también compraron": matriz dispersa de co-compras
+producto x producto calculada con NumPy a partir de OrderItem y del archivo
+(ArchivedOrderItem, ver archive.py).
+
+La matriz se guarda en disco (RECOMMENDATIONS_DIR) como dos arrays .npy
+ordenados: `pairs` (clave a << 32 | b) y `counts` (órdenes en las que a y b se
+compraron juntos). Las corridas siguientes leen solo los items nuevos, suman
+sus pares a la matriz y recalculan el top-K de los productos afectados.
+Los pares de productos borrados se sacan de la matriz en cada corrida. Una
+orden que se cancela después de haberse contado no se descuenta: solo una
+corrida con `full` (build_recommendations --full) la saca.
+Archivar o restaurar una orden no cambia la matriz: los items conservan su
+id al pasar de una tabla a la otra y se leen de las dos, así que una orden
+ya contada no se pierde ni se cuenta dos veces.
+product_detail solo lee la tabla ProductRecommendation.
+"""
+import json
+import os
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrderItem, OrderItem, Product, ProductRecommendation
+
+SHIFT = np.int64(32)
+MASK = np.int64((1 << 32) - 1)
+
+
+def cooccurrence(order_ids, product_ids, max_basket=50):
+    """
+    Cuenta los pares (a, b), a != b, comprados en la misma orden. Recibe un
+    array de órdenes y otro de productos (uno por item) y devuelve
+    (pairs, counts) con pairs ordenado y sin repetidos. Las órdenes con más de
+    `max_basket` productos distintos se ignoran (son compras mayoristas y
+    crecen en forma cuadrática).
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if not len(order_ids):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+
+    # Un producto cuenta una sola vez por orden; np.unique además ordena por orden
+    items = np.unique((order_ids << SHIFT) | product_ids)
+    orders, products = items >> SHIFT, items & MASK
+
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(items)])
+    keep = (sizes > 1) & (sizes <= max_basket)
+    if not keep.any():
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    starts, sizes = starts[keep], sizes[keep]
+    selected = np.repeat(starts, sizes) + _ranges(sizes)
+    products = products[selected]
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+
+    # Cada item se combina con todos los items de su orden (producto cartesiano por orden)
+    per_item = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(len(products)), per_item)
+    right = np.repeat(np.repeat(starts, sizes), per_item) + _ranges(per_item)
+    distinct = left != right
+    keys = (products[left[distinct]] << SHIFT) | products[right[distinct]]
+    return np.unique(keys, return_counts=True)
+
+
+def _ranges(lengths):
+    """Concatena arange(n) para cada n de `lengths`, sin loops de Python."""
+    total = lengths.sum()
+    return np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def merge(pairs, counts, new_pairs, new_counts):
+    """Suma dos matrices dispersas en formato (pairs, counts)."""
+    merged, inverse = np.unique(np.concatenate([pairs, new_pairs]), return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate([counts, new_counts]), minlength=len(merged))
+    return merged, totals.astype(np.int64)
+
+
+def top_k(pairs, counts, k=10, products=None):
+    """
+    Devuelve (a, b, rank, count) con los k vecinos más frecuentes de cada
+    producto a, opcionalmente solo para los productos de `products`.
+    """
+    a, b = pairs >> SHIFT, pairs & MASK
+    if products is not None:
+        selected = np.isin(a, products)
+        a, b, counts = a[selected], b[selected], counts[selected]
+    order = np.lexsort((b, -counts, a))
+    a, b, counts = a[order], b[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]]) if len(a) else np.empty(0, np.int64)
+    rank = np.arange(len(a)) - np.repeat(starts, np.diff(np.r_[starts, len(a)]))
+    best = rank < k
+    return a[best], b[best], rank[best], counts[best]
+
+
+class RecommendationStore:
+    """Matriz de co-compras persistida en RECOMMENDATIONS_DIR."""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.RECOMMENDATIONS_DIR)
+
+    def exists(self):
+        return (self.directory / 'meta.json').exists()
+
+    def load(self):
+        # mmap: la matriz no se copia entera a memoria hasta que se la combina
+        pairs = np.load(self.directory / 'pairs.npy', mmap_mode='r')
+        counts = np.load(self.directory / 'counts.npy', mmap_mode='r')
+        meta = json.loads((self.directory / 'meta.json').read_text())
+        return pairs, counts, meta
+
+    def save(self, pairs, counts, meta):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, array in (('pairs', pairs), ('counts', counts)):
+            tmp = self.directory / f'{name}.tmp.npy'
+            np.save(tmp, array)
+            os.replace(tmp, self.directory / f'{name}.npy')
+        tmp = self.directory / 'meta.json.tmp'
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.directory / 'meta.json')
+
+
+def _item_rows(**filters):
+    """(id, order_id, product_id) de los items de las dos tablas que cumplen `filters`."""
+    return [
+        model.objects.filter(product_id__isnull=False, **filters)
+        .exclude(order__status='cancelled')
+        .order_by('id')
+        .values_list('id', 'order_id', 'product_id')
+        for model in (ArchivedOrderItem, OrderItem)
+    ]
+
+
+def read_items(after_id=0, chunk_size=100_000):
+    """
+    Lee (order_id, product_id) de los items con id > after_id, de las dos
+    tablas y sin instanciar modelos. Los items de productos borrados
+    (product vacío) no cuentan.
+    """
+    chunks, buffer = [], []
+    for row in chain.from_iterable(rows.iterator(chunk_size=chunk_size) for rows in _item_rows(id__gt=after_id)):
+        buffer.append(row)
+        if len(buffer) >= chunk_size:
+            chunks.append(np.array(buffer, dtype=np.int64))
+            buffer = []
+    if buffer:
+        chunks.append(np.array(buffer, dtype=np.int64))
+    if not chunks:
+        return np.empty((0, 3), np.int64)
+    return np.concatenate(chunks)
+
+
+def build_recommendations(full=False, k=10, max_basket=50, store=None, batch_size=5000):
+    """
+    Actualiza la matriz de co-compras y la tabla ProductRecommendation.
+    Sin `full`, procesa solo los items nuevos desde la última corrida.
+    Devuelve un dict con estadísticas de la corrida.
+    """
+    store = store or RecommendationStore()
+    incremental = not full and store.exists()
+    if incremental:
+        pairs, counts, meta = store.load()
+        last_item_id = meta['last_item_id']
+    else:
+        pairs, counts, last_item_id = np.empty(0, np.int64), np.empty(0, np.int64), 0
+
+    items = read_items(after_id=last_item_id)
+    if not len(items):
+        return {'items': 0, 'pairs': len(pairs), 'products': 0}
+
+    if incremental:
+        # Los pares nuevos pueden combinar items nuevos con items ya procesados
+        # de la misma orden, así que se recalculan esas órdenes completas.
+        touched_orders = np.unique(items[:, 1]).tolist()
+        previous = []
+        for start in range(0, len(touched_orders), batch_size):
+            for rows in _item_rows(order_id__in=touched_orders[start:start + batch_size], id__lte=last_item_id):
+                previous += rows
+        old_items = np.array(previous, dtype=np.int64).reshape(-1, 3)
+        if len(old_items):
+            old_pairs, old_counts = cooccurrence(old_items[:, 1], old_items[:, 2], max_basket)
+            all_items = np.concatenate([old_items, items])
+        else:
+            old_pairs, old_counts = np.empty(0, np.int64), np.empty(0, np.int64)
+            all_items = items
+        new_pairs, new_counts = cooccurrence(all_items[:, 1], all_items[:, 2], max_basket)
+        # Suma lo nuevo y resta lo que esas órdenes ya aportaban
+        pairs, counts = merge(np.asarray(pairs), np.asarray(counts), new_pairs, new_counts)
+        pairs, counts = merge(pairs, counts, old_pairs, -old_counts)
+        nonzero = counts > 0
+        pairs, counts = pairs[nonzero], counts[nonzero]
+        affected = np.unique(new_pairs >> SHIFT)
+    else:
+        pairs, counts = cooccurrence(items[:, 1], items[:, 2], max_basket)
+        affected = None
+
+    # Pares que apuntan a productos borrados: salen de la matriz y sus vecinos se recalculan
+    existing = np.fromiter(Product.objects.values_list('pk', flat=True).iterator(), dtype=np.int64)
+    alive = np.isin(pairs >> SHIFT, existing) & np.isin(pairs & MASK, existing)
+    if not alive.all():
+        if affected is not None:
+            affected = np.union1d(affected, np.unique(pairs[~alive] >> SHIFT))
+        pairs, counts = pairs[alive], counts[alive]
+
+    a, b, rank, score = top_k(pairs, counts, k, products=affected)
+    rows = [
+        ProductRecommendation(product_id=int(x), recommended_id=int(y), rank=int(r), score=int(s))
+        for x, y, r, s in zip(a, b, rank, score)
+    ]
+    with transaction.atomic():
+        if affected is None:
+            ProductRecommendation.objects.all().delete()
+        else:
+            ids = affected.tolist()
+            for start in range(0, len(ids), batch_size):
+                ProductRecommendation.objects.filter(product_id__in=ids[start:start + batch_size]).delete()
+        ProductRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+
+    store.save(pairs, counts, {
+        'last_item_id': int(items[:, 0].max()),
+        'built_at': timezone.now().isoformat(),
+        'k': k,
+    })
+    return {
+        'items': len(items),
+        'pairs': len(pairs),
+        'products': len(np.unique(a)),
+    }
@@ -0,0 +1,54 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Se activa por request desde ReplicaRoutingMiddleware: solo las vistas de
+# lectura (catálogo, dashboard, historial) leen de la réplica.
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def set_replica_reads(enabled):
+    """Habilita o deshabilita las lecturas desde la réplica en el contexto actual."""
+    _use_replica.set(enabled)
+
+
+class PrimaryReplicaRouter:
+    """
+    Escrituras siempre al primario; lecturas de los modelos de la tienda a la
+    réplica solo cuando el request actual lo habilita. Sesiones y usuarios se
+    leen siempre del primario para no perder un login recién hecho.
+    """
+
+    route_app_labels = {'shop'}
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _use_replica.get() and model._meta.app_label in self.route_app_labels:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Un objeto leído de la réplica se guarda en el primario
+        instance = hints.get('instance')
+        alias = replica_alias()
+        if alias and instance is not None and instance._state.db == alias:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica es una copia del primario (ver sync_replica), no se migra aparte
+        if db == replica_alias():
+            return False
+        return None
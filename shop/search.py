@@ -0,0 +1,105 @@
+"""
+Índice en memoria para las sugerencias del buscador (search-as-you-type).
+
+Cada nombre de producto y de categoría se indexa una vez por palabra: "Nike
+Air Max" genera las claves "nike air max", "air max" y "max", así "air"
+encuentra el producto. Las claves se guardan en una lista ordenada y la
+búsqueda de un prefijo es un bisect: no toca la base.
+
+El índice se arma la primera vez que se usa y se descarta cuando cambia un
+Product o una Category (ver signals.py). La versión vive en el cache para que
+todos los procesos se enteren del cambio si el cache es compartido.
+"""
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Category, Product
+
+VERSION_KEY = 'search_index_version'
+MAX_QUERY_LENGTH = 50
+
+CATEGORY = 'c'
+PRODUCT = 'p'
+
+
+def normalize(text):
+    """Minúsculas y sin tildes: "Zapatilla Niño" -> "zapatilla nino"."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+
+class SuggestionIndex:
+    def __init__(self, entries, version=0):
+        """`entries`: iterable de (tipo, id, nombre)."""
+        self.version = version
+        self.labels = []
+        keys = []
+        for kind, pk, name in entries:
+            words = normalize(name).split(' ')
+            slot = len(self.labels)
+            self.labels.append((kind, pk, name))
+            for i in range(len(words)):
+                # Las categorías van antes que los productos con la misma clave
+                keys.append((' '.join(words[i:]), kind != CATEGORY, i, slot))
+        keys.sort()
+        self.keys = [key[0] for key in keys]
+        self.slots = [key[3] for key in keys]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def suggest(self, query, limit=8):
+        """Hasta `limit` entradas (tipo, id, nombre) con alguna palabra que empieza con `query`."""
+        prefix = normalize(query[:MAX_QUERY_LENGTH])
+        if not prefix:
+            return []
+        results, seen = [], set()
+        keys, slots = self.keys, self.slots
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and len(results) < limit and keys[position].startswith(prefix):
+            slot = slots[position]
+            if slot not in seen:
+                seen.add(slot)
+                results.append(self.labels[slot])
+            position += 1
+        return results
+
+
+def load_entries():
+    yield from ((CATEGORY, pk, name) for pk, name in Category.objects.values_list('id', 'name').iterator())
+    yield from ((PRODUCT, pk, name) for pk, name in Product.objects.values_list('id', 'name').iterator())
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def get_index():
+    """Devuelve el índice vigente, reconstruyéndolo si cambió el catálogo."""
+    global _index
+    version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        # Otro hilo pudo haberlo reconstruido mientras esperábamos
+        if _index is None or _index.version != version:
+            _index = SuggestionIndex(load_entries(), version)
+        return _index
+
+
+def invalidate_index():
+    """Marca el índice como viejo en todos los procesos que comparten el cache."""
+    global _index
+    _index = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .facets import invalidate_facets
+from .models import Category, Product, Review
+from .search import invalidate_index
+from .slow_queries import install as install_slow_query_log
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    # Después del commit, para que el índice no se reconstruya con datos sin confirmar
+    transaction.on_commit(invalidate_index)
+    transaction.on_commit(invalidate_facets)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        field = f'stars_{instance.rating}'
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now(), **{field: F(field) + 1})
+    else:
+        # Una edición puede cambiar el rating y no conocemos el anterior
+        Product(pk=instance.product_id).refresh_rating_histogram()
+    # Cambia el rating del producto y con él los conteos por rating
+    transaction.on_commit(invalidate_facets)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    field = f'stars_{instance.rating}'
+    Product.objects.filter(pk=instance.product_id).update(
+        updated_at=timezone.now(), **{field: Greatest(F(field) - 1, 0)},
+    )
+    transaction.on_commit(invalidate_facets)
+
+
+connection_created.connect(install_slow_query_log)
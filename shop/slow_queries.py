@@ -0,0 +1,176 @@
+"""
+Log de consultas lentas. Cada consulta que tarda más de
+SLOW_QUERY_THRESHOLD_MS queda como una línea JSON en SLOW_QUERY_LOG_FILE
+(rotativo), con:
+- callsite: la línea de nuestro código (vista, form, modelo) más cercana a la consulta.
+- template: el template y la línea que se estaba renderizando, si la hubo.
+- fingerprint: hash del SQL normalizado, igual para todas las variantes de una
+  misma consulta (distintos valores, listas IN de distinto largo).
+
+El SQL se guarda sin los parámetros, que pueden tener datos personales.
+
+El wrapper se instala en cada conexión nueva (señal connection_created, ver
+signals.py). Para las consultas rápidas el costo es un perf_counter.
+
+Reporte agrupado por consulta y callsite: python manage.py slow_query_report
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger('shop.slow_queries')
+logger.propagate = False
+
+_handler = None
+_handler_lock = threading.Lock()
+
+# Archivos del proyecto que no cuentan como callsite
+SKIP_FILES = ('manage.py', 'shop/middleware.py', 'shop/profiling.py', 'shop/slow_queries.py')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\?\s*,\s*)*\?\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL sin valores: literales y parámetros pasan a ?, las listas IN a (...)."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+def find_callsite(frame):
+    """(línea de código del proyecto, línea de template) más cercanas a `frame`."""
+    base = str(settings.BASE_DIR)
+    callsite = template = None
+    # Se recorre toda la pila: solo pasa con las consultas lentas y en los perfiles
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename
+        if template is None and code.co_name == 'render_annotated' and filename.endswith(
+                os.path.join('django', 'template', 'base.py')):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        elif callsite is None and filename.startswith(base) and 'site-packages' not in filename:
+            relative = os.path.relpath(filename, base)
+            if relative not in SKIP_FILES:
+                callsite = f'{relative}:{frame.f_lineno} {code.co_name}'
+        frame = frame.f_back
+    return callsite, template
+
+
+def get_logger():
+    """El logger con un handler rotativo sobre SLOW_QUERY_LOG_FILE (se crea al primer uso)."""
+    global _handler
+    path = str(settings.SLOW_QUERY_LOG_FILE)
+    if _handler is None or _handler.baseFilename != os.path.abspath(path):
+        with _handler_lock:
+            if _handler is None or _handler.baseFilename != os.path.abspath(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(
+                    path, encoding='utf-8',
+                    maxBytes=getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                    backupCount=getattr(settings, 'SLOW_QUERY_LOG_BACKUPS', 5),
+                )
+                if _handler is not None:
+                    logger.removeHandler(_handler)
+                    _handler.close()
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                _handler = handler
+    return logger
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed >= settings.SLOW_QUERY_THRESHOLD_MS:
+            log_query(sql, elapsed, context['connection'].alias, sys._getframe(1))
+
+
+def log_query(sql, elapsed, alias, frame):
+    normalized = normalize_sql(sql)
+    callsite, template = find_callsite(frame)
+    get_logger().info(json.dumps({
+        'ts': timezone.now().isoformat(),
+        'ms': round(elapsed, 2),
+        'alias': alias,
+        'fingerprint': fingerprint(normalized),
+        'callsite': callsite,
+        'template': template,
+        'sql': normalized,
+    }, ensure_ascii=False))
+
+
+def install(connection, **kwargs):
+    """Receptor de connection_created."""
+    if getattr(settings, 'SLOW_QUERY_LOG', False) and slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def log_files(path):
+    """El log actual y sus rotaciones (path.1, path.2, ...), del más viejo al más nuevo."""
+    path = str(path)
+    files = []
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        files.append(f'{path}.{index}')
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def aggregate(lines):
+    """
+    Agrupa las entradas por (fingerprint, callsite, template). Devuelve una
+    lista de dicts con count, total_ms, max_ms, avg_ms y el SQL normalizado.
+    """
+    groups = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        key = (entry['fingerprint'], entry.get('callsite'), entry.get('template'))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'fingerprint': entry['fingerprint'],
+                'callsite': entry.get('callsite'),
+                'template': entry.get('template'),
+                'sql': entry['sql'],
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+    for group in groups.values():
+        group['avg_ms'] = group['total_ms'] / group['count']
+    return list(groups.values())
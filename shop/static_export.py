@@ -0,0 +1,204 @@
+"""
+Export estático del catálogo, para servirlo desde un CDN o el edge.
+
+export_catalog escribe en un directorio el HTML y el JSON de cada página de
+producto y del listado (el catálogo completo y cada categoría, de a
+STATIC_EXPORT_PAGE_SIZE productos, ver views.catalog_page), en las mismas
+rutas del sitio: <ruta>/index.html y <ruta>/index.json. Las páginas se generan como
+para un visitante anónimo; lo que depende del usuario (CSRF, carrito,
+sesión, wishlist) lo completa _static_shim.html pidiendo /estado/.
+
+Cada página lleva un hash de lo que muestra: el producto con su categoría,
+sus reviews y sus recomendaciones; en los listados, las tarjetas de la
+página y los conteos de las facetas. Los hashes quedan en manifest.json y
+una corrida nueva solo vuelve a generar las páginas cuyo hash cambió, y
+borra las que ya no existen. El hash incluye el código de los templates:
+un deploy que los cambia regenera todo.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from itertools import groupby
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import Paginator
+from django.db.models import Count, Max
+from django.http import HttpRequest, QueryDict
+from django.template.loader import get_template, render_to_string
+from django.urls import reverse
+
+from . import api, views
+from .facets import CatalogFilters, compute_facets, facet_context
+from .models import Category, Product, ProductRecommendation, Review
+
+MANIFEST = 'manifest.json'
+
+TEMPLATES = [
+    'shop/base.html', 'shop/_nav.html', 'shop/_static_shim.html',
+    'shop/product_list.html', 'shop/product_detail.html',
+]
+
+# Campos del JSON de cada producto: los de la API más la descripción
+PRODUCT_FIELDS = [*api.DEFAULT_FIELDS, 'description']
+
+
+def _digest(*parts):
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def _request(path):
+    """GET anónimo a `path`, marcado como export (los templates lo miran en request.static_export)."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+    request.user = AnonymousUser()
+    request.static_export = True
+    return request
+
+
+def _write(root, relative, content):
+    """Escribe con rename atómico: el CDN nunca lee un archivo a medias."""
+    path = os.path.join(root, relative)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.')
+    with os.fdopen(descriptor, 'wb') as target:
+        target.write(content)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+def _remove(root, page):
+    for name in ('index.html', 'index.json'):
+        try:
+            os.remove(os.path.join(root, page, name))
+        except FileNotFoundError:
+            pass
+    # Las carpetas que quedaron vacías, hasta la raíz del export
+    directory = os.path.join(root, page).rstrip(os.sep)
+    while os.path.normpath(directory) != os.path.normpath(root):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+def _to_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def product_pages(key=''):
+    """
+    ({ruta: (hash, id)} de las páginas de producto, {id: tarjeta}) con tres
+    consultas, sin instanciar modelos. La tarjeta es lo que muestra el
+    producto en los listados.
+    """
+    reviews = {
+        product_id: (count, latest)
+        for product_id, count, latest in Review.objects.order_by().values('product_id')
+        .annotate(count=Count('id'), latest=Max('updated_at')).values_list('product_id', 'count', 'latest')
+    }
+    recommendations = {
+        product_id: [row[1:] for row in rows]
+        for product_id, rows in groupby(
+            ProductRecommendation.objects.order_by('product_id', 'rank')
+            .values_list('product_id', 'recommended_id', 'recommended__updated_at'),
+            key=lambda row: row[0],
+        )
+    }
+    pages, cards = {}, {}
+    rows = Product.objects.order_by('pk').values_list('pk', 'updated_at', 'category__name', 'category__updated_at')
+    for pk, updated_at, category, category_updated_at in rows:
+        cards[pk] = (updated_at, category, reviews.get(pk))
+        path = reverse('product_detail', args=[pk]).lstrip('/')
+        pages[path] = (_digest(key, pk, cards[pk], category_updated_at, recommendations.get(pk, [])), pk)
+    return pages, cards
+
+
+def _listings():
+    """(id de categoría, filtros) del catálogo completo (None) y de cada categoría."""
+    yield None, CatalogFilters(QueryDict())
+    for category_id in Category.objects.order_by('pk').values_list('pk', flat=True):
+        yield category_id, CatalogFilters(QueryDict(f'category={category_id}'))
+
+
+def listing_pages(cards, page_size, key=''):
+    """{ruta: (hash, filtros, facetas, número de página, ids, [(número, url)])} de los listados."""
+    pages = {}
+    for category_id, filters in _listings():
+        ids = list(filters.apply(Product.objects.all()).order_by('pk').values_list('pk', flat=True))
+        # Sin el cache de facetas: se invalida recién después del commit
+        facets = compute_facets(filters)
+        facet_counts = facet_context(filters, facets)
+        paginator = Paginator(ids, page_size)
+        links = [(number, views.listing_url(category_id, number)) for number in paginator.page_range]
+        for number, url in links:
+            page_ids = paginator.page(number).object_list
+            page_hash = _digest(key, [(pk, cards[pk]) for pk in page_ids], facet_counts, len(links))
+            pages[url.lstrip('/')] = (page_hash, filters, facets, number, page_ids, links)
+    return pages
+
+
+def _render_product(path, product_id, serialized):
+    request = _request('/' + path)
+    html = views.product_detail(request, product_id=product_id).content
+    return html, _to_json(serialized[product_id])
+
+
+def _render_listing(path, filters, facets, number, page_ids, links, serialized):
+    request = _request('/' + path)
+    products = Product.objects.select_related('category').with_ratings().filter(pk__in=page_ids).order_by('pk')
+    html = render_to_string('shop/product_list.html', {
+        **views.catalog_context(request, filters, products, facets),
+        'export_pages': links if len(links) > 1 else None,
+        'export_page': number,
+    }, request=request).encode()
+    following = links[number][1] if number < len(links) else None
+    payload = {
+        'products': [serialized[pk] for pk in page_ids],
+        'page': number,
+        'pages': len(links),
+        'next': following and following + 'index.json',
+    }
+    return html, _to_json(payload)
+
+
+def export_catalog(output_dir, page_size, force=False):
+    """
+    Genera (o actualiza) el export en `output_dir`. Devuelve cuántas
+    páginas se generaron, cuántas quedaron como estaban y cuántas se borraron.
+    """
+    output_dir = os.fspath(output_dir)
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as manifest:
+            previous = json.load(manifest)['pages']
+    except (FileNotFoundError, ValueError, KeyError):
+        previous = {}
+
+    key = _digest(page_size, *(get_template(name).template.source for name in TEMPLATES))
+    products, cards = product_pages(key)
+    listings = listing_pages(cards, page_size, key)
+    current = {path: page[0] for path, page in [*products.items(), *listings.items()]}
+    pending = [path for path, page_hash in current.items() if force or previous.get(path) != page_hash]
+
+    if pending:
+        # El JSON de todos los productos sale de una sola consulta
+        serialized = {item['id']: item for item in api.serialize_products(Product.objects.all(), PRODUCT_FIELDS)}
+        for path in pending:
+            if path in listings:
+                html, data = _render_listing(path, *listings[path][1:], serialized)
+            else:
+                html, data = _render_product(path, products[path][1], serialized)
+            _write(output_dir, os.path.join(path, 'index.html'), html)
+            _write(output_dir, os.path.join(path, 'index.json'), data)
+
+    removed = [path for path in previous if path not in current]
+    for path in removed:
+        _remove(output_dir, path)
+
+    # Último: si la corrida se corta, la siguiente rehace lo que faltó
+    _write(output_dir, MANIFEST, _to_json({'pages': current}))
+    return {'rendered': len(pending), 'skipped': len(current) - len(pending), 'removed': len(removed)}
@@ -0,0 +1,59 @@
+"""
+Stock por producto. `Product.stock` nulo significa que no se controla.
+
+La reserva es un UPDATE condicional por producto
+(stock = stock - n WHERE stock >= n): la base resuelve la carrera entre
+compradores y nunca se lee el stock para después escribirlo. Las órdenes que
+retienen unidades tienen `stock_reserved`; al cancelarse (pago rechazado,
+reserva vencida, acción del admin) se devuelven una sola vez.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(f'Sin stock suficiente del producto {product_id}')
+        self.product_id = product_id
+
+
+def reserve_stock(items, using=DEFAULT_DB_ALIAS):
+    """
+    Descuenta el stock de `items` [(product_id, cantidad)] o levanta
+    OutOfStock. Tiene que correr dentro de la transacción de la orden, para
+    que un faltante deshaga lo ya descontado.
+    """
+    # Siempre en el mismo orden, así dos compras no se bloquean mutuamente
+    for product_id, quantity in sorted(items):
+        updated = Product.objects.using(using).filter(
+            Q(stock__isnull=True) | Q(stock__gte=quantity), pk=product_id,
+        ).update(stock=F('stock') - quantity, updated_at=timezone.now())
+        if not updated:
+            raise OutOfStock(product_id)
+
+
+def release_stock(order_ids, using=DEFAULT_DB_ALIAS):
+    """Devuelve al stock las unidades de las órdenes que todavía las retienen."""
+    with transaction.atomic(using=using):
+        holding = list(
+            Order.objects.using(using).select_for_update()
+            .filter(pk__in=list(order_ids), stock_reserved=True)
+            .values_list('pk', flat=True)
+        )
+        if not holding:
+            return 0
+        Order.objects.using(using).filter(pk__in=holding).update(stock_reserved=False, reserved_until=None)
+        quantities = (
+            # Un producto borrado no tiene stock al que volver
+            OrderItem.objects.using(using).filter(order_id__in=holding, product_id__isnull=False)
+            .values_list('product_id').annotate(total=Sum('quantity')).order_by('product_id')
+        )
+        for product_id, total in quantities:
+            Product.objects.using(using).filter(pk=product_id, stock__isnull=False).update(
+                stock=F('stock') + total, updated_at=timezone.now(),
+            )
+    return len(holding)
+
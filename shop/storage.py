@@ -0,0 +1,68 @@
+"""
+Storage por contenido para las imágenes subidas (STORAGES['default']).
+
+Cada archivo se guarda como <carpeta>/<ab>/<cd>/<sha256><ext>, con el hash
+calculado mientras se escribe, en una sola pasada. Dos subidas con el mismo
+contenido comparten archivo. Un nombre nunca cambia de contenido, así que
+el servidor web puede servirlos con cache de un año (`immutable`).
+
+Los archivos que ya no usa nadie los borra el comando gc_images.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from functools import partial
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+# Escrituras a medio hacer, dentro de MEDIA_ROOT (mismo disco: el rename es atómico)
+TEMP_DIR = '.tmp'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre final sale del contenido: si ya existe es el mismo archivo
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = hashlib.sha256()
+
+        if hasattr(content, 'temporary_file_path'):
+            # Subida grande que Django ya dejó en disco: se lee para el hash
+            # y se mueve, sin copiarla
+            temp_path = content.temporary_file_path()
+            with open(temp_path, 'rb') as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            # Otra subida igual pudo ganarle de mano: mismo contenido, se pisa
+            move = partial(file_move_safe, allow_overwrite=True)
+        else:
+            temp_dir = self.path(TEMP_DIR)
+            os.makedirs(temp_dir, exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(dir=temp_dir)
+            with os.fdopen(descriptor, 'wb') as target:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    target.write(chunk)
+            move = os.replace
+
+        hexdigest = digest.hexdigest()
+        name = posixpath.join(directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Contenido repetido: queda el archivo que ya estaba
+            if move is os.replace:
+                os.remove(temp_path)
+            return name
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        move(temp_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
@@ -1,3 +1,1266 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import warnings
+from contextlib import closing
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import analytics, archive, profiling, slow_queries, throttling, views
+from .models import (
+    AnalyticsReport, ArchivedOrder, Category, Coupon, CustomerRFM, Notification, Order, OrderItem, Product, ProductRecommendation,
+    Profile, Review, Wishlist,
+)
+from .catalog_import import CatalogImporter, RowError, check_encoding, read_rows
+from .facets import CatalogFilters, get_facets
+from .orders import expire_reservations, place_order, transition_orders
+from .middleware import PIN_SESSION_KEY, ReplicaRoutingMiddleware
+from .paginators import EstimatedCountPaginator
+from .price_alerts import send_price_drop_alerts
+from .routers import PrimaryReplicaRouter, _use_replica, set_replica_reads
+from .static_export import export_catalog
+from .stock import OutOfStock, reserve_stock
+from .throttling import Budget
+from .warmup import warm_templates
+
+
+def populate(count, prefix):
+    """Crea `count` filas de cada modelo registrado en el admin."""
+    category = Category.objects.create(name=f'{prefix} categoría')
+    now = timezone.now()
+    for i in range(count):
+        user = User.objects.create(username=f'{prefix}{i}')
+        Profile.objects.create(user=user, city='CABA')
+        product = Product.objects.create(name=f'{prefix} zapatilla {i}', price=1000, category=category)
+        Review.objects.create(product=product, user=user, rating=4, comment='Buenas')
+        Wishlist.objects.create(user=user, product=product)
+        order = Order.objects.create(user=user, full_name='Test', address='Calle 1', city='CABA',
+                                     phone='1', payment_method='cash', total=1000)
+        OrderItem.objects.create(order=order, product=product, quantity=1, price=1000)
+        Notification.objects.create(user=user, notification_type='system', title='Hola', message='Hola')
+        Coupon.objects.create(code=f'{prefix}{i}', discount_type='percent', discount_value=10,
+                              valid_from=now, valid_until=now + timedelta(days=1))
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        # Sin segunda base en los tests: alcanza con que el router crea que hay réplica
+        for target in ('shop.routers.replica_alias', 'shop.middleware.replica_alias'):
+            patcher = mock.patch(target, return_value='replica')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(set_replica_reads, False)
+        self.router = PrimaryReplicaRouter()
+        self.middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+    def request(self, method, name, session=None):
+        request = getattr(RequestFactory(), method)(reverse(name))
+        request.resolver_match = resolve(request.path)
+        request.session = session if session is not None else SessionStore()
+        request.user = AnonymousUser()
+        self.middleware.process_request(request)
+        self.middleware.process_view(request, None, (), {})
+        return request
+
+    def test_read_views_use_the_replica_during_the_request(self):
+        request = self.request('get', 'product_list')
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+        # Sesiones y usuarios siempre del primario
+        self.assertIsNone(self.router.db_for_read(User))
+        self.middleware.process_response(request, HttpResponse())
+        self.assertIsNone(self.router.db_for_read(Product))
+
+        self.request('get', 'cart_view')
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_streamed_export_reads_from_the_replica(self):
+        request = self.request('get', 'export_orders_csv')
+        seen = []
+
+        def content():
+            seen.append(self.router.db_for_read(Product))
+            yield b'orden\n'
+
+        response = self.middleware.process_response(request, StreamingHttpResponse(content()))
+        self.assertIsNone(self.router.db_for_read(Product))
+        self.assertEqual(b''.join(response.streaming_content), b'orden\n')
+        self.assertEqual(seen, ['replica'])
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_post_pins_only_existing_sessions_to_the_primary(self):
+        request = self.request('post', 'login')
+        self.middleware.process_response(request, HttpResponse())
+        self.assertTrue(request.session.is_empty())
+
+        session = SessionStore()
+        session['cart'] = {'1': 1}
+        request = self.request('post', 'cart_view', session)
+        self.middleware.process_response(request, HttpResponse())
+        self.assertIn(PIN_SESSION_KEY, session)
+        # Mientras dura el pin, el catálogo lee del primario
+        self.request('get', 'product_list', session)
+        self.assertIsNone(self.router.db_for_read(Product))
+        with mock.patch('shop.middleware.time.time', return_value=time.time() + 60):
+            self.request('get', 'product_list', session)
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_sync_replica_copies_the_primary_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = Path(directory, 'primary.sqlite3'), Path(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(primary)) as db:
+                db.execute('CREATE TABLE producto (nombre TEXT)')
+                db.execute("INSERT INTO producto VALUES ('Zapatilla')")
+                db.commit()
+            databases = {
+                alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+                for alias, path in (('default', primary), ('replica', replica))
+            }
+            # El comando solo lee la configuración: las conexiones de los tests no cambian
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                with override_settings(DATABASES=databases):
+                    call_command('sync_replica', stdout=io.StringIO())
+            with closing(sqlite3.connect(replica)) as db:
+                self.assertEqual(db.execute('SELECT nombre FROM producto').fetchall(), [('Zapatilla',)])
+
+
+class AdminQueryCountTests(TestCase):
+    """Las páginas del admin tienen que hacer las mismas consultas con 2 filas que con 10."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def count_queries(self, url):
+        self.client.get(url)  # calienta cachés (content types, sesión)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        shop_admins = [model for model in admin.site._registry if model._meta.app_label == 'shop']
+        self.assertTrue(shop_admins)
+
+        populate(2, 'a')
+        urls = {
+            model: reverse(f'admin:shop_{model._meta.model_name}_changelist')
+            for model in shop_admins
+        }
+        small = {model: self.count_queries(url) for model, url in urls.items()}
+        populate(8, 'b')
+        for model, url in urls.items():
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.count_queries(url), small[model])
+
+    def test_order_change_view_does_not_grow_with_items(self):
+        populate(1, 'a')
+        order = Order.objects.get()
+        url = reverse('admin:shop_order_change', args=[order.pk])
+        small = self.count_queries(url)
+        for product in Product.objects.all()[:1]:
+            for _ in range(5):
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=1000)
+        self.assertEqual(self.count_queries(url), small)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ana')
+        self.product = Product.objects.create(name='Zapatilla', price=1000)
+        Wishlist.objects.create(user=self.user, product=self.product)
+        Notification.objects.create(user=self.user, notification_type='system', title='Hola', message='Hola')
+
+    async def test_catalog_and_detail(self):
+        response = await self.async_client.get(reverse('async_product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product.pk for product in response.context['products']], [self.product.pk])
+
+        response = await self.async_client.get(reverse('async_product_detail', args=[self.product.pk]))
+        self.assertEqual((response.status_code, response.context['product']), (200, self.product))
+        response = await self.async_client.get(reverse('async_product_detail', args=[self.product.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_user_views_require_login(self):
+        for name in ('async_wishlist', 'async_get_unread_count'):
+            response = await self.async_client.get(reverse(name))
+            self.assertEqual(response.status_code, 302)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('async_wishlist'))
+        self.assertEqual([item.product_id for item in response.context['wishlist_items']], [self.product.pk])
+        response = await self.async_client.get(reverse('async_get_unread_count'))
+        self.assertEqual(response.json(), {'count': 1})
+
+    async def test_async_reads_see_the_replica_flag(self):
+        # Sin segunda base: el router anota la bandera y lee del primario
+        flags = []
+
+        def db_for_read(router, model, **hints):
+            flags.append(_use_replica.get())
+            return None
+
+        with mock.patch('shop.middleware.replica_alias', return_value='replica'), \
+                mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            response = await self.async_client.get(reverse('async_product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(flags)
+        self.assertTrue(all(flags))
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def test_unfiltered_large_table_uses_estimate(self):
+        populate(3, 'a')
+        paginator = EstimatedCountPaginator(Order.objects.order_by('pk'), 2)
+        paginator.estimate_threshold = 0
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 3)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+
+    def test_estimate_with_id_gaps_is_corrected_by_the_last_page(self):
+        populate(5, 'a')
+        Order.objects.filter(pk__in=Order.objects.order_by('pk').values('pk')[1:3]).delete()
+        paginator = EstimatedCountPaginator(Order.objects.order_by('pk'), 2)
+        paginator.estimate_threshold = 0
+        self.assertEqual(paginator.num_pages, 3)
+        # La última página trae una fila: alcanza para saber el total sin COUNT(*)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(paginator.page(2)), 1)
+        self.assertEqual((paginator.count, paginator.num_pages), (3, 2))
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+
+        # Una página que quedó vacía cuenta de verdad
+        paginator = EstimatedCountPaginator(Order.objects.order_by('pk'), 1)
+        paginator.estimate_threshold = 0
+        with self.assertRaises(EmptyPage):
+            paginator.page(5)
+        self.assertEqual((paginator.count, paginator.get_page(5).number), (3, 3))
+
+    def test_filtered_queryset_counts_exactly(self):
+        populate(3, 'a')
+        paginator = EstimatedCountPaginator(Order.objects.filter(status='pending').order_by('pk'), 2)
+        paginator.estimate_threshold = 0
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 3)
+        self.assertTrue(any('COUNT(' in q['sql'] for q in queries))
+
+
+class TransitionOrdersTests(TestCase):
+    def test_only_allowed_transitions_are_applied_and_notified(self):
+        populate(5, 'a')
+        Order.objects.filter(pk__in=Order.objects.order_by('pk').values('pk')[:3]).update(status='confirmed')
+        Notification.objects.all().delete()
+
+        updated, skipped = transition_orders(Order.objects.all(), 'shipped', batch_size=2)
+
+        self.assertEqual((updated, skipped), (3, 2))
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+        self.assertEqual(Order.objects.filter(status='pending').count(), 2)
+        self.assertEqual(Notification.objects.filter(notification_type='order').count(), 3)
+
+    def test_order_changed_between_select_and_update_is_not_notified(self):
+        populate(3, 'a')
+        Order.objects.update(status='confirmed')
+        Notification.objects.all().delete()
+        first = Order.objects.order_by('pk').first()
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # Otro proceso cancela la primera orden justo antes del UPDATE del lote
+            if kwargs == {'status': 'shipped'}:
+                update(Order.objects.filter(pk=first.pk), status='cancelled')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            updated, skipped = transition_orders(Order.objects.all(), 'shipped')
+
+        self.assertEqual((updated, skipped), (2, 1))
+        self.assertEqual(Order.objects.get(pk=first.pk).status, 'cancelled')
+        titles = set(Notification.objects.values_list('title', flat=True))
+        self.assertEqual(titles, {f'Orden #{order.pk} enviada' for order in Order.objects.filter(status='shipped')})
+
+
+class CatalogImportTests(TestCase):
+    def run_import(self, text, **options):
+        errors = []
+        importer = CatalogImporter(batch_size=2, on_error=lambda *error: errors.append(error), **options)
+        return importer.run(read_rows(io.StringIO(text), 'csv')), errors
+
+    def test_upsert_by_sku_creates_categories_once(self):
+        report, errors = self.run_import(
+            'sku,name,price,category\n'
+            'A1,Air,1000,Running\n'
+            'A2,Boost,"2000,5",Running\n'
+            'A3,Classic,500,\n'
+        )
+        self.assertEqual((report.created, report.updated, report.error_count), (3, 0, 0))
+        self.assertEqual(Category.objects.get().name, 'Running')
+        self.assertEqual(Product.objects.get(sku='A2').price, 2000.5)
+
+        report, errors = self.run_import(
+            'sku,name,price,category\n'
+            'A1,Air,1200,Running\n'
+            'A2,Boost,"2000,5",Running\n'
+            'B1,Trail,800,Outdoor\n'
+        )
+        self.assertEqual((report.created, report.updated, report.unchanged), (1, 1, 1))
+        self.assertIsNotNone(Product.objects.get(sku='A1').price_changed_at)
+        self.assertEqual(Product.objects.get(sku='B1').category.name, 'Outdoor')
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_invalid_rows_are_reported_with_their_line(self):
+        report, errors = self.run_import(
+            'sku,name,price\n'
+            'A1,Air,1000\n'
+            'B1,NaN,nan\n'
+            'B2,Infinito,inf\n'
+            ',Sin sku,10\n'
+            'B3,Negativo,-1\n'
+        )
+        self.assertEqual((report.rows, report.created, report.error_count), (5, 1, 4))
+        self.assertEqual([(line, sku) for line, sku, _ in errors], [(3, 'B1'), (4, 'B2'), (5, ''), (6, 'B3')])
+        self.assertIn('Precio inválido', errors[0][2])
+        self.assertEqual(report.errors, errors)
+
+    def test_database_error_isolates_the_failing_row(self):
+        from django.db import IntegrityError
+
+        bulk_create = Product.objects.bulk_create
+
+        def failing_bulk_create(products, **kwargs):
+            if any(product.name == 'Rota' for product in products):
+                raise IntegrityError('fila rota')
+            return bulk_create(products, **kwargs)
+
+        with mock.patch.object(Product.objects, 'bulk_create', failing_bulk_create):
+            report, errors = self.run_import('sku,name,price\nA1,Air,1000\nA2,Rota,1000\n')
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['A1'])
+        self.assertEqual([(line, sku) for line, sku, _ in errors], [(3, 'A2')])
+        self.assertIn('fila rota', errors[0][2])
+
+    def test_missing_image_is_saved_without_it_and_counted(self):
+        with tempfile.TemporaryDirectory() as media, tempfile.TemporaryDirectory() as images:
+            Path(images, 'air.png').write_bytes(png_bytes())
+            with override_settings(MEDIA_ROOT=media):
+                report, errors = self.run_import(
+                    'sku,name,price,image\nA1,Air,1000,air.png\nA2,Boost,1000,falta.png\n', image_dir=images,
+                )
+        self.assertEqual((report.created, report.without_image), (2, 1))
+        self.assertTrue(Product.objects.get(sku='A1').image)
+        self.assertFalse(Product.objects.get(sku='A2').image)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('sin ella', errors[0][2])
+
+    def test_non_utf8_file_is_rejected_before_importing(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management.base import CommandError
+
+        content = 'sku,name,price\nA1,Air,1000\nA2,Camión,1000\n'.encode('latin-1')
+        with self.assertRaisesMessage(RowError, 'línea 3'):
+            check_encoding(io.BytesIO(content), chunk_size=4)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'catalogo.csv')
+            path.write_bytes(content)
+            with self.assertRaisesMessage(CommandError, 'UTF-8'):
+                call_command('import_catalog', str(path), stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        response = self.client.post(reverse('import_catalog'), {'file': SimpleUploadedFile('catalogo.csv', content)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['report'])
+        self.assertContains(response, 'El archivo no está en UTF-8 (línea 3)')
+        self.assertFalse(Product.objects.exists())
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ana')
+        self.product = Product.objects.create(name='Zapatilla', price=1000)
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+
+    def create_orders(self, count, days_ago, status='delivered'):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, full_name='Ana', address='Calle 1', city='CABA',
+                                         phone='1', payment_method='cash', total=1000, status=status)
+            OrderItem.objects.create(order=order, product=self.product, product_name='Zapatilla',
+                                     quantity=2, price=500)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def export(self, **filters):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('export_orders_csv'), filters)
+            rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        return rows, len(queries)
+
+    def test_streams_both_tiers_with_constant_queries(self):
+        self.create_orders(1, 400)
+        self.create_orders(1, 1)
+        archive.archive_orders(timezone.now() - timedelta(days=365))
+        rows, small = self.export()
+        self.assertEqual(rows[0], [header for _, header in views.ORDER_EXPORT_COLUMNS])
+        archived_id = ArchivedOrder.objects.get().pk
+        # El archivo primero, después las órdenes calientes
+        self.assertEqual([int(row[0]) for row in rows[1:]], [archived_id, Order.objects.get().pk])
+        self.assertEqual(rows[1][10:], [str(self.product.pk), 'Zapatilla', '2', '500.0'])
+
+        self.create_orders(4, 400)
+        self.create_orders(4, 1)
+        archive.archive_orders(timezone.now() - timedelta(days=365))
+        rows, queries = self.export()
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(queries, small)
+
+    def test_filters_by_status_and_date(self):
+        self.create_orders(1, 1, status='pending')
+        self.create_orders(2, 1)
+        self.create_orders(1, 30)
+        rows, _ = self.export(status='pending')
+        self.assertEqual([row[2] for row in rows[1:]], ['pending'])
+        rows, _ = self.export(date_from=(timezone.localdate() - timedelta(days=7)).isoformat(), status='delivered')
+        self.assertEqual(len(rows), 3)
+
+
+class RecommendationTests(TestCase):
+    def test_incremental_build_matches_full_build(self):
+        from .recommendations import RecommendationStore, build_recommendations
+
+        populate(4, 'a')
+        user = User.objects.first()
+        products = list(Product.objects.order_by('pk'))
+
+        def buy(*items):
+            order = Order.objects.create(user=user, total=1000, status='delivered')
+            for product in items:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=1000)
+            return order
+
+        first = buy(products[0], products[1])
+        buy(products[0], products[2])
+        cancelled = buy(products[0], products[1])
+        Order.objects.filter(pk=cancelled.pk).update(status='cancelled')
+        with tempfile.TemporaryDirectory() as directory:
+            store = RecommendationStore(directory)
+            build_recommendations(full=True, store=store)
+            # Un item nuevo en una orden ya procesada y una orden nueva
+            OrderItem.objects.create(order=first, product=products[3], quantity=1, price=1000)
+            buy(products[0], products[2])
+            build_recommendations(store=store)
+            incremental = list(ProductRecommendation.objects.values_list('product', 'recommended', 'rank', 'score'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            build_recommendations(full=True, store=RecommendationStore(directory))
+            full = list(ProductRecommendation.objects.values_list('product', 'recommended', 'rank', 'score'))
+
+        self.assertEqual(incremental, full)
+        self.assertEqual(
+            list(products[0].recommendations.values_list('recommended', 'score')),
+            [(products[2].pk, 2), (products[1].pk, 1), (products[3].pk, 1)],
+        )
+
+    def test_incremental_build_drops_deleted_products(self):
+        from .recommendations import RecommendationStore, build_recommendations
+
+        populate(3, 'a')
+        user = User.objects.first()
+        products = list(Product.objects.order_by('pk'))
+
+        def buy(*items):
+            order = Order.objects.create(user=user, total=1000, status='delivered')
+            for product in items:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=1000)
+
+        buy(*products)
+        with tempfile.TemporaryDirectory() as directory:
+            store = RecommendationStore(directory)
+            build_recommendations(full=True, store=store)
+            products[2].delete()
+            # La matriz guardada todavía tiene pares con el producto borrado
+            buy(products[0], products[1])
+            build_recommendations(store=store)
+        self.assertEqual(
+            list(ProductRecommendation.objects.order_by('product', 'rank').values_list('product', 'recommended', 'score')),
+            [(products[0].pk, products[1].pk, 2), (products[1].pk, products[0].pk, 2)],
+        )
+
+    def test_archived_and_restored_orders_keep_their_co_purchases(self):
+        from .recommendations import RecommendationStore, build_recommendations
+
+        populate(3, 'a')
+        user = User.objects.first()
+        products = list(Product.objects.order_by('pk'))
+        old = Order.objects.create(user=user, total=1000, status='delivered')
+        for product in products[:2]:
+            OrderItem.objects.create(order=old, product=product, quantity=1, price=1000)
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+        def recommendations():
+            return list(ProductRecommendation.objects.order_by('product', 'rank')
+                        .values_list('product', 'recommended', 'score'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = RecommendationStore(directory)
+            build_recommendations(full=True, store=store)
+            expected = recommendations()
+            self.assertTrue(expected)
+
+            archive.archive_orders(timezone.now() - timedelta(days=365))
+            build_recommendations(full=True, store=store)
+            self.assertEqual(recommendations(), expected)
+
+            archive.restore_orders([old.pk])
+            build_recommendations(store=store)
+            self.assertEqual(recommendations(), expected)
+            build_recommendations(full=True, store=store)
+            self.assertEqual(recommendations(), expected)
+
+    def test_items_of_deleted_products_are_skipped(self):
+        from .recommendations import RecommendationStore, build_recommendations
+
+        populate(3, 'a')
+        user = User.objects.first()
+        products = list(Product.objects.order_by('pk'))
+        order = Order.objects.create(user=user, total=1000, status='delivered')
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=1000)
+        # El item queda con product vacío (SET_NULL)
+        products[2].delete()
+        with tempfile.TemporaryDirectory() as directory:
+            build_recommendations(full=True, store=RecommendationStore(directory))
+        self.assertEqual(
+            set(ProductRecommendation.objects.values_list('product', 'recommended')),
+            {(products[0].pk, products[1].pk), (products[1].pk, products[0].pk)},
+        )
+
+
+class SearchSuggestionTests(TestCase):
+    def test_prefix_matches_any_word_and_index_follows_changes(self):
+        category = Category.objects.create(name='Running')
+        product = Product.objects.create(name='Nike Air Máx', price=1000, category=category)
+        url = reverse('search_suggestions')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Adidas Ultra', price=1000)
+        response = self.client.get(url, {'q': 'max'})
+        self.assertEqual(response.json(), {'r': [['p', product.pk, 'Nike Air Máx']]})
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, {'q': 'run'}).json(), {'r': [['c', category.pk, 'Running']]})
+
+        # Sin consultas a la base una vez armado el índice
+        with self.assertNumQueries(0):
+            etag = self.client.get(url, {'q': 'air'})['ETag']
+        self.assertEqual(self.client.get(url, {'q': 'air'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Nike Zoom'
+            product.save()
+        self.assertEqual(self.client.get(url, {'q': 'air'}).json(), {'r': []})
+        self.assertEqual(len(self.client.get(url, {'q': 'zo'}).json()['r']), 1)
+
+
+class CatalogFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.running = Category.objects.create(name='Running')
+        self.urbanas = Category.objects.create(name='Urbanas')
+        user = User.objects.create(username='cliente')
+        for name, price, category, rating in [
+            ('Nike Air', 30000, self.running, 5),
+            ('Nike Zoom', 80000, self.running, 3),
+            ('Adidas Boost', 120000, self.running, None),
+            ('Vans Old Skool', 45000, self.urbanas, 4),
+        ]:
+            product = Product.objects.create(name=name, price=price, category=category)
+            if rating:
+                Review.objects.create(product=product, user=user, rating=rating, comment='ok')
+
+    def facets(self, **params):
+        response = self.client.get(reverse('product_list'), params)
+        return response, {
+            'categories': {c['name']: c['count'] for c in response.context['category_facets']},
+            'prices': [b['count'] for b in response.context['price_facets']],
+            'ratings': {r['value']: r['count'] for r in response.context['rating_facets']},
+        }
+
+    def test_counts_exclude_own_facet(self):
+        response, facets = self.facets(category=self.running.pk, rating=4)
+        self.assertEqual([p.name for p in response.context['products']], ['Nike Air'])
+        # Las categorías se cuentan con el filtro de rating pero sin el de categoría
+        self.assertEqual(facets['categories'], {'Running': 1, 'Urbanas': 1})
+        self.assertEqual(facets['prices'], [1, 0, 0, 0])
+        self.assertEqual(facets['ratings'], {4: 1, 3: 2, 2: 2, 1: 2})
+
+        _, facets = self.facets(search='nike', price='50000-100000')
+        self.assertEqual(facets['categories'], {'Running': 1, 'Urbanas': 0})
+        self.assertEqual(facets['prices'], [1, 1, 0, 0])
+
+    def test_single_grouped_query_then_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            get_facets(CatalogFilters(QueryDict('category=1&rating=2')))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('GROUP BY', queries[0]['sql'])
+        with self.assertNumQueries(0):
+            get_facets(CatalogFilters(QueryDict('rating=2&category=1&category=1')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=Product.objects.get(name='Adidas Boost'),
+                                  user=User.objects.get(username='cliente'), rating=2, comment='meh')
+        with self.assertNumQueries(1):
+            get_facets(CatalogFilters(QueryDict('category=1&rating=2')))
+
+
+class ProductReviewsTests(TestCase):
+    def add_reviews(self, product, count, rating=4):
+        for i in range(count):
+            user = User.objects.create(username=f'{product.pk}-{rating}-{i}')
+            Review.objects.create(product=product, user=user, rating=rating, comment='ok')
+
+    def test_detail_queries_do_not_depend_on_review_count(self):
+        few = Product.objects.create(name='Pocas', price=1000)
+        many = Product.objects.create(name='Muchas', price=1000)
+        self.add_reviews(few, 2)
+        self.add_reviews(many, 30)
+        self.client.get(reverse('product_detail', args=[few.pk]))
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('product_detail', args=[few.pk]))
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('product_detail', args=[many.pk]))
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(response.context['reviews']), 10)
+
+    def test_keyset_pages_cover_every_review_once(self):
+        product = Product.objects.create(name='Zapatilla', price=1000)
+        self.add_reviews(product, 25)
+        # Mismo created_at para todas: el id desempata
+        Review.objects.update(created_at=timezone.now())
+        seen, cursor = [], None
+        while True:
+            params = {'reviews': cursor} if cursor else {}
+            response = self.client.get(reverse('product_detail', args=[product.pk]), params)
+            seen += [review.pk for review in response.context['reviews']]
+            cursor = response.context['next_reviews_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, list(Review.objects.order_by('-id').values_list('pk', flat=True)))
+
+    def test_histogram_follows_creates_and_deletes(self):
+        product = Product.objects.create(name='Zapatilla', price=1000)
+        self.add_reviews(product, 3, rating=5)
+        self.add_reviews(product, 1, rating=2)
+        Review.objects.filter(rating=5).first().delete()
+        product.refresh_from_db()
+        self.assertEqual(product.star_counts, [0, 1, 0, 0, 2])
+        self.assertEqual((product.review_count, product.average_rating), (3, 4.0))
+
+
+class PriceDropAlertTests(TestCase):
+    def test_only_drops_below_known_price_are_notified_once(self):
+        populate(3, 'a')
+        cheaper, pricier, untouched = Product.objects.order_by('pk')
+        Notification.objects.all().delete()
+
+        cheaper.price = 800
+        cheaper.save()
+        pricier.price = 1500
+        pricier.save(update_fields=['price'])
+        self.assertIsNone(untouched.price_changed_at)
+
+        self.assertEqual(send_price_drop_alerts(batch_size=1), (2, 1))
+        notification = Notification.objects.get()
+        self.assertEqual(notification.notification_type, 'promo')
+        self.assertEqual(notification.user, cheaper.wishlist_set.get().user)
+        self.assertIn('$800', notification.message)
+
+        # Repetir no duplica; una baja nueva sí avisa
+        self.assertEqual(send_price_drop_alerts(), (2, 0))
+        cheaper.price = 700
+        cheaper.save()
+        self.assertEqual(send_price_drop_alerts()[1], 1)
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('comprador', password='clave-segura-123')
+        self.drop = Product.objects.create(name='Edición limitada', price=1000, stock=2)
+        self.free = Product.objects.create(name='Sin control', price=500)
+        self.shipping = {'full_name': 'Test', 'address': 'Calle 1', 'city': 'CABA', 'phone': '1'}
+
+    def order(self, quantity, payment_method='cash'):
+        return place_order(self.user, [(self.free, 1), (self.drop, quantity)], payment_method, **self.shipping)
+
+    def test_cannot_oversell_and_failed_order_writes_nothing(self):
+        self.order(2)
+        with self.assertRaises(OutOfStock):
+            self.order(1)
+        self.drop.refresh_from_db()
+        self.free.refresh_from_db()
+        self.assertEqual((self.drop.stock, self.free.stock), (0, None))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_payment_and_expiry_release_stock_once(self):
+        self.client.login(username='comprador', password='clave-segura-123')
+        rejected = self.order(1, 'mercadopago')
+        self.client.get(reverse('mercadopago_failure', args=[rejected.pk]))
+        self.client.get(reverse('mercadopago_failure', args=[rejected.pk]))
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 2)
+
+        abandoned = self.order(2, 'mercadopago')
+        self.assertEqual(expire_reservations(now=timezone.now()), 0)
+        self.assertEqual(expire_reservations(now=abandoned.reserved_until + timedelta(seconds=1)), 1)
+        self.drop.refresh_from_db()
+        self.assertEqual(self.drop.stock, 2)
+        self.assertEqual(Order.objects.get(pk=abandoned.pk).status, 'cancelled')
+
+        # Un pago que llega tarde no revive la orden
+        self.client.get(reverse('mercadopago_success', args=[abandoned.pk]))
+        self.assertEqual(Order.objects.get(pk=abandoned.pk).status, 'cancelled')
+
+    def test_reservation_expiring_mid_request_is_not_overwritten(self):
+        from django.shortcuts import get_object_or_404
+
+        self.client.login(username='comprador', password='clave-segura-123')
+
+        def load_then_expire(*args, **kwargs):
+            # La orden se lee pendiente y vence antes de que la vista escriba
+            order = get_object_or_404(*args, **kwargs)
+            expire_reservations(now=order.reserved_until + timedelta(seconds=1))
+            return order
+
+        for view in ('mercadopago_checkout', 'mercadopago_success'):
+            order = self.order(1, 'mercadopago')
+            with mock.patch('shop.views.get_object_or_404', load_then_expire):
+                response = self.client.get(reverse(view, args=[order.pk]))
+            self.assertRedirects(response, reverse('cart_view'), fetch_redirect_response=False)
+            order.refresh_from_db()
+            self.assertEqual((order.status, order.stock_reserved), ('cancelled', False))
+            self.drop.refresh_from_db()
+            self.assertEqual(self.drop.stock, 2)
+
+        # Recargar la página de éxito de una orden ya paga lleva a la confirmación
+        paid = self.order(1, 'mercadopago')
+        self.client.get(reverse('mercadopago_success', args=[paid.pk]))
+        response = self.client.get(reverse('mercadopago_success', args=[paid.pk]))
+        self.assertRedirects(response, reverse('order_confirmation', args=[paid.pk]), fetch_redirect_response=False)
+        self.assertEqual(Notification.objects.filter(title__startswith='Pago recibido').count(), 1)
+
+
+TEST_THROTTLE_BUDGETS = {
+    'login': [Budget('ip', 2, 60)],
+    'add_to_cart': [Budget('user', 1, 10)],
+    'update_cart': [Budget('ip', 2, 60), Budget('user', 1, 60)],
+}
+
+
+@override_settings(THROTTLE_ENABLED=True, THROTTLE_BUDGETS='shop.tests.TEST_THROTTLE_BUDGETS')
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttling.reset_backend()
+        self.addCleanup(throttling.reset_backend)
+
+    def test_login_gets_429_with_retry_after_and_is_counted(self):
+        url = reverse('login')
+        # Reloj fijo: nada se repone mientras corre el test
+        with mock.patch('shop.middleware.time.time', return_value=1000.0):
+            for _ in range(2):
+                self.assertEqual(self.client.post(url, {'username': 'x', 'password': 'y'}).status_code, 200)
+            response = self.client.post(url, {'username': 'x', 'password': 'y'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # Otra IP tiene su propio balde y los GET no cuentan
+        self.assertEqual(self.client.post(url, {}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(throttling.shed_counts()[('login', 'ip')], 1)
+
+    def test_user_budget_is_per_user(self):
+        product = Product.objects.create(name='Zapatilla', price=1000)
+        url = reverse('add_to_cart', args=[product.pk])
+        for username in ('ana', 'beto'):
+            self.client.force_login(User.objects.create(username=username))
+            self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertEqual(self.client.post(url).status_code, 429)
+        # Un GET no puede agregar al carrito salteándose el presupuesto
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.session['cart'], {str(product.pk): 1})
+
+    def test_rejected_request_does_not_spend_other_budgets(self):
+        url = reverse('update_cart', args=[1])
+        self.client.force_login(User.objects.create(username='ana'))
+        self.assertEqual(self.client.post(url).status_code, 302)
+        # Lo rechaza el presupuesto de ana: la ficha de la IP no se gasta
+        self.assertEqual(self.client.post(url).status_code, 429)
+        self.client.force_login(User.objects.create(username='beto'))
+        self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertEqual(throttling.shed_counts()[('update_cart', 'user')], 1)
+        self.assertEqual(throttling.shed_counts()[('update_cart', 'ip')], 0)
+
+    def test_bucket_refills_over_time(self):
+        budget = Budget('ip', 2, 10)
+        state, wait = throttling.take(None, 0, budget)
+        state, wait = throttling.take(state, 0, budget)
+        self.assertEqual(wait, 0)
+        state, wait = throttling.take(state, 1, budget)
+        self.assertAlmostEqual(wait, 4)
+        self.assertEqual(throttling.take(state, 5, budget)[1], 0)
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILER_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = Product.objects.create(name='Zapatilla', price=1000)
+        self.staff = User.objects.create(username='staff', is_staff=True)
+
+    def test_staff_can_profile_a_request(self):
+        self.client.force_login(self.staff)
+        url = reverse('product_detail', args=[self.product.pk])
+        response = self.client.get(url, {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        meta, _ = profiling.load_profile(profile_id)
+        self.assertEqual(meta['view'], 'product_detail')
+        self.assertTrue(meta['queries'])
+        self.assertTrue(any((query['callsite'] or '').startswith('shop/views.py:') for query in meta['queries']))
+        self.assertTrue(any((query['template'] or '').startswith('shop/') for query in meta['queries']))
+
+        self.assertContains(self.client.get(reverse('profile_list')), profile_id)
+        self.assertContains(self.client.get(reverse('profile_detail', args=[profile_id])), 'Consultas SQL')
+        folded = self.client.get(reverse('profile_download', args=[profile_id, 'folded'])).content.decode()
+        self.assertIn('product_detail (shop/views.py:', folded)
+        self.assertEqual(self.client.get(reverse('profile_download', args=[profile_id, 'pstats'])).status_code, 200)
+
+    def test_flag_is_ignored_for_customers(self):
+        self.client.force_login(User.objects.create(username='cliente'))
+        response = self.client.get(reverse('product_list'), HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_flag_is_parsed_not_searched(self):
+        factory = RequestFactory()
+        for query, headers, expected in [
+            ('_profile=1', {}, True), ('_profile=true', {}, True), ('', {'HTTP_X_PROFILE': '1'}, True),
+            ('_profile=0', {}, False), ('q=_profile', {}, False), ('_profile_x=1', {}, False),
+            ('', {'HTTP_X_PROFILE': '0'}, False),
+        ]:
+            with self.subTest(query=query, headers=headers):
+                self.assertEqual(profiling.requested(factory.get(f'/?{query}', **headers)), expected)
+
+
+class SlowQueryLogTests(TestCase):
+    def test_normalized_sql_ignores_values(self):
+        self.assertEqual(
+            slow_queries.normalize_sql('SELECT * FROM "shop_product"  WHERE "id" IN (%s, %s, %s) AND name = \'x\''),
+            slow_queries.normalize_sql('SELECT * FROM "shop_product" WHERE "id" IN (%s) AND name = \'it\'\'s\''),
+        )
+
+    def test_slow_queries_are_logged_with_callsite_and_reported(self):
+        product = Product.objects.create(name='Zapatilla', price=1000)
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'slow.log')
+            with override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_FILE=log_file), \
+                    connection.execute_wrapper(slow_queries.slow_query_wrapper):
+                self.client.get(reverse('product_detail', args=[product.pk]))
+            with open(log_file, encoding='utf-8') as log:
+                entries = [json.loads(line) for line in log]
+            callsites = {entry['callsite'] for entry in entries}
+            self.assertTrue(any(callsite and callsite.startswith('shop/views.py:') for callsite in callsites))
+            self.assertTrue(any(entry['template'] for entry in entries))
+
+            out = io.StringIO()
+            call_command('slow_query_report', file=log_file, sort='count', top=5, stdout=out)
+            self.assertIn(f'{len(entries)} consultas lentas', out.getvalue())
+
+
+class ProductionSettingsTests(TestCase):
+    def test_production_settings_enable_caching_and_compression(self):
+        with mock.patch.dict(os.environ, {'DJANGO_SECRET_KEY': 'x' * 50}):
+            production = importlib.import_module('tienda.settings_production')
+        self.assertFalse(production.DEBUG)
+        self.assertEqual(production.MIDDLEWARE[1:3], [
+            'django.middleware.gzip.GZipMiddleware', 'django.middleware.http.ConditionalGetMiddleware',
+        ])
+        self.assertEqual(production.TEMPLATES[0]['OPTIONS']['loaders'][0][0], 'django.template.loaders.cached.Loader')
+        self.assertEqual(production.DATABASES['default']['CONN_MAX_AGE'], 600)
+        self.assertTrue(production.SLOW_QUERY_LOG)
+        # Los settings de desarrollo no se tocan
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+        self.assertFalse(settings.SLOW_QUERY_LOG)
+
+    def test_warmup_compiles_every_shop_template(self):
+        self.assertEqual(warm_templates(), len(list(Path(settings.BASE_DIR, 'shop', 'templates').rglob('*.html'))))
+
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Running')
+        self.product = Product.objects.create(name='Zapatilla', price=1000, category=self.category, stock=5)
+        self.user = User.objects.create(username='ana')
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_product_detail_returns_304_until_product_or_review_changes(self):
+        url = reverse('product_detail', args=[self.product.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+
+        Review.objects.create(product=self.product, user=self.user, rating=5, comment='Buenísimas')
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_rotated_csrf_token_is_not_served_from_cache(self):
+        url = reverse('product_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+        # Como después de un rotate_token: la copia cacheada tiene un token que ya no vale
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.revalidate(url, response['ETag']).status_code, 304)
+
+    def test_product_list_etag_tracks_stock_categories_and_wishlist(self):
+        url = reverse('product_list')
+        self.client.force_login(self.user)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+        for change in (
+            lambda: reserve_stock([(self.product.pk, 1)]),
+            lambda: Category.objects.filter(pk=self.category.pk).delete(),
+            lambda: Wishlist.objects.create(user=self.user, product=self.product),
+        ):
+            change()
+            response = self.revalidate(url, etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+        # Otro usuario tiene su propio ETag
+        self.client.force_login(User.objects.create(username='beto'))
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+
+class CustomerAnalyticsTests(TestCase):
+    def order(self, user, days_ago, total, status='delivered'):
+        order = Order.objects.create(user=user, full_name='Test', address='Calle 1', city='CABA',
+                                     phone='1', payment_method='cash', total=total, status=status)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_rfm_segments_and_cohorts(self):
+        fiel, nueva, perdido = (User.objects.create(username=name) for name in ('fiel', 'nueva', 'perdido'))
+        # Separadas por más de un mes, así caen en meses distintos
+        for days_ago in (150, 100, 50, 1):
+            self.order(fiel, days_ago, 5000)
+        self.order(nueva, 5, 1000)
+        self.order(nueva, 5, 9000, status='cancelled')
+        self.order(perdido, 150, 2000)
+
+        report = analytics.build_customer_analytics(chunk_size=2)
+
+        self.assertEqual((report['orders'], report['customers']), (6, 3))
+        rfm = {row.user_id: row for row in CustomerRFM.objects.all()}
+        self.assertEqual((rfm[fiel.pk].frequency, rfm[fiel.pk].monetary, rfm[fiel.pk].recency_days), (4, 20000, 1))
+        self.assertEqual(rfm[nueva.pk].monetary, 1000)
+        self.assertEqual(rfm[fiel.pk].segment, 'champions')
+        self.assertEqual(rfm[perdido.pk].segment, 'lost')
+        self.assertEqual(rfm[fiel.pk].cohort, rfm[perdido.pk].cohort)
+
+        # fiel y perdido comparten la primera cohorte; solo fiel vuelve a comprar
+        first = report['cohorts'][0]
+        self.assertEqual((first['size'], first['active'][0]), (2, 2))
+        self.assertEqual(sum(first['active'][1:]), 3)
+        self.assertEqual(sum(cohort['size'] for cohort in report['cohorts']), 3)
+
+        # Recalcular reemplaza las filas en lugar de duplicarlas
+        analytics.build_customer_analytics()
+        self.assertEqual(CustomerRFM.objects.count(), 3)
+        self.assertEqual(AnalyticsReport.objects.count(), 1)
+
+    def test_staff_page(self):
+        self.order(User.objects.create(username='ana'), 3, 1000)
+        call_command('build_customer_analytics', stdout=io.StringIO())
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        response = self.client.get(reverse('customer_analytics'), {'segmento': 'lost'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Retención por cohorte')
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ana')
+        self.product = Product.objects.create(name='Zapatilla', price=1000)
+        self.orders = {}
+        for name, status, days_ago in [('viejo_entregado', 'delivered', 400), ('viejo_cancelado', 'cancelled', 500),
+                                       ('viejo_pendiente', 'pending', 450), ('nuevo', 'delivered', 10)]:
+            order = Order.objects.create(user=self.user, full_name='Ana', address='Calle 1', city='CABA',
+                                         phone='1', payment_method='cash', total=1000, status=status)
+            OrderItem.objects.create(order=order, product=self.product, quantity=2, price=500)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+            self.orders[name] = order.pk
+
+    def test_archive_keeps_history_pages_and_totals(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        totals = self.client.get(reverse('admin_dashboard')).context
+        totals = (totals['total_orders'], totals['total_revenue'], list(totals['top_products']))
+        self.assertEqual(totals[2], [{'product_name': 'Zapatilla', 'total_sold': 8}])
+
+        archived = archive.archive_orders(timezone.now() - timedelta(days=365), batch_size=1)
+
+        self.assertEqual(archived, 2)
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)),
+                         {self.orders['viejo_pendiente'], self.orders['nuevo']})
+        old = ArchivedOrder.objects.get(pk=self.orders['viejo_entregado'])
+        self.assertEqual((old.created_at.date(), old.items.get().quantity),
+                         ((timezone.now() - timedelta(days=400)).date(), 2))
+        context = self.client.get(reverse('admin_dashboard')).context
+        self.assertEqual((context['total_orders'], context['total_revenue'], context['top_products']), totals)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('order_history'))
+        self.assertEqual([order.pk for order in response.context['orders']], [
+            self.orders['nuevo'], self.orders['viejo_entregado'], self.orders['viejo_pendiente'],
+            self.orders['viejo_cancelado'],
+        ])
+        for view in ('order_confirmation', 'export_order_pdf'):
+            self.assertEqual(self.client.get(reverse(view, args=[old.pk])).status_code, 200)
+
+    def test_restore_moves_orders_back(self):
+        archive.archive_orders(timezone.now() - timedelta(days=365))
+        call_command('archive_orders', restore=str(self.orders['viejo_cancelado']), stdout=io.StringIO())
+
+        restored = Order.objects.get(pk=self.orders['viejo_cancelado'])
+        self.assertEqual((restored.status, restored.items.count()), ('cancelled', 1))
+        self.assertEqual(list(ArchivedOrder.objects.values_list('pk', flat=True)), [self.orders['viejo_entregado']])
+        self.assertEqual(archive.archive_totals(), {'orders': 1, 'revenue': 1000})
+
+
+class ProductApiTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Running')
+        self.products = [
+            Product.objects.create(name=f'Zapatilla {i}', price=1000 * (i + 1), category=self.category)
+            for i in range(5)
+        ]
+        user = User.objects.create(username='ana')
+        for product in self.products:
+            Review.objects.create(product=product, user=user, rating=4, comment='Buenas')
+
+    def test_ids_in_one_query_with_category_and_rating(self):
+        ids = [self.products[3].pk, self.products[0].pk, 999]
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('product_api'), {'ids': ','.join(map(str, ids))})
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['products']], ids[:2])
+        self.assertEqual(data['missing'], [999])
+        first = data['products'][0]
+        self.assertEqual(first['category'], {'id': self.category.pk, 'name': 'Running'})
+        self.assertEqual(first['rating'], {'average': 4.0, 'count': 1, 'histogram': [0, 0, 0, 1, 0]})
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('product_api'), {'ids': ','.join(map(str, ids))},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_sparse_fields_filters_and_cursor(self):
+        url = reverse('product_api')
+        data = self.client.get(url, {'fields': 'price', 'price_min': 2000, 'limit': 3}).json()
+        self.assertEqual(data['products'], [{'id': product.pk, 'price': product.price} for product in self.products[1:4]])
+        data = self.client.get(url, {'fields': 'price', 'price_min': 2000, 'limit': 3, 'after': data['next']}).json()
+        self.assertEqual(([item['id'] for item in data['products']], data['next']), ([self.products[4].pk], None))
+
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': ','.join(['1'] * 50 + [str(i) for i in range(200)])}).status_code, 400)
+
+
+class OrderItemSnapshotTests(TestCase):
+    def test_history_keeps_product_data_from_checkout(self):
+        user = User.objects.create(username='ana')
+        product = Product.objects.create(name='Zapatilla Run', price=1000, image='products/run.jpg',
+                                         category=Category.objects.create(name='Running'))
+        order = place_order(user, [(product, 2)], 'cash', full_name='Ana', address='Calle 1', city='CABA', phone='1')
+        item = order.items.get()
+        self.assertEqual((item.product_name, item.product_image, item.category_name),
+                         ('Zapatilla Run', 'products/run.jpg', 'Running'))
+
+        product.name = 'Zapatilla Run 2'
+        product.save()
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order_history'))
+        self.assertContains(response, 'Zapatilla Run<')
+        self.assertFalse([query for query in queries if 'shop_product' in query['sql']])
+
+        # Borrar el producto no borra la compra
+        product.delete()
+        item.refresh_from_db()
+        self.assertIsNone(item.product_id)
+        self.assertContains(self.client.get(reverse('export_order_pdf', args=[order.pk])), 'Zapatilla Run<')
+
+
+def png_bytes(color='red'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ProductImageStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        override = override_settings(MEDIA_ROOT=media.name, PRODUCT_IMAGE_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, name, content):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('create_product'), {
+                'name': name, 'price': 1000, 'description': 'x', 'image': SimpleUploadedFile(name, content),
+            })
+
+    def test_identical_uploads_share_one_content_addressed_file(self):
+        self.upload('foto.PNG', png_bytes())
+        self.upload('otra.png', png_bytes())
+        names = set(Product.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertRegex(name, r'^products/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(len([path for path in self.media.rglob('*') if path.is_file()]), 1)
+
+    def test_invalid_images_are_rejected_or_removed_after_commit(self):
+        response = self.upload('texto.png', b'no soy una imagen')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Product.objects.exists())
+
+        # La firma es de PNG pero no decodifica: se guarda y el procesamiento la quita
+        self.upload('rota.png', png_bytes()[:40])
+        self.assertEqual(Product.objects.get().image.name, '')
+
+    def test_gc_keeps_referenced_and_recent_files(self):
+        self.upload('usada.png', png_bytes('red'))
+        self.upload('vieja.png', png_bytes('blue'))
+        product = Product.objects.get(name='vieja.png')
+        old_image = product.image.name
+        Product.objects.filter(pk=product.pk).update(image='')
+
+        call_command('gc_images', stdout=io.StringIO())
+        self.assertTrue((self.media / old_image).exists())
+        call_command('gc_images', min_age_hours=0, stdout=io.StringIO())
+        self.assertFalse((self.media / old_image).exists())
+        self.assertTrue((self.media / Product.objects.get(name='usada.png').image.name).exists())
+
+
+
+class StaticExportTests(TestCase):
+    def setUp(self):
+        output = tempfile.TemporaryDirectory()
+        self.addCleanup(output.cleanup)
+        self.output = Path(output.name)
+        self.category = Category.objects.create(name='Running')
+        self.products = [
+            Product.objects.create(name=f'Zapatilla {i}', price=1000 * (i + 1), category=self.category)
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user('ana', password='x')
+
+    def export(self, **options):
+        return export_catalog(self.output, page_size=2, **options)
+
+    def test_only_changed_pages_are_rendered_again(self):
+        first = self.export()
+        # 3 productos, 2 páginas del catálogo y 2 de la categoría
+        self.assertEqual(first, {'rendered': 7, 'skipped': 0, 'removed': 0})
+        page = (self.output / 'producto' / str(self.products[0].pk) / 'index.html').read_text()
+        self.assertIn('Zapatilla 0', page)
+        self.assertNotIn('name="csrfmiddlewaretoken"', page)
+        self.assertIn(reverse('page_state'), page)
+        data = json.loads((self.output / 'pagina' / '2' / 'index.json').read_text())
+        self.assertEqual([item['id'] for item in data['products']], [self.products[2].pk])
+
+        self.assertEqual(self.export()['rendered'], 0)
+
+        # Una review cambia su producto y, por los conteos de rating de las facetas, los listados
+        Review.objects.create(product=self.products[2], user=self.user, rating=5, comment='Excelentes')
+        self.assertEqual(self.export(), {'rendered': 5, 'skipped': 2, 'removed': 0})
+        # Un cambio de precio que no mueve facetas: el producto y su página de cada listado
+        Product.objects.filter(pk=self.products[0].pk).update(price=1500, updated_at=timezone.now())
+        self.assertEqual(self.export(), {'rendered': 3, 'skipped': 4, 'removed': 0})
+
+        self.products[2].delete()
+        result = self.export()
+        self.assertEqual(result['removed'], 3)
+        self.assertFalse((self.output / 'producto' / str(self.products[2].pk)).exists())
+        self.assertFalse((self.output / 'pagina').exists())
+        self.assertEqual(self.export(force=True)['rendered'], 4)
+
+    def test_exported_listing_paths_are_site_routes(self):
+        self.export()
+        pages = json.loads((self.output / 'manifest.json').read_text())['pages']
+        listings = sorted(path for path in pages if not path.startswith('producto/'))
+        category = self.category.pk
+        self.assertEqual(listings, sorted([
+            '', 'pagina/2/', f'categoria/{category}/', f'categoria/{category}/pagina/2/',
+        ]))
+        with override_settings(STATIC_EXPORT_PAGE_SIZE=2):
+            for path in listings:
+                response = self.client.get('/' + path)
+                self.assertEqual(response.status_code, 200, path)
+            response = self.client.get(f'/categoria/{category}/pagina/2/')
+            self.assertEqual([product.pk for product in response.context['products']], [self.products[2].pk])
+            self.assertContains(response, f'href="/categoria/{category}/"')
+            self.assertEqual(self.client.get('/pagina/3/').status_code, 404)
+            self.assertEqual(self.client.get(f'/categoria/{category + 1}/').status_code, 404)
+
+    def test_page_state_has_the_user_dependent_parts(self):
+        Wishlist.objects.create(user=self.user, product=self.products[1])
+        session = self.client.session
+        session['cart'] = {str(self.products[0].pk): 2}
+        session.save()
+        state = self.client.get(reverse('page_state')).json()
+        self.assertEqual((state['user'], state['cart_count']), (None, 2))
+        self.assertTrue(state['csrf_token'])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('page_state'))
+        self.assertIn('no-store', response['Cache-Control'])
+        state = response.json()
+        self.assertEqual(state['wishlist_ids'], [self.products[1].pk])
+        self.assertIn(reverse('logout'), state['nav'])
@@ -0,0 +1,155 @@
+"""
+Throttling por token bucket para las rutas caras o abusables (login, carrito,
+cupones, checkout). Los presupuestos por ruta están en THROTTLE_BUDGETS de
+shop/urls.py.
+
+Cada presupuesto es un balde de `requests` fichas que se rellena a razón de
+`requests / period` fichas por segundo, por IP o por usuario. Sin fichas la
+respuesta es un 429 con Retry-After, antes de llegar a la vista (sin hash de
+contraseña ni escritura de sesión). Si a una ruta le tocan varios
+presupuestos, el pedido gasta una ficha de cada uno solo cuando todos tienen:
+un pedido rechazado no gasta nada.
+
+El middleware es shop.middleware.ThrottleMiddleware.
+
+Backends (THROTTLE_BACKEND):
+- 'memory': dict por proceso. Rápido, pero cada worker lleva su propia cuenta.
+- 'cache': el cache de Django (THROTTLE_CACHE_ALIAS), compartido entre procesos.
+  La lectura y escritura del balde no son atómicas: con mucha concurrencia se
+  puede colar alguna ficha de más, que es aceptable para frenar abusos.
+"""
+import math
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+# scope: 'ip' o 'user' (los anónimos caen en la IP)
+Budget = namedtuple('Budget', ['scope', 'requests', 'period', 'methods'], defaults=[('POST',)])
+
+
+def refill(tokens, updated, now, budget):
+    """Fichas disponibles en `now` para un balde que tenía `tokens` en `updated`."""
+    rate = budget.requests / budget.period
+    return min(budget.requests, tokens + max(0, now - updated) * rate)
+
+
+def take(state, now, budget):
+    """
+    Intenta gastar una ficha. `state` es (tokens, updated) o None si el balde
+    es nuevo. Devuelve (nuevo_state, segundos_a_esperar); 0 significa permitido.
+    """
+    tokens = budget.requests if state is None else refill(*state, now, budget)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    rate = budget.requests / budget.period
+    return (tokens, now), (1 - tokens) / rate
+
+
+class MemoryBackend:
+    max_keys = 100_000
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def consume(self, keys, budgets, now):
+        with self.lock:
+            results = [take(self.buckets.get(key), now, budget) for key, budget in zip(keys, budgets)]
+            waits = [wait for _, wait in results]
+            if any(waits):
+                return waits
+            for key, (state, _) in zip(keys, results):
+                self.buckets[key] = state
+                self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return waits
+
+    def incr(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def get_counters(self, keys):
+        return {key: self.counters.get(key, 0) for key in keys}
+
+
+class CacheBackend:
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def consume(self, keys, budgets, now):
+        states = self.cache.get_many(keys)
+        results = [take(states.get(key), now, budget) for key, budget in zip(keys, budgets)]
+        waits = [wait for _, wait in results]
+        if any(waits):
+            return waits
+        for key, budget, (state, _) in zip(keys, budgets, results):
+            # El balde lleno es igual a no tenerlo: vence cuando termina de rellenarse
+            self.cache.set(key, state, math.ceil(budget.period) + 1)
+        return waits
+
+    def incr(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, None)
+            self.cache.incr(key)
+
+    def get_counters(self, keys):
+        values = self.cache.get_many(keys)
+        return {key: values.get(key, 0) for key in keys}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if getattr(settings, 'THROTTLE_BACKEND', 'memory') == 'cache':
+                    _backend = CacheBackend(getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default'))
+                else:
+                    _backend = MemoryBackend()
+    return _backend
+
+
+def reset_backend():
+    global _backend
+    _backend = None
+
+
+def get_budgets():
+    return import_string(getattr(settings, 'THROTTLE_BUDGETS', 'shop.urls.THROTTLE_BUDGETS'))
+
+
+def client_ip(request):
+    # Detrás de N proxies confiables la IP real es la N-ésima desde el final
+    proxies = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def shed_key(route, scope):
+    return f'throttle:shed:{route}:{scope}'
+
+
+def shed_counts():
+    """{(ruta, alcance): requests rechazados} según el backend configurado."""
+    keys = {
+        shed_key(route, budget.scope): (route, budget.scope)
+        for route, budgets in get_budgets().items() for budget in budgets
+    }
+    counters = get_backend().get_counters(list(keys))
+    return {keys[key]: count for key, count in counters.items()}
+
@@ -1,11 +1,20 @@
 from django.urls import path
-from . import views
+from . import async_views, views
+from .throttling import Budget
 
 urlpatterns = [
     # Productos
     path('', views.product_list, name='product_list'),
+    # Listado de a STATIC_EXPORT_PAGE_SIZE: las rutas que genera export_static
+    path('pagina/<int:page>/', views.catalog_page, name='catalog_page'),
+    path('categoria/<int:category_id>/', views.catalog_page, name='category_page'),
+    path('categoria/<int:category_id>/pagina/<int:page>/', views.catalog_page, name='category_page'),
     path('producto/<int:product_id>/', views.product_detail, name='product_detail'),
     path('agregar-producto/', views.create_product, name='create_product'),
+    path('importar-catalogo/', views.import_catalog, name='import_catalog'),
+    path('sugerencias/', views.search_suggestions, name='search_suggestions'),
+    path('api/productos/', views.product_api, name='product_api'),
+    path('estado/', views.page_state, name='page_state'),
     
     # Carrito
     path('carrito/', views.cart_view, name='cart_view'),
@@ -45,4 +54,27 @@ urlpatterns = [
     
     # Admin Dashboard
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('dashboard/exportar-ordenes/', views.export_orders_csv, name='export_orders_csv'),
+    path('dashboard/clientes/', views.customer_analytics, name='customer_analytics'),
+    path('perfiles/', views.profile_list, name='profile_list'),
+    path('perfiles/<str:profile_id>/', views.profile_detail, name='profile_detail'),
+    path('perfiles/<str:profile_id>/<str:fmt>/', views.profile_download, name='profile_download'),
+    
+    # Vistas de lectura async (ASGI), en paralelo a las sync
+    path('async/', async_views.product_list, name='async_product_list'),
+    path('async/producto/<int:product_id>/', async_views.product_detail, name='async_product_detail'),
+    path('async/wishlist/', async_views.wishlist_view, name='async_wishlist'),
+    path('async/notificaciones/count/', async_views.get_unread_count, name='async_get_unread_count'),
 ]
+
+# Throttling por ruta (ver shop/throttling.py): Budget(alcance, pedidos, segundos).
+# Por defecto solo cuentan los POST. Los anónimos de un presupuesto 'user' se
+# cuentan por IP.
+THROTTLE_BUDGETS = {
+    'login': [Budget('ip', 10, 60)],
+    'register': [Budget('ip', 5, 300)],
+    'add_to_cart': [Budget('ip', 120, 60), Budget('user', 60, 60)],
+    'update_cart': [Budget('ip', 120, 60), Budget('user', 60, 60)],
+    'apply_coupon': [Budget('ip', 20, 60), Budget('user', 10, 60)],
+    'checkout': [Budget('user', 10, 60)],
+}
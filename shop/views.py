@@ -3,12 +3,30 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Sum, Count
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_POST
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404, JsonResponse, HttpResponse, QueryDict, StreamingHttpResponse
+from django.views.decorators.http import etag, require_GET, require_POST
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils import timezone
-from django.template.loader import get_template
-from .models import Product, Category, Order, OrderItem, Profile, Review, Wishlist, Coupon, Notification
-from .forms import ProductForm, RegisterForm, ProfileForm, CheckoutForm, ReviewForm
+from django.template.loader import get_template, render_to_string
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.conf import settings
+from .models import Product, Category, Order, OrderItem, Profile, Review, Wishlist, Coupon, Notification, ProductRecommendation, AnalyticsReport, ArchivedOrderItem, CustomerRFM
+from .forms import ProductForm, RegisterForm, ProfileForm, CheckoutForm, ReviewForm, CatalogImportForm, OrderExportForm
+from .catalog_import import ENCODING as CATALOG_ENCODING, CatalogImporter, RowError, check_encoding, detect_format, read_rows
+from . import api, archive, profiling, search as search_index, throttling
+from .conditional import catalog_state, conditional_page, product_state
+from .facets import CatalogFilters, facet_context
+from .images import schedule_processing as schedule_image_processing
+from .orders import place_order
+from .stock import OutOfStock, release_stock
+import csv
+import datetime
+import hashlib
+import io
+import itertools
 import logging
 import json
 
@@ -16,36 +34,91 @@ logger = logging.getLogger(__name__)
 
 # ===== PRODUCTOS =====
 
+@conditional_page(catalog_state)
 def product_list(request):
-    products = Product.objects.all()
-    categories = Category.objects.all()
-    
-    category_id = request.GET.get('category')
-    if category_id:
-        products = products.filter(category_id=category_id)
-    
-    search = request.GET.get('search')
-    if search:
-        products = products.filter(
-            Q(name__icontains=search) | Q(description__icontains=search)
-        )
-    
+    filters = CatalogFilters(request.GET)
+    products = filters.apply(Product.objects.select_related('category').with_ratings())
+    return render(request, 'shop/product_list.html', catalog_context(request, filters, products))
+
+def listing_url(category_id=None, page=1):
+    """Ruta de una página del listado paginado (la página 1 del catálogo es product_list)."""
+    if category_id is None:
+        return reverse('product_list') if page == 1 else reverse('catalog_page', args=[page])
+    if page == 1:
+        return reverse('category_page', args=[category_id])
+    return reverse('category_page', args=[category_id, page])
+
+def listing_links(paginator, category_id=None):
+    """[(número, url)] de las páginas, o None si hay una sola (el template no muestra la paginación)."""
+    links = [(number, listing_url(category_id, number)) for number in paginator.page_range]
+    return links if len(links) > 1 else None
+
+@conditional_page(catalog_state)
+def catalog_page(request, category_id=None, page=1):
+    """
+    El listado de a STATIC_EXPORT_PAGE_SIZE productos, en las mismas rutas
+    que export_static: lo que el CDN no tiene lo sirve Django igual.
+    """
+    query = QueryDict(mutable=True)
+    if category_id is not None:
+        get_object_or_404(Category, pk=category_id)
+        query['category'] = str(category_id)
+    filters = CatalogFilters(query)
+    products = filters.apply(Product.objects.select_related('category').with_ratings()).order_by('pk')
+    paginator = Paginator(products, settings.STATIC_EXPORT_PAGE_SIZE)
+    try:
+        current = paginator.page(page)
+    except InvalidPage:
+        raise Http404('Página inexistente')
+    return render(request, 'shop/product_list.html', {
+        **catalog_context(request, filters, current.object_list),
+        'export_pages': listing_links(paginator, category_id),
+        'export_page': current.number,
+    })
+
+def catalog_context(request, filters, products, facets=None):
+    """Contexto de product_list (también lo usa export_static, con `facets` ya calculadas)."""
     # Wishlist del usuario
     wishlist_ids = []
     if request.user.is_authenticated:
         wishlist_ids = list(request.user.wishlists.values_list('product_id', flat=True))
     
-    return render(request, 'shop/product_list.html', {
+    return {
         'products': products,
-        'categories': categories,
-        'selected_category': category_id,
-        'search': search or '',
+        'filters': filters,
+        'search': filters.search,
         'wishlist_ids': wishlist_ids,
-    })
+        **facet_context(filters, facets),
+    }
 
+def reviews_page(product, cursor=None):
+    """
+    Una página de reviews (más nuevas primero) con el usuario ya cargado.
+    `cursor` es el "created_at,id" de la última review de la página anterior;
+    se trae una review de más para saber si hay otra página.
+    """
+    reviews = product.reviews.select_related('user')
+    try:
+        created_at, review_id = cursor.rsplit(',', 1)
+        created_at, review_id = datetime.datetime.fromisoformat(created_at), int(review_id)
+    except (AttributeError, ValueError):
+        pass
+    else:
+        reviews = reviews.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=review_id))
+    return reviews[:settings.REVIEWS_PER_PAGE + 1]
+
+def split_reviews_page(reviews):
+    """Separa la review de más que trae reviews_page y devuelve (reviews, cursor siguiente)."""
+    reviews = list(reviews)
+    if len(reviews) <= settings.REVIEWS_PER_PAGE:
+        return reviews, None
+    reviews = reviews[:settings.REVIEWS_PER_PAGE]
+    return reviews, f'{reviews[-1].created_at.isoformat()},{reviews[-1].id}'
+
+@conditional_page(product_state)
 def product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    reviews = product.reviews.all()
+    product = get_object_or_404(Product.objects.select_related('category'), id=product_id)
+    reviews, next_cursor = split_reviews_page(reviews_page(product, request.GET.get('reviews')))
     user_review = None
     can_review = False
     in_wishlist = False
@@ -67,30 +140,134 @@ def product_detail(request, product_id):
     else:
         form = ReviewForm()
     
+    # Precalculadas por build_recommendations: una consulta por índice
+    recommendations = ProductRecommendation.objects.filter(product=product).select_related('recommended')
+
     return render(request, 'shop/product_detail.html', {
         'product': product,
         'reviews': reviews,
+        'next_reviews_cursor': next_cursor,
+        'paginated_reviews': 'reviews' in request.GET,
         'form': form,
         'user_review': user_review,
         'can_review': can_review,
         'in_wishlist': in_wishlist,
+        'recommendations': recommendations,
     })
 
+def _suggestions_etag(request):
+    # La respuesta depende solo de la versión del índice y de los parámetros
+    params = hashlib.md5(request.GET.urlencode().encode(), usedforsecurity=False).hexdigest()
+    return f'{search_index.current_version()}-{params}'
+
+
+@require_GET
+@etag(_suggestions_etag)
+def search_suggestions(request):
+    """Sugerencias del buscador: JSON mínimo salido del índice en memoria."""
+    try:
+        limit = min(int(request.GET.get('limit', settings.SEARCH_SUGGESTIONS_LIMIT)), 20)
+    except ValueError:
+        limit = settings.SEARCH_SUGGESTIONS_LIMIT
+    results = search_index.get_index().suggest(request.GET.get('q', ''), max(limit, 1))
+    response = JsonResponse({'r': [[kind, pk, name] for kind, pk, name in results]})
+    patch_cache_control(response, public=True, max_age=settings.SEARCH_SUGGESTIONS_MAX_AGE)
+    return response
+
+@require_GET
+def page_state(request):
+    """
+    Lo que depende del usuario en las páginas exportadas por export_static:
+    token CSRF, carrito, y si hay sesión, la wishlist y la barra de navegación.
+    """
+    state = {
+        'csrf_token': get_token(request),
+        'cart_count': sum(request.session.get('cart', {}).values()),
+        'user': None,
+    }
+    if request.user.is_authenticated:
+        state.update(
+            user=request.user.username,
+            wishlist_ids=list(request.user.wishlists.values_list('product_id', flat=True)),
+            notifications=request.user.notifications.filter(read=False).count(),
+            nav=render_to_string('shop/_nav.html', request=request),
+        )
+    response = JsonResponse(state)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+@require_GET
+def product_api(request):
+    """Productos en JSON, varios por request (ver shop/api.py)."""
+    try:
+        payload, last_modified = api.fetch_products(request.GET)
+    except api.InvalidQuery as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    response = JsonResponse(payload, json_dumps_params={'separators': (',', ':')})
+    # No depende del usuario: se puede cachear en el cliente y en un CDN
+    patch_cache_control(response, public=True, max_age=settings.PRODUCT_API_MAX_AGE)
+    etag = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    response['ETag'] = etag
+    last_modified = last_modified and int(last_modified.timestamp())
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
 def create_product(request):
     if request.method == "POST":
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
-            form.save()
+            product = form.save()
+            schedule_image_processing(product)
             return redirect('product_list')
     else:
         form = ProductForm()
     return render(request, 'shop/create_product.html', {"form": form})
 
+@login_required
+def import_catalog(request):
+    if not request.user.is_staff:
+        messages.error(request, 'No tenés permisos para acceder a esta página')
+        return redirect('product_list')
+    
+    report = None
+    if request.method == 'POST':
+        form = CatalogImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                check_encoding(upload.file)
+            except RowError as exc:
+                form.add_error('file', str(exc))
+            else:
+                # Se lee el archivo subido como texto, fila por fila
+                stream = io.TextIOWrapper(upload.file, encoding=CATALOG_ENCODING, newline='')
+                importer = CatalogImporter(image_dir=getattr(settings, 'CATALOG_IMPORT_IMAGE_DIR', None))
+                report = importer.run(read_rows(stream, detect_format(upload.name)))
+                logger.info(
+                    f"Importación de catálogo por {request.user.username}: {report.rows} filas, "
+                    f"{report.created} creados, {report.updated} actualizados, {report.error_count} errores, "
+                    f"{report.without_image} sin imagen"
+                )
+    else:
+        form = CatalogImportForm()
+    
+    return render(request, 'shop/import_catalog.html', {'form': form, 'report': report})
+
 # ===== CARRITO =====
 
+@require_POST
 def add_to_cart(request, product_id):
     cart = request.session.get('cart', {})
     quantity = int(request.POST.get('quantity', 1))
+    # Aviso temprano: la reserva real se hace en el checkout
+    stock = Product.objects.filter(id=product_id).values_list('stock', flat=True).first()
+    if stock is not None and cart.get(str(product_id), 0) + quantity > stock:
+        if not stock:
+            messages.error(request, 'Producto agotado')
+        else:
+            messages.error(request, 'Solo queda 1 unidad' if stock == 1 else f'Solo quedan {stock} unidades')
+        return redirect(request.META.get('HTTP_REFERER', 'product_list'))
     cart[str(product_id)] = cart.get(str(product_id), 0) + quantity
     request.session['cart'] = cart
     messages.success(request, 'Producto agregado al carrito')
@@ -103,7 +280,8 @@ def cart_view(request):
     subtotal = 0
     
     for pid, qty in cart.items():
-        product = get_object_or_404(Product, id=pid)
+        # Con la categoría: la orden guarda una copia de los datos del producto
+        product = get_object_or_404(Product.objects.select_related('category'), id=pid)
         item_subtotal = product.price * qty
         subtotal += item_subtotal
         items.append({'product': product, 'quantity': qty, 'subtotal': item_subtotal})
@@ -244,8 +422,8 @@ def profile_view(request):
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'shop/order_history.html', {'orders': orders})
+    # Incluye las órdenes viejas que ya pasaron al archivo
+    return render(request, 'shop/order_history.html', {'orders': archive.user_orders(request.user)})
 
 # ===== WISHLIST =====
 
@@ -311,7 +489,8 @@ def checkout(request):
     items = []
     subtotal = 0
     for pid, qty in cart.items():
-        product = get_object_or_404(Product, id=pid)
+        # Con la categoría: la orden guarda una copia de los datos del producto
+        product = get_object_or_404(Product.objects.select_related('category'), id=pid)
         item_subtotal = product.price * qty
         subtotal += item_subtotal
         items.append({'product': product, 'quantity': qty, 'subtotal': item_subtotal})
@@ -343,33 +522,23 @@ def checkout(request):
         if form.is_valid():
             payment_method = form.cleaned_data['payment_method']
             
-            # Crear la orden
-            order = Order.objects.create(
-                user=request.user,
-                full_name=form.cleaned_data['full_name'],
-                address=form.cleaned_data['address'],
-                city=form.cleaned_data['city'],
-                phone=form.cleaned_data['phone'],
-                payment_method=payment_method,
-                coupon=coupon,
-                discount=discount,
-                subtotal=subtotal,
-                total=total
-            )
-            
-            for pid, qty in cart.items():
-                product = get_object_or_404(Product, id=pid)
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=qty,
-                    price=product.price
+            # Crear la orden reservando el stock
+            try:
+                order = place_order(
+                    request.user,
+                    [(item['product'], item['quantity']) for item in items],
+                    payment_method,
+                    coupon=coupon,
+                    discount=discount,
+                    full_name=form.cleaned_data['full_name'],
+                    address=form.cleaned_data['address'],
+                    city=form.cleaned_data['city'],
+                    phone=form.cleaned_data['phone'],
                 )
-            
-            # Incrementar uso de cupón
-            if coupon:
-                coupon.times_used += 1
-                coupon.save()
+            except OutOfStock as exc:
+                product = next(item['product'] for item in items if item['product'].pk == exc.product_id)
+                messages.error(request, f'No queda stock suficiente de {product.name}')
+                return redirect('cart_view')
             
             # Si es MercadoPago, redirigir a pago
             if payment_method == 'mercadopago':
@@ -409,7 +578,7 @@ def checkout(request):
 
 @login_required
 def order_confirmation(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = archive.get_order_or_404(order_id, user=request.user)
     return render(request, 'shop/order_confirmation.html', {
         'order': order,
         'email_sent': True
@@ -417,6 +586,16 @@ def order_confirmation(request, order_id):
 
 # ===== MERCADOPAGO =====
 
+def _reservation_gone(request, order):
+    """Respuesta cuando la orden ya no está pendiente con su stock reservado."""
+    order.refresh_from_db(fields=['status'])
+    if order.status == 'paid':
+        # Doble click o recarga de la página de éxito
+        return redirect('order_confirmation', order_id=order.id)
+    # La reserva venció (o se rechazó el pago) y el stock ya se liberó
+    messages.error(request, 'La reserva de tu orden venció. Volvé a hacer el pedido.')
+    return redirect('cart_view')
+
 @login_required
 def mercadopago_checkout(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
@@ -428,8 +607,14 @@ def mercadopago_checkout(request, order_id):
     
     # Simular creación de preferencia
     preference_id = f"MP-{order.id}-{timezone.now().timestamp()}"
+    # UPDATE condicional: un save() completo podría pisar lo que hizo
+    # expire_reservations entre la lectura y la escritura
+    reserved = Order.objects.filter(pk=order.pk, status='pending', stock_reserved=True).update(
+        mp_preference_id=preference_id,
+    )
+    if not reserved:
+        return _reservation_gone(request, order)
     order.mp_preference_id = preference_id
-    order.save()
     
     return render(request, 'shop/mercadopago_checkout.html', {
         'order': order,
@@ -440,10 +625,13 @@ def mercadopago_checkout(request, order_id):
 def mercadopago_success(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
     
-    # Simular pago exitoso
-    order.status = 'paid'
-    order.mp_payment_id = f"PAY-{timezone.now().timestamp()}"
-    order.save()
+    # Simular pago exitoso. Solo si la reserva sigue en pie, en el mismo UPDATE:
+    # expire_reservations puede haber cancelado la orden después de leerla
+    paid = Order.objects.filter(pk=order.pk, status='pending', stock_reserved=True).update(
+        status='paid', mp_payment_id=f"PAY-{timezone.now().timestamp()}", reserved_until=None,
+    )
+    if not paid:
+        return _reservation_gone(request, order)
     
     # Notificación
     Notification.objects.create(
@@ -463,8 +651,8 @@ def mercadopago_success(request, order_id):
 @login_required
 def mercadopago_failure(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
-    order.status = 'cancelled'
-    order.save()
+    if Order.objects.filter(pk=order.pk, status='pending').update(status='cancelled'):
+        release_stock([order.id])
     messages.error(request, 'El pago fue rechazado. Intenta nuevamente.')
     return redirect('cart_view')
 
@@ -472,7 +660,7 @@ def mercadopago_failure(request, order_id):
 
 @login_required
 def export_order_pdf(request, order_id):
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = archive.get_order_or_404(order_id, user=request.user)
     
     # Generar HTML para el PDF
     html_content = f"""
@@ -524,7 +712,7 @@ def export_order_pdf(request, order_id):
     for item in order.items.all():
         html_content += f"""
                 <tr>
-                    <td>{item.product.name}</td>
+                    <td>{item.product_name}</td>
                     <td>{item.quantity}</td>
                     <td>${item.price}</td>
                     <td>${item.subtotal}</td>
@@ -564,9 +752,11 @@ def admin_dashboard(request):
     # Estadísticas
     today = timezone.now().date()
     
-    total_orders = Order.objects.count()
+    # Los totales históricos suman el archivo (precalculado por archive_orders)
+    archived = archive.archive_totals()
+    total_orders = Order.objects.count() + archived['orders']
     orders_today = Order.objects.filter(created_at__date=today).count()
-    total_revenue = Order.objects.filter(status__in=['paid', 'confirmed', 'shipped', 'delivered']).aggregate(Sum('total'))['total__sum'] or 0
+    total_revenue = (Order.objects.filter(status__in=['paid', 'confirmed', 'shipped', 'delivered']).aggregate(Sum('total'))['total__sum'] or 0) + archived['revenue']
     revenue_today = Order.objects.filter(created_at__date=today, status__in=['paid', 'confirmed', 'shipped', 'delivered']).aggregate(Sum('total'))['total__sum'] or 0
     
     total_products = Product.objects.count()
@@ -575,10 +765,8 @@ def admin_dashboard(request):
     # Órdenes recientes
     recent_orders = Order.objects.order_by('-created_at')[:10]
     
-    # Productos más vendidos
-    top_products = OrderItem.objects.values('product__name').annotate(
-        total_sold=Sum('quantity')
-    ).order_by('-total_sold')[:5]
+    # Productos más vendidos, con el archivo incluido
+    top_products = archive.top_products(5)
     
     # Órdenes por estado
     orders_by_status = Order.objects.values('status').annotate(count=Count('id'))
@@ -593,4 +781,156 @@ def admin_dashboard(request):
         'recent_orders': recent_orders,
         'top_products': top_products,
         'orders_by_status': orders_by_status,
+        'export_form': OrderExportForm(),
+        'throttle_shed': sorted(throttling.shed_counts().items()),
+    })
+
+
+# ===== EXPORTAR ÓRDENES (CSV) =====
+
+class Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+ORDER_EXPORT_COLUMNS = [
+    ('order_id', 'orden'),
+    ('order__created_at', 'fecha'),
+    ('order__status', 'estado'),
+    ('order__user__username', 'usuario'),
+    ('order__full_name', 'nombre'),
+    ('order__city', 'ciudad'),
+    ('order__payment_method', 'metodo_pago'),
+    ('order__subtotal', 'subtotal_orden'),
+    ('order__discount', 'descuento_orden'),
+    ('order__total', 'total_orden'),
+    ('product_id', 'producto_id'),
+    ('product_name', 'producto'),
+    ('quantity', 'cantidad'),
+    ('price', 'precio_unitario'),
+]
+
+@login_required
+def export_orders_csv(request):
+    if not request.user.is_staff:
+        messages.error(request, 'No tenés permisos para acceder a esta página')
+        return redirect('product_list')
+    
+    form = OrderExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Filtros de exportación inválidos')
+        return redirect('admin_dashboard')
+    
+    filters = {}
+    date_from = form.cleaned_data['date_from']
+    date_to = form.cleaned_data['date_to']
+    # Rangos sobre created_at (y no created_at__date) para que use el índice
+    if date_from:
+        filters['order__created_at__gte'] = timezone.make_aware(
+            datetime.datetime.combine(date_from, datetime.time.min))
+    if date_to:
+        filters['order__created_at__lt'] = timezone.make_aware(
+            datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min))
+    if form.cleaned_data['status']:
+        filters['order__status'] = form.cleaned_data['status']
+    
+    # Una consulta con JOIN por tabla (archivo primero: son las más viejas),
+    # leída de a bloques: memoria constante
+    columns = [field for field, _ in ORDER_EXPORT_COLUMNS]
+    tiers = [
+        model.objects.filter(**filters).order_by('order_id', 'id').values_list(*columns)
+        for model in (ArchivedOrderItem, OrderItem)
+    ]
+    writer = csv.writer(Echo())
+    
+    def stream():
+        yield writer.writerow([header for _, header in ORDER_EXPORT_COLUMNS])
+        for row in itertools.chain.from_iterable(rows.iterator(chunk_size=2000) for rows in tiers):
+            row = list(row)
+            row[1] = timezone.localtime(row[1]).strftime('%Y-%m-%d %H:%M:%S')
+            yield writer.writerow(row)
+    
+    filename = f"ordenes_{date_from or 'inicio'}_{date_to or timezone.localdate()}.csv"
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# ===== PERFILES (PROFILER) =====
+
+@login_required
+def profile_list(request):
+    if not request.user.is_staff:
+        messages.error(request, 'No tenés permisos para acceder a esta página')
+        return redirect('product_list')
+    return render(request, 'shop/profiles.html', {'profiles': profiling.list_profiles()})
+
+@login_required
+def profile_detail(request, profile_id):
+    if not request.user.is_staff:
+        messages.error(request, 'No tenés permisos para acceder a esta página')
+        return redirect('product_list')
+    loaded = profiling.load_profile(profile_id)
+    if loaded is None:
+        raise Http404('Perfil inexistente')
+    meta, stats = loaded
+    sort = 'tottime' if request.GET.get('orden') == 'propio' else 'cumulative'
+    # Las consultas más lentas primero
+    queries = sorted(meta['queries'], key=lambda query: query['ms'], reverse=True)
+    return render(request, 'shop/profile_detail.html', {
+        'profile': meta,
+        'queries': queries,
+        'report': profiling.stats_report(stats, sort),
+        'sort': sort,
+    })
+
+@login_required
+def profile_download(request, profile_id, fmt):
+    if not request.user.is_staff:
+        messages.error(request, 'No tenés permisos para acceder a esta página')
+        return redirect('product_list')
+    loaded = profiling.load_profile(profile_id)
+    if loaded is None or fmt not in ('pstats', 'folded'):
+        raise Http404('Perfil inexistente')
+    if fmt == 'pstats':
+        path = profiling.profiles_dir() / f'{profile_id}.prof'
+        response = HttpResponse(path.read_bytes(), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="{profile_id}.prof"'
+    else:
+        response = HttpResponse(profiling.folded_stacks(loaded[1]), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{profile_id}.folded"'
+    return response
+
+@login_required
+def customer_analytics(request):
+    if not request.user.is_staff:
+        messages.error(request, 'No tenés permisos para acceder a esta página')
+        return redirect('product_list')
+    # NumPy solo hace falta para el cálculo; se importa acá para no volverlo obligatorio en todo el sitio
+    from . import analytics
+    report = AnalyticsReport.objects.filter(name=analytics.REPORT_NAME).first()
+    segment = request.GET.get('segmento')
+    if segment not in analytics.SEGMENTS:
+        segment = analytics.SEGMENTS[0]
+    labels = dict(CustomerRFM.SEGMENT_CHOICES)
+    segments, cohorts = [], []
+    if report:
+        segments = [dict(row, label=labels[row['segment']]) for row in report.data['segments']]
+        # Retención: porcentaje de la cohorte que volvió a comprar k meses después
+        cohorts = [
+            dict(cohort, retention=[round(100 * active / cohort['size']) for active in cohort['active']])
+            for cohort in report.data['cohorts']
+        ]
+    top_customers = (
+        CustomerRFM.objects.filter(segment=segment)
+        .select_related('user')
+        .order_by('-monetary')[:20]
+    )
+    return render(request, 'shop/customer_analytics.html', {
+        'report': report,
+        'segments': segments,
+        'cohorts': cohorts,
+        'month_offsets': range(max((len(cohort['retention']) for cohort in cohorts), default=0)),
+        'segment': segment,
+        'segment_label': labels[segment],
+        'top_customers': top_customers,
     })
@@ -0,0 +1,32 @@
+"""
+Precompila los templates de shop/templates al arrancar el servidor. Con el
+loader cacheado (settings de producción) cada template se compila una sola vez
+por proceso; así ningún request paga esa primera compilación.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template import engines
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / 'templates'
+
+
+def warm_templates():
+    """Compila todos los templates de shop/templates. Devuelve cuántos."""
+    started = time.perf_counter()
+    engine = engines['django']
+    names = sorted(path.relative_to(TEMPLATES_DIR).as_posix() for path in TEMPLATES_DIR.rglob('*.html'))
+    for name in names:
+        engine.get_template(name)
+    logger.info(f'{len(names)} templates precompilados en {(time.perf_counter() - started) * 1000:.0f} ms')
+    return len(names)
+
+
+def warm_up():
+    """Llamado desde tienda/wsgi.py y tienda/asgi.py, después de crear la aplicación."""
+    if getattr(settings, 'TEMPLATE_WARMUP', False):
+        warm_templates()
@@ -23,8 +23,11 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.ReplicaRoutingMiddleware',
+    'shop.middleware.ThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'shop.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'tienda.urls'
@@ -50,10 +53,46 @@ WSGI_APPLICATION = 'tienda.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': BASE_DIR / os.environ.get('DB_NAME', 'db.sqlite3'),
     }
 }
 
+# Réplica de lectura opcional: DB_REPLICA_PATH=replica.sqlite3 habilita el
+# alias 'replica' para el catálogo, el dashboard y el historial de compras.
+# Con SQLite se mantiene copiando el primario con `manage.py sync_replica`.
+if os.environ.get('DB_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['DB_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Perfil de SQLite para producción (opt-in con DB_PROFILE=production):
+# WAL para que los lectores no bloqueen a los escritores, espera de hasta 20 s
+# ante un lock en vez de fallar, BEGIN IMMEDIATE para que las transacciones de
+# escritura no choquen al pasar de lectura a escritura, y conexiones persistentes.
+SQLITE_PRODUCTION_OPTIONS = {
+    'timeout': 20,  # busy timeout en segundos
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'  # 256 MB
+        'PRAGMA cache_size=-65536;'  # 64 MB por conexión
+        'PRAGMA temp_store=MEMORY;'
+    ),
+}
+
+if os.environ.get('DB_PROFILE') == 'production':
+    for database in DATABASES.values():
+        database['OPTIONS'] = dict(SQLITE_PRODUCTION_OPTIONS)
+        database['CONN_MAX_AGE'] = 600
+        database['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['shop.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+REPLICA_STICKY_SECONDS = 5  # lecturas al primario después de un POST
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = 'es-ar'
@@ -67,6 +106,71 @@ STATICFILES_DIRS = [BASE_DIR / 'shop' / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Subidas guardadas por contenido (sha256): sin duplicados y con nombres inmutables
+STORAGES = {
+    'default': {'BACKEND': 'shop.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Imágenes de producto: tamaño máximo al subir e hilos que las validan
+# (decodifican) después del request; 0 valida en el mismo request
+PRODUCT_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+PRODUCT_IMAGE_WORKERS = 2
+
+# Directorio del servidor con las imágenes referenciadas en las importaciones
+# de catálogo hechas desde la web (el comando import_catalog usa --images)
+CATALOG_IMPORT_IMAGE_DIR = os.environ.get('CATALOG_IMPORT_IMAGE_DIR')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Matriz de co-compras para las recomendaciones (build_recommendations)
+RECOMMENDATIONS_DIR = BASE_DIR / 'var' / 'recommendations'
+RECOMMENDATIONS_PER_PRODUCT = 8
+
+# Sugerencias del buscador (/sugerencias/?q=)
+SEARCH_SUGGESTIONS_LIMIT = 8
+SEARCH_SUGGESTIONS_MAX_AGE = 60
+
+# API JSON de productos (/api/productos/): máximo de ids o resultados por
+# request, tamaño de página por defecto y segundos de cache en clientes y CDN
+PRODUCT_API_MAX_RESULTS = 100
+PRODUCT_API_PAGE_SIZE = 50
+PRODUCT_API_MAX_AGE = 60
+
+# Export estático del catálogo (manage.py export_static, ver shop/static_export.py)
+STATIC_EXPORT_DIR = BASE_DIR / 'var' / 'static_site'
+STATIC_EXPORT_PAGE_SIZE = 24
+
+# Conteos por faceta del catálogo, cacheados por conjunto de filtros
+CATALOG_FACETS_CACHE_TIMEOUT = 300
+
+# Reviews por página en product_detail
+REVIEWS_PER_PAGE = 10
+
+# Minutos que una orden de MercadoPago retiene el stock esperando el pago
+STOCK_RESERVATION_MINUTES = 15
+
+# Días después de los cuales archive_orders mueve al archivo las órdenes entregadas o canceladas
+ORDER_ARCHIVE_DAYS = 365
+
+# Throttling de login, carrito, cupones y checkout (presupuestos en shop/urls.py).
+# 'memory' lleva la cuenta por proceso; 'cache' la comparte vía CACHES.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1') == '1'
+THROTTLE_BACKEND = os.environ.get('THROTTLE_BACKEND', 'memory')
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_PROXY_COUNT = 0  # proxies confiables delante de Django (X-Forwarded-For)
+
+# Profiler a pedido para staff (?_profile=1 o header X-Profile), ver /perfiles/
+PROFILER_ENABLED = True
+PROFILER_DIR = BASE_DIR / 'var' / 'profiles'
+PROFILER_MAX_PROFILES = 100
+
+# Log de consultas lentas (ver shop/slow_queries.py y el comando slow_query_report).
+# Apagado en desarrollo, así los tests y los comandos no escriben en var/log.
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', '0') == '1'
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100'))
+SLOW_QUERY_LOG_FILE = BASE_DIR / 'var' / 'log' / 'slow_queries.log'
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
 LOGIN_URL = 'login'
@@ -0,0 +1,76 @@
+"""
+Settings de producción. Se eligen con DJANGO_ENV=production (manage.py,
+wsgi.py y asgi.py) o con DJANGO_SETTINGS_MODULE=tienda.settings_production.
+
+Sobre la base de desarrollo:
+- DEBUG apagado y SECRET_KEY / ALLOWED_HOSTS desde el entorno.
+- Templates compilados una sola vez (loader cacheado, sin recarga) y
+  precompilados al arrancar el servidor (shop/warmup.py).
+- Conexiones persistentes y el perfil de SQLite para producción.
+- Respuestas comprimidas con GZip y GET condicional (ETag / 304).
+- Cache local en memoria por proceso.
+- Log de consultas lentas activado (SLOW_QUERY_LOG=0 lo apaga).
+
+Las imágenes subidas (MEDIA_ROOT) y los estáticos (collectstatic en
+STATIC_ROOT) los sirve el servidor web de adelante, no Django.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, MIDDLEWARE, SQLITE_PRODUCTION_OPTIONS, TEMPLATES
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Producción necesita DJANGO_SECRET_KEY en el entorno')
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+
+# GZip va antes que todo lo que lea o modifique el cuerpo de la respuesta, y
+# ConditionalGet después de GZip, así el ETag se calcula sobre el cuerpo sin comprimir
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE[1:1] = [
+    'django.middleware.gzip.GZipMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
+]
+
+TEMPLATES = [dict(TEMPLATES[0], APP_DIRS=False)]
+TEMPLATES[0]['OPTIONS'] = dict(
+    TEMPLATES[0]['OPTIONS'],
+    context_processors=[
+        processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+        if processor != 'django.template.context_processors.debug'
+    ],
+    loaders=[
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+)
+# Precompilar shop/templates al arrancar (tienda/wsgi.py, tienda/asgi.py)
+TEMPLATE_WARMUP = True
+
+DATABASES = {alias: dict(database) for alias, database in DATABASES.items()}
+for database in DATABASES.values():
+    database['OPTIONS'] = dict(SQLITE_PRODUCTION_OPTIONS)
+    database['CONN_MAX_AGE'] = 600
+    database['CONN_HEALTH_CHECKS'] = True
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tienda',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# En desarrollo viene apagado (ver settings.py)
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', '1') == '1'
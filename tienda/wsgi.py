@@ -11,6 +11,14 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+# DJANGO_ENV=production elige los settings de producción
+os.environ.setdefault(
+    'DJANGO_SETTINGS_MODULE',
+    'tienda.settings_production' if os.environ.get('DJANGO_ENV') == 'production' else 'tienda.settings',
+)
 
 application = get_wsgi_application()
+
+from shop.warmup import warm_up  # noqa: E402 (necesita Django configurado)
+
+warm_up()